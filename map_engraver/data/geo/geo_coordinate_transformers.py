@@ -1,15 +1,16 @@
 from typing import List
 
-from pyproj import proj, Transformer
+from pyproj import proj
 
 from map_engraver.data.geo.geo_coordinate import GeoCoordinate
+from map_engraver.data.proj.transformer_pool import get_transformer
 
 
 def transform_geo_coordinate_to_new_crs(
         geo_coordinate: GeoCoordinate,
         new_crs: proj.CRS
 ) -> GeoCoordinate:
-    result = Transformer.from_proj(
+    result = get_transformer(
         geo_coordinate.crs,
         new_crs
     ).transform(*geo_coordinate.tuple)
@@ -2,6 +2,7 @@ import math
 
 from typing import Optional, Tuple
 
+import shapely
 from pyproj import CRS
 from shapely.geometry import MultiPolygon, Polygon
 from shapely.ops import transform, unary_union
@@ -40,11 +41,11 @@ def canvas_mask(
     if crs_polygon is None:
         return MultiPolygon([canvas_polygon])
 
-    crs_polygon = crs_mask(transformers_builder.crs)
     transformers_builder = transformers_builder.copy()
     transformers_builder.set_data_crs(None)
-    crs_to_canvas = transformers_builder.build_crs_to_canvas_transformer()
-    crs_polygon = transform(crs_to_canvas, crs_polygon)
+    crs_to_canvas = transformers_builder \
+        .build_crs_to_canvas_array_transformer()
+    crs_polygon = shapely.transform(crs_polygon, crs_to_canvas)
     return geoms_to_multi_polygon(canvas_polygon.intersection(crs_polygon))
 
 
@@ -62,8 +63,9 @@ def canvas_crs_mask(
     """
     transformers_builder = transformers_builder.copy()
     transformers_builder.set_data_crs(None)
-    canvas_to_crs = transformers_builder.build_canvas_to_crs_transformer()
-    canvas_polygon = transform(canvas_to_crs, canvas_polygon)
+    canvas_to_crs = transformers_builder \
+        .build_canvas_to_crs_array_transformer()
+    canvas_polygon = shapely.transform(canvas_polygon, canvas_to_crs)
 
     crs_polygon = crs_mask(transformers_builder.crs)
 
@@ -89,8 +91,10 @@ def canvas_wgs84_mask(
     """
     transformers_builder = transformers_builder.copy()
     transformers_builder.set_data_crs(CRS.from_epsg(4326))
-    crs_to_canvas = transformers_builder.build_crs_to_canvas_transformer()
-    canvas_to_crs = transformers_builder.build_canvas_to_crs_transformer()
+    crs_to_canvas = transformers_builder \
+        .build_crs_to_canvas_array_transformer()
+    canvas_to_crs = transformers_builder \
+        .build_canvas_to_crs_array_transformer()
 
     wgs84_polygons = wgs84_mask(transformers_builder.crs)
 
@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from map_engraver.data.geo_canvas_ops.geo_canvas_transformers_builder import \
+    GeoCanvasTransformersBuilder
+from map_engraver.data.osm_shapely_ops.transform import \
+    transform_interpolated_euclidean
+
+# The transformer of the current worker process, built once by
+# `_initialize_worker()`.
+_worker_transformer = None
+
+
+def transform_geoms_to_canvas(
+        description: Dict[str, Any],
+        geoms: Sequence[BaseGeometry],
+        interpolate: bool = True,
+        angular_distortion_threshold=1,
+        workers: Optional[int] = None,
+        chunk_size: int = 256
+) -> List[BaseGeometry]:
+    """
+    Transforms geometries from a CRS to the canvas across multiple processes.
+
+    Each process builds the CRSs and transformer from the description once,
+    when it starts, and then transforms chunks of the geometries.
+
+    Example:
+
+        geoms = transform_geoms_to_canvas(builder.describe(), geoms)
+
+    :param description: The description of a `GeoCanvasTransformersBuilder`,
+                        returned by `describe()`.
+    :param geoms: The geometries to transform.
+    :param interpolate: Whether to interpolate the line-segments of the
+                        geometries with `transform_interpolated_euclidean()`.
+                        Otherwise only the vertices are transformed.
+    :param angular_distortion_threshold: The maximum obtuse angle that can
+                                         exist between two interpolated
+                                         line-segments.
+    :param workers: The number of processes to transform geometries with. By
+                    default, one for each CPU.
+    :param chunk_size: The number of geometries to send to a process at once.
+    :return: The transformed geometries, in the same order as `geoms`.
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    geoms = list(geoms)
+    chunks = [
+        geoms[start:start + chunk_size]
+        for start in range(0, len(geoms), chunk_size)
+    ]
+    arguments = (interpolate, angular_distortion_threshold)
+
+    if workers <= 1 or len(chunks) <= 1:
+        transformer = GeoCanvasTransformersBuilder \
+            .from_description(description) \
+            .build_crs_to_canvas_array_transformer()
+        return _transform_geoms(transformer, geoms, *arguments)
+
+    transformed_geoms = []
+    with ProcessPoolExecutor(
+            min(workers, len(chunks)),
+            initializer=_initialize_worker,
+            initargs=(description,)
+    ) as executor:
+        # `map()` returns the results in the order of the chunks.
+        for transformed_chunk in executor.map(
+                _transform_chunk,
+                chunks,
+                [arguments] * len(chunks)
+        ):
+            transformed_geoms.extend(transformed_chunk)
+    return transformed_geoms
+
+
+def _initialize_worker(description: Dict[str, Any]):
+    global _worker_transformer
+    _worker_transformer = GeoCanvasTransformersBuilder \
+        .from_description(description) \
+        .build_crs_to_canvas_array_transformer()
+
+
+def _transform_chunk(
+        geoms: List[BaseGeometry],
+        arguments: tuple
+) -> List[BaseGeometry]:
+    return _transform_geoms(_worker_transformer, geoms, *arguments)
+
+
+def _transform_geoms(
+        transformer,
+        geoms: List[BaseGeometry],
+        interpolate: bool,
+        angular_distortion_threshold
+) -> List[BaseGeometry]:
+    if not interpolate:
+        return list(shapely.transform(geoms, transformer))
+    return [
+        transform_interpolated_euclidean(
+            transformer,
+            geom,
+            angular_distortion_threshold
+        )
+        for geom in geoms
+    ]
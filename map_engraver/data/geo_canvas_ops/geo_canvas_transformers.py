@@ -1,11 +1,18 @@
 from math import sin, cos
 
+import numpy as np
 import pyproj
-from typing import Tuple, Callable, Optional
+from typing import Tuple, Callable, Optional, Union
 
 from map_engraver.canvas.canvas_coordinate import CanvasCoordinate
 from map_engraver.data.geo.geo_coordinate import GeoCoordinate
 from map_engraver.data.geo_canvas_ops.geo_canvas_scale import GeoCanvasScale
+from map_engraver.data.proj.transformer_pool import get_transformer
+
+ArrayTransformer = Callable[
+    ...,
+    Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]
+]
 
 
 def build_crs_to_canvas_transformer(
@@ -55,12 +62,8 @@ def build_crs_to_canvas_transformer(
     """
     data_transformer: Optional[pyproj.Transformer] = None
     if data_crs is not None:
-        data_transformer = pyproj.Transformer.from_proj(
-            data_crs,
-            crs
-        )
-    transformed_origin_for_geo = pyproj.Transformer \
-        .from_proj(origin_for_geo.crs, crs) \
+        data_transformer = get_transformer(data_crs, crs)
+    transformed_origin_for_geo = get_transformer(origin_for_geo.crs, crs) \
         .transform(*origin_for_geo.tuple)
     scale_factor = scale.geo_units / scale.canvas_units.pt
 
@@ -101,6 +104,77 @@ def build_crs_to_canvas_transformer(
     return projection
 
 
+def build_crs_to_canvas_array_transformer(
+        crs: pyproj.CRS,
+        scale: GeoCanvasScale,
+        origin_for_geo: GeoCoordinate,
+        origin_for_canvas: CanvasCoordinate = CanvasCoordinate.origin(),
+        data_crs: Optional[pyproj.CRS] = None,
+        rotation: float = 0,
+        is_crs_yx: bool = False,
+        is_data_yx: bool = False,
+) -> ArrayTransformer:
+    """
+    Returns a transformation function like `build_crs_to_canvas_transformer()`,
+    but that transforms arrays of coordinates at once, and returns the exact
+    same results.
+
+    The function can either be called with an (N, 2) array of coordinates,
+    in which case an (N, 2) array is returned, or with separate x and y
+    arrays, in which case a tuple of x and y arrays is returned. This makes it
+    usable with both `shapely.transform()` and `shapely.ops.transform()`:
+
+        geoms = shapely.transform(geoms, transformer)
+
+    See `build_crs_to_canvas_transformer()` for the parameters.
+
+    :return: A transformation function.
+    """
+    data_transformer: Optional[pyproj.Transformer] = None
+    if data_crs is not None:
+        data_transformer = get_transformer(data_crs, crs)
+    transformed_origin_for_geo = get_transformer(origin_for_geo.crs, crs) \
+        .transform(*origin_for_geo.tuple)
+    scale_factor = scale.geo_units / scale.canvas_units.pt
+
+    def projection(
+            x: np.ndarray,
+            y: Optional[np.ndarray] = None
+    ) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        if y is None:
+            coords = np.asarray(x, dtype=np.float64)
+            x, y = projection(coords[:, 0], coords[:, 1])
+            return np.column_stack((x, y))
+
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if is_data_yx:
+            x, y = y, x
+
+        if data_transformer is not None:
+            x, y = data_transformer.transform(x, y)
+
+        # The same operations as `build_crs_to_canvas_transformer()`, in the
+        # same order, so that the results are identical.
+        x = x - transformed_origin_for_geo[0]
+        y = y - transformed_origin_for_geo[1]
+
+        if is_crs_yx:
+            x, y = y, x
+
+        x, y = (
+            x * cos(rotation) + y * sin(rotation),
+            y * cos(rotation) - x * sin(rotation)
+        )
+
+        return (
+            x / scale_factor + origin_for_canvas.x.pt,
+            y / -scale_factor + origin_for_canvas.y.pt
+        )
+
+    return projection
+
+
 def build_canvas_to_crs_transformer(
         crs: pyproj.CRS,
         scale: GeoCanvasScale,
@@ -149,12 +223,8 @@ def build_canvas_to_crs_transformer(
     """
     inverse_data_transformer: Optional[pyproj.Transformer] = None
     if data_crs is not None:
-        inverse_data_transformer = pyproj.Transformer.from_proj(
-            crs,
-            data_crs,
-        )
-    transformed_origin_for_geo = pyproj.Transformer \
-        .from_proj(origin_for_geo.crs, crs) \
+        inverse_data_transformer = get_transformer(crs, data_crs)
+    transformed_origin_for_geo = get_transformer(origin_for_geo.crs, crs) \
         .transform(*origin_for_geo.tuple)
     scale_factor = scale.geo_units / scale.canvas_units.pt
 
@@ -190,3 +260,71 @@ def build_canvas_to_crs_transformer(
         return coord
 
     return projection
+
+
+def build_canvas_to_crs_array_transformer(
+        crs: pyproj.CRS,
+        scale: GeoCanvasScale,
+        origin_for_geo: GeoCoordinate,
+        origin_for_canvas: CanvasCoordinate = CanvasCoordinate.origin(),
+        data_crs: Optional[pyproj.CRS] = None,
+        rotation: float = 0,
+        is_crs_yx: bool = False,
+        is_data_yx: bool = False
+) -> ArrayTransformer:
+    """
+    Returns a transformation function like `build_canvas_to_crs_transformer()`,
+    but that transforms arrays of coordinates at once, and returns the exact
+    same results.
+
+    Like `build_crs_to_canvas_array_transformer()`, the function can either be
+    called with an (N, 2) array of coordinates, or with separate x and y
+    arrays.
+
+    See `build_canvas_to_crs_transformer()` for the parameters.
+
+    :return: A transformation function.
+    """
+    inverse_data_transformer: Optional[pyproj.Transformer] = None
+    if data_crs is not None:
+        inverse_data_transformer = get_transformer(crs, data_crs)
+    transformed_origin_for_geo = get_transformer(origin_for_geo.crs, crs) \
+        .transform(*origin_for_geo.tuple)
+    scale_factor = scale.geo_units / scale.canvas_units.pt
+
+    def projection(
+            x: np.ndarray,
+            y: Optional[np.ndarray] = None
+    ) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        if y is None:
+            coords = np.asarray(x, dtype=np.float64)
+            x, y = projection(coords[:, 0], coords[:, 1])
+            return np.column_stack((x, y))
+
+        # The same operations as `build_canvas_to_crs_transformer()`, in the
+        # same order, so that the results are identical.
+        x = (np.asarray(x, dtype=np.float64) - origin_for_canvas.x.pt) * \
+            scale_factor
+        y = (np.asarray(y, dtype=np.float64) - origin_for_canvas.y.pt) * \
+            -scale_factor
+
+        x, y = (
+            x * cos(-rotation) + y * sin(-rotation),
+            y * cos(-rotation) - x * sin(-rotation)
+        )
+
+        if is_crs_yx:
+            x, y = y, x
+
+        x = x + transformed_origin_for_geo[0]
+        y = y + transformed_origin_for_geo[1]
+
+        if inverse_data_transformer is not None:
+            x, y = inverse_data_transformer.transform(x, y)
+
+        if is_data_yx:
+            x, y = y, x
+
+        return x, y
+
+    return projection
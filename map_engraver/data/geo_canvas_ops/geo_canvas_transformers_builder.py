@@ -1,6 +1,6 @@
 import math
 
-from typing import Optional
+from typing import Optional, Dict, Any
 
 import pyproj
 
@@ -12,7 +12,9 @@ from map_engraver.data.geo.geo_coordinate_transformers import \
 from map_engraver.data.geo_canvas_ops.geo_canvas_scale import GeoCanvasScale
 from map_engraver.data.geo_canvas_ops.geo_canvas_transformers import \
     build_crs_to_canvas_transformer, \
-    build_canvas_to_crs_transformer
+    build_crs_to_canvas_array_transformer, \
+    build_canvas_to_crs_transformer, \
+    build_canvas_to_crs_array_transformer
 
 
 class GeoCanvasTransformersBuilder:
@@ -120,7 +122,80 @@ class GeoCanvasTransformersBuilder:
         builder.set_rotation(self.rotation)
         return builder
 
-    def build_crs_to_canvas_transformer(self):
+    def describe(self) -> Dict[str, Any]:
+        """
+        Returns a description of the builder, made of plain values that can
+        be pickled and sent to other processes. CRSs are described by their
+        WKT.
+
+        :return: A dictionary that can be passed to `from_description()`.
+        """
+        origin_for_geo = None
+        if self.origin_for_geo is not None:
+            origin_for_geo = (
+                self.origin_for_geo.x,
+                self.origin_for_geo.y,
+                _crs_to_wkt(self.origin_for_geo.crs)
+            )
+        origin_for_canvas = None
+        if self.origin_for_canvas is not None:
+            origin_for_canvas = self.origin_for_canvas.pt
+        scale = None
+        if self.scale is not None:
+            scale = (self.scale.geo_units, self.scale.canvas_units.pt)
+        return {
+            'crs': _crs_to_wkt(self.crs),
+            'rotation': self.rotation,
+            'scale': scale,
+            'origin_for_geo': origin_for_geo,
+            'origin_for_canvas': origin_for_canvas,
+            'data_crs': _crs_to_wkt(self.data_crs),
+            'is_crs_yx': self.is_crs_yx,
+            'is_data_yx': self.is_data_yx
+        }
+
+    @staticmethod
+    def from_description(
+            description: Dict[str, Any]
+    ) -> 'GeoCanvasTransformersBuilder':
+        """
+        Creates a builder from a description returned by `describe()`. CRSs
+        with the same WKT are only created once.
+
+        :param description: The description of the builder.
+        :return: The builder.
+        """
+        crs_cache: Dict[str, pyproj.CRS] = {}
+
+        def wkt_to_crs(wkt: Optional[str]) -> Optional[pyproj.CRS]:
+            if wkt is None:
+                return None
+            if wkt not in crs_cache:
+                crs_cache[wkt] = pyproj.CRS.from_wkt(wkt)
+            return crs_cache[wkt]
+
+        builder = GeoCanvasTransformersBuilder()
+        builder.set_crs(wkt_to_crs(description['crs']))
+        builder.set_rotation(description['rotation'])
+        if description['scale'] is not None:
+            geo_units, canvas_units = description['scale']
+            builder.set_scale(GeoCanvasScale(
+                geo_units,
+                CanvasUnit.from_pt(canvas_units)
+            ))
+        if description['origin_for_geo'] is not None:
+            x, y, crs = description['origin_for_geo']
+            builder.set_origin_for_geo(GeoCoordinate(x, y, wkt_to_crs(crs)))
+        if description['origin_for_canvas'] is not None:
+            builder.set_origin_for_canvas(
+                CanvasCoordinate.from_pt(*description['origin_for_canvas'])
+            )
+        builder.set_data_crs(wkt_to_crs(description['data_crs']))
+        builder.set_is_crs_yx(description['is_crs_yx'])
+        builder.set_is_data_yx(description['is_data_yx'])
+        return builder
+
+    def _validate(self):
         if (
                 self.crs is None or
                 self.scale is None or
@@ -130,6 +205,9 @@ class GeoCanvasTransformersBuilder:
             raise Exception(
                 'crs, scale, and origins must be defined'
             )
+
+    def build_crs_to_canvas_transformer(self):
+        self._validate()
         return build_crs_to_canvas_transformer(
             self.crs,
             self.scale,
@@ -141,16 +219,21 @@ class GeoCanvasTransformersBuilder:
             is_data_yx=self.is_data_yx
         )
 
+    def build_crs_to_canvas_array_transformer(self):
+        self._validate()
+        return build_crs_to_canvas_array_transformer(
+            self.crs,
+            self.scale,
+            self.origin_for_geo,
+            self.origin_for_canvas,
+            self.data_crs,
+            rotation=self.rotation,
+            is_crs_yx=self.is_crs_yx,
+            is_data_yx=self.is_data_yx
+        )
+
     def build_canvas_to_crs_transformer(self):
-        if (
-                self.crs is None or
-                self.scale is None or
-                self.origin_for_geo is None or
-                self.origin_for_canvas is None
-        ):
-            raise Exception(
-                'crs, scale, and origins must be defined'
-            )
+        self._validate()
         return build_canvas_to_crs_transformer(
             self.crs,
             self.scale,
@@ -161,3 +244,22 @@ class GeoCanvasTransformersBuilder:
             is_crs_yx=self.is_crs_yx,
             is_data_yx=self.is_data_yx
         )
+
+    def build_canvas_to_crs_array_transformer(self):
+        self._validate()
+        return build_canvas_to_crs_array_transformer(
+            self.crs,
+            self.scale,
+            self.origin_for_geo,
+            self.origin_for_canvas,
+            self.data_crs,
+            rotation=self.rotation,
+            is_crs_yx=self.is_crs_yx,
+            is_data_yx=self.is_data_yx
+        )
+
+
+def _crs_to_wkt(crs: Optional[pyproj.CRS]) -> Optional[str]:
+    if crs is None:
+        return None
+    return crs.to_wkt()
@@ -2,8 +2,11 @@ from .member import MemberTypes  # noqa
 from .member import Member  # noqa
 from .element import Element  # noqa
 from .node import Node  # noqa
+from .node_store import CompactNodeStore  # noqa
 from .way import Way  # noqa
 from .relation import Relation  # noqa
 from .osm import Osm  # noqa
 from .parser import Parser  # noqa
+from .pbf_parser import PbfParser  # noqa
+from .cache import OsmCache  # noqa
 from .osm_subset import OsmSubset  # noqa
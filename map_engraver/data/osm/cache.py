@@ -0,0 +1,491 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from . import Member
+from . import MemberTypes
+from . import Node
+from . import Way
+from . import Relation
+from . import Osm
+from . import Parser
+from . import PbfParser
+from .node_store import CompactNodeStore
+
+# Bump when the layout of the cached arrays changes, so that caches written by
+# older versions are rebuilt instead of misread.
+CACHE_FORMAT_VERSION = 2
+
+
+class OsmCache:
+    """
+    An on-disk cache of parsed OSM files.
+
+    Parsing a large OSM XML file can take several seconds, which adds up when
+    the same map is rendered over and over again. The cache stores the parsed
+    `Osm` object as NumPy arrays in an `.npz` file, which can be loaded in a
+    fraction of the time.
+
+    Cache entries are keyed by the path of the OSM file, and are validated
+    against the file's size, modification time and content hash. If the size
+    has changed, the entry is rebuilt. If only the modification time has
+    changed, the content hash is checked, so that touching a file does not
+    invalidate the cache.
+
+    Example:
+
+        cache = OsmCache(Path('.cache/osm'))
+        osm = cache.parse(Path('map.osm'))
+    """
+
+    def __init__(self, cache_dir: Path):
+        """
+        :param cache_dir: The directory to store the cache files in. It is
+                          created if it does not exist.
+        """
+        self.cache_dir = cache_dir
+
+    def parse(self, osm_file: Path, compact_nodes: bool = False) -> Osm:
+        """
+        Returns the parsed OSM file from the cache, or parses the file and
+        stores it in the cache if there is no valid cache entry.
+
+        :param osm_file: The path to the OSM XML file, or to an OSM PBF file
+                         if the file name ends with `.pbf`.
+        :param compact_nodes: If true, the nodes of the `Osm` object are
+                              stored in a `CompactNodeStore`. See
+                              `Parser.iterparse()` for details.
+        :return: The parsed OSM file.
+        """
+        osm = self.load(osm_file, compact_nodes=compact_nodes)
+        if osm is None and osm_file.suffix == '.pbf':
+            osm = PbfParser.parse(osm_file, compact_nodes=compact_nodes)
+            self.save(osm_file, osm)
+        elif osm is None:
+            osm = Parser.parse(osm_file, compact_nodes=compact_nodes)
+            self.save(osm_file, osm)
+        return osm
+
+    def load(
+            self,
+            osm_file: Path,
+            compact_nodes: bool = False
+    ) -> Optional[Osm]:
+        """
+        :param osm_file: The path to the OSM XML file.
+        :param compact_nodes: If true, the nodes of the `Osm` object are
+                              stored in a `CompactNodeStore`.
+        :return: The cached OSM file, or `None` if there is no valid cache
+                 entry for the file.
+        """
+        osm_path = self._get_osm_path(osm_file)
+        if not self._is_fresh(osm_file) or not osm_path.exists():
+            return None
+        with np.load(osm_path) as arrays:
+            return _arrays_to_osm(arrays, compact_nodes)
+
+    def save(self, osm_file: Path, osm: Osm):
+        """
+        Stores the parsed OSM file in the cache, replacing any existing cache
+        entry for the file.
+
+        :param osm_file: The path to the OSM XML file that `osm` was parsed
+                         from.
+        :param osm: The parsed OSM file.
+        """
+        self._prepare_entry(osm_file)
+        _write_npz(self._get_osm_path(osm_file), _osm_to_arrays(osm))
+
+    def load_geometries(
+            self,
+            osm_file: Path,
+            name: str
+    ) -> Optional[Dict[str, Optional[BaseGeometry]]]:
+        """
+        Returns geometries that were derived from the OSM file, for example
+        with `OsmToShapely`, and stored with `save_geometries()`.
+
+        :param osm_file: The path to the OSM XML file.
+        :param name: The name the geometries were stored under.
+        :return: The geometries indexed by element id, or `None` if there are
+                 no geometries stored under the name, or the OSM file has
+                 changed since.
+        """
+        geometries_path = self._get_geometries_path(osm_file, name)
+        if not self._is_fresh(osm_file) or not geometries_path.exists():
+            return None
+        with np.load(geometries_path) as arrays:
+            wkb = np.array(
+                _split_bytes(arrays['wkb'], arrays['wkb_offsets']),
+                dtype=object
+            )
+            missing = arrays['missing']
+            geoms = np.full(len(wkb), None, dtype=object)
+            geoms[~missing] = shapely.from_wkb(wkb[~missing])
+            return dict(zip(arrays['refs'].tolist(), geoms.tolist()))
+
+    def save_geometries(
+            self,
+            osm_file: Path,
+            name: str,
+            geoms: Mapping[str, Optional[BaseGeometry]]
+    ):
+        """
+        Stores geometries that were derived from the OSM file. The geometries
+        are invalidated along with the cached OSM file.
+
+        :param osm_file: The path to the OSM XML file.
+        :param name: The name to store the geometries under, for example
+                     'buildings'.
+        :param geoms: The geometries indexed by element id. Values can be
+                      `None`, for elements that could not be converted.
+        """
+        self._prepare_entry(osm_file)
+        refs = list(geoms.keys())
+        values = list(geoms.values())
+        missing = np.array([geom is None for geom in values], dtype=bool)
+        wkb = [
+            b'' if geom is None else shapely.to_wkb(geom)
+            for geom in values
+        ]
+        wkb_bytes, wkb_offsets = _join_bytes(wkb)
+        _write_npz(self._get_geometries_path(osm_file, name), {
+            'refs': np.array(refs, dtype=np.str_),
+            'wkb': wkb_bytes,
+            'wkb_offsets': wkb_offsets,
+            'missing': missing
+        })
+
+    def _prepare_entry(self, osm_file: Path):
+        """
+        Removes the files of the cache entry if the OSM file has changed, and
+        writes the metadata of the current OSM file.
+        """
+        if self._is_fresh(osm_file):
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for path in self.cache_dir.glob(self._get_key(osm_file) + '.*'):
+            path.unlink()
+        _write_json(self._get_metadata_path(osm_file), self._stat(osm_file))
+
+    def _is_fresh(self, osm_file: Path) -> bool:
+        metadata_path = self._get_metadata_path(osm_file)
+        if not metadata_path.exists():
+            return False
+        with open(metadata_path, 'r') as metadata_file:
+            metadata = json.load(metadata_file)
+        if metadata.get('version') != CACHE_FORMAT_VERSION:
+            return False
+        stat = osm_file.stat()
+        if metadata['size'] != stat.st_size:
+            return False
+        if metadata['mtime_ns'] == stat.st_mtime_ns:
+            return True
+        # The file may have been touched or copied without being modified.
+        # Only then is the whole file read to compare its hash.
+        if metadata['sha256'] != _hash_file(osm_file):
+            return False
+        metadata['size'] = stat.st_size
+        metadata['mtime_ns'] = stat.st_mtime_ns
+        _write_json(metadata_path, metadata)
+        return True
+
+    @staticmethod
+    def _stat(osm_file: Path) -> Dict:
+        stat = osm_file.stat()
+        return {
+            'version': CACHE_FORMAT_VERSION,
+            'path': osm_file.resolve().as_posix(),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': _hash_file(osm_file)
+        }
+
+    def _get_key(self, osm_file: Path) -> str:
+        return hashlib.sha1(
+            osm_file.resolve().as_posix().encode('utf-8')
+        ).hexdigest()
+
+    def _get_metadata_path(self, osm_file: Path) -> Path:
+        return self.cache_dir.joinpath(self._get_key(osm_file) + '.json')
+
+    def _get_osm_path(self, osm_file: Path) -> Path:
+        return self.cache_dir.joinpath(self._get_key(osm_file) + '.osm.npz')
+
+    def _get_geometries_path(self, osm_file: Path, name: str) -> Path:
+        return self.cache_dir.joinpath(
+            self._get_key(osm_file) + '.' + name + '.npz'
+        )
+
+
+def _hash_file(path: Path) -> str:
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def _write_npz(path: Path, arrays: Dict[str, np.ndarray]):
+    temp_path = path.with_name(path.name + '.tmp')
+    with open(temp_path, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(temp_path, path)
+
+
+def _write_json(path: Path, data: Dict):
+    temp_path = path.with_name(path.name + '.tmp')
+    with open(temp_path, 'w') as file:
+        json.dump(data, file)
+    os.replace(temp_path, path)
+
+
+def _join_bytes(values: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in values])
+    return np.frombuffer(b''.join(values), dtype=np.uint8), offsets
+
+
+def _split_bytes(joined: np.ndarray, offsets: np.ndarray) -> List[bytes]:
+    data = joined.tobytes()
+    offsets = offsets.tolist()
+    return [
+        data[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)
+    ]
+
+
+class _StringTable:
+    """
+    Deduplicates strings, such as tag keys and values, so that they can be
+    stored as integer indexes.
+    """
+
+    def __init__(self):
+        self.indexes: Dict[str, int] = dict()
+
+    def add(self, string: str) -> int:
+        index = self.indexes.get(string)
+        if index is None:
+            index = len(self.indexes)
+            self.indexes[string] = index
+        return index
+
+    def to_array(self) -> np.ndarray:
+        # XML cannot contain null characters, so they are safe to use as a
+        # separator.
+        return np.frombuffer(
+            '\0'.join(self.indexes.keys()).encode('utf-8'),
+            dtype=np.uint8
+        )
+
+    @staticmethod
+    def from_array(array: np.ndarray, count: int) -> List[str]:
+        if count == 0:
+            return []
+        return array.tobytes().decode('utf-8').split('\0')
+
+
+def _tags_to_arrays(
+        prefix: str,
+        tags_list: List[Dict[str, str]],
+        strings: _StringTable
+) -> Dict[str, np.ndarray]:
+    offsets = np.zeros(len(tags_list) + 1, dtype=np.int64)
+    keys = []
+    values = []
+    for i, tags in enumerate(tags_list):
+        for key, value in tags.items():
+            keys.append(strings.add(key))
+            values.append(strings.add(value))
+        offsets[i + 1] = len(keys)
+    return {
+        prefix + '_tag_offsets': offsets,
+        prefix + '_tag_keys': np.array(keys, dtype=np.int32),
+        prefix + '_tag_values': np.array(values, dtype=np.int32)
+    }
+
+
+def _arrays_to_tags(
+        prefix: str,
+        arrays: Mapping[str, np.ndarray],
+        strings: List[str]
+) -> Dict[int, Dict[str, str]]:
+    """
+    :return: The tags of the elements that have tags, indexed by the position
+             of the element.
+    """
+    offsets = arrays[prefix + '_tag_offsets']
+    keys = [strings[i] for i in arrays[prefix + '_tag_keys'].tolist()]
+    values = [strings[i] for i in arrays[prefix + '_tag_values'].tolist()]
+    # Most elements, nodes in particular, have no tags.
+    tagged_indexes = np.flatnonzero(offsets[1:] > offsets[:-1]).tolist()
+    offsets = offsets.tolist()
+    return {
+        i: dict(zip(
+            keys[offsets[i]:offsets[i + 1]],
+            values[offsets[i]:offsets[i + 1]]
+        ))
+        for i in tagged_indexes
+    }
+
+
+_MEMBER_TYPE_VALUES = {
+    member_type: member_type.value for member_type in MemberTypes
+}
+_MEMBER_TYPES = {
+    member_type.value: member_type for member_type in MemberTypes
+}
+
+
+def _osm_to_arrays(osm: Osm) -> Dict[str, np.ndarray]:
+    strings = _StringTable()
+    arrays = dict()
+
+    if isinstance(osm.nodes, CompactNodeStore):
+        nodes = osm.nodes
+        arrays['node_ids'] = nodes.ids
+        arrays['node_lat'] = nodes.lat
+        arrays['node_lon'] = nodes.lon
+        node_tags = [nodes.tags.get(i, {}) for i in range(len(nodes))]
+    else:
+        node_list = list(osm.nodes.values())
+        arrays['node_ids'] = np.array(
+            [int(node.id) for node in node_list],
+            dtype=np.int64
+        )
+        arrays['node_lat'] = np.array(
+            [node.lat for node in node_list],
+            dtype=np.float64
+        )
+        arrays['node_lon'] = np.array(
+            [node.lon for node in node_list],
+            dtype=np.float64
+        )
+        node_tags = [node.tags for node in node_list]
+    arrays.update(_tags_to_arrays('node', node_tags, strings))
+
+    way_list = list(osm.ways.values())
+    arrays['way_ids'] = np.array(
+        [int(way.id) for way in way_list],
+        dtype=np.int64
+    )
+    arrays['way_node_offsets'] = np.zeros(len(way_list) + 1, dtype=np.int64)
+    arrays['way_node_offsets'][1:] = np.cumsum(
+        [len(way.node_refs) for way in way_list]
+    )
+    arrays['way_node_refs'] = np.array(
+        [int(ref) for way in way_list for ref in way.node_refs],
+        dtype=np.int64
+    )
+    arrays.update(_tags_to_arrays(
+        'way',
+        [way.tags for way in way_list],
+        strings
+    ))
+
+    relation_list = list(osm.relations.values())
+    members = [
+        member for relation in relation_list for member in relation.members
+    ]
+    arrays['relation_ids'] = np.array(
+        [int(relation.id) for relation in relation_list],
+        dtype=np.int64
+    )
+    arrays['relation_member_offsets'] = np.zeros(
+        len(relation_list) + 1,
+        dtype=np.int64
+    )
+    arrays['relation_member_offsets'][1:] = np.cumsum(
+        [len(relation.members) for relation in relation_list]
+    )
+    arrays['relation_member_types'] = np.array(
+        [_MEMBER_TYPE_VALUES[member.type] for member in members],
+        dtype=np.int8
+    )
+    arrays['relation_member_refs'] = np.array(
+        [int(member.ref) for member in members],
+        dtype=np.int64
+    )
+    arrays['relation_member_roles'] = np.array(
+        [strings.add(member.role) for member in members],
+        dtype=np.int32
+    )
+    arrays.update(_tags_to_arrays(
+        'relation',
+        [relation.tags for relation in relation_list],
+        strings
+    ))
+
+    arrays['strings'] = strings.to_array()
+    arrays['string_count'] = np.array(len(strings.indexes), dtype=np.int64)
+    return arrays
+
+
+def _arrays_to_osm(
+        arrays: Mapping[str, np.ndarray],
+        compact_nodes: bool
+) -> Osm:
+    strings = _StringTable.from_array(
+        arrays['strings'],
+        int(arrays['string_count'])
+    )
+
+    node_ids = arrays['node_ids']
+    node_tags = _arrays_to_tags('node', arrays, strings)
+    if compact_nodes:
+        nodes = CompactNodeStore(
+            node_ids,
+            arrays['node_lat'],
+            arrays['node_lon'],
+            node_tags
+        )
+    else:
+        nodes = dict()
+        for i, (ref, lat, lon) in enumerate(zip(
+                map(str, node_ids.tolist()),
+                arrays['node_lat'].tolist(),
+                arrays['node_lon'].tolist()
+        )):
+            nodes[ref] = Node.from_values(
+                ref,
+                lat,
+                lon,
+                node_tags.get(i) or {}
+            )
+
+    ways = dict()
+    way_node_offsets = arrays['way_node_offsets'].tolist()
+    way_node_refs = list(map(str, arrays['way_node_refs'].tolist()))
+    way_tags = _arrays_to_tags('way', arrays, strings)
+    for i, ref in enumerate(map(str, arrays['way_ids'].tolist())):
+        ways[ref] = Way.from_values(
+            ref,
+            way_node_refs[way_node_offsets[i]:way_node_offsets[i + 1]],
+            way_tags.get(i) or {}
+        )
+
+    relations = dict()
+    member_offsets = arrays['relation_member_offsets'].tolist()
+    members = [
+        Member.from_values(_MEMBER_TYPES[member_type], str(ref), strings[role])
+        for member_type, ref, role in zip(
+            arrays['relation_member_types'].tolist(),
+            arrays['relation_member_refs'].tolist(),
+            arrays['relation_member_roles'].tolist()
+        )
+    ]
+    relation_tags = _arrays_to_tags('relation', arrays, strings)
+    for i, ref in enumerate(map(str, arrays['relation_ids'].tolist())):
+        relations[ref] = Relation.from_values(
+            ref,
+            members[member_offsets[i]:member_offsets[i + 1]],
+            relation_tags.get(i) or {}
+        )
+
+    return Osm(nodes, ways, relations)
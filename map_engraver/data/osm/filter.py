@@ -1,7 +1,8 @@
-from typing import Callable
+from typing import Callable, Dict, Optional, Union, Mapping, List, Tuple
 
-from map_engraver.data.osm import Osm, Element
+from map_engraver.data.osm import Osm, Element, MemberTypes, CompactNodeStore
 from map_engraver.data.osm import OsmSubset
+from map_engraver.data.osm.tag_query import TagQuery
 
 
 def filter_elements(
@@ -38,3 +39,150 @@ def filter_elements(
         ways=ways,
         relations=relations
     )
+
+
+def query_elements(
+        osm: Osm,
+        query: Union[str, TagQuery],
+        filter_nodes: bool = True,
+        filter_ways: bool = True,
+        filter_relations: bool = True,
+) -> OsmSubset:
+    """
+    Returns the elements whose tags match the query. See `TagQuery` for the
+    syntax of queries.
+
+    Unlike `filter_elements()`, which calls a function for every element,
+    elements are looked up in an inverted index of their tags. The index is
+    built once per `Osm` object, so running many queries over the same `Osm`
+    object, for example one for each map layer, is cheap.
+
+    :param osm: The OSM data to query.
+    :param query: The query, either as a string or compiled.
+    :param filter_nodes: Whether to include nodes in the result.
+    :param filter_ways: Whether to include ways in the result.
+    :param filter_relations: Whether to include relations in the result.
+    :return: The matching elements, in their original order.
+    """
+    if isinstance(query, str):
+        query = TagQuery(query)
+
+    nodes = {}
+    ways = {}
+    relations = {}
+
+    if filter_nodes:
+        refs = query.select(osm.get_tag_index(MemberTypes.NODE))
+        nodes = {ref: osm.nodes[ref] for ref in refs}
+
+    if filter_ways:
+        refs = query.select(osm.get_tag_index(MemberTypes.WAY))
+        ways = {ref: osm.ways[ref] for ref in refs}
+
+    if filter_relations:
+        refs = query.select(osm.get_tag_index(MemberTypes.RELATION))
+        relations = {ref: osm.relations[ref] for ref in refs}
+
+    return OsmSubset(
+        nodes=nodes,
+        ways=ways,
+        relations=relations
+    )
+
+
+def classify_elements(
+        osm: Osm,
+        layers: Mapping[
+            str,
+            Union[str, TagQuery, Callable[[Element], bool]]
+        ],
+        first_match: bool = True,
+        filter_nodes: bool = True,
+        filter_ways: bool = True,
+        filter_relations: bool = True,
+) -> Dict[str, OsmSubset]:
+    """
+    Sorts the elements into layers, visiting each element once rather than
+    once per layer.
+
+    Example:
+
+        layers = classify_elements(osm, {
+            'water': 'natural=water | waterway=riverbank',
+            'roads': 'highway~^(primary|secondary)$',
+            'buildings': 'building & building!=no',
+            'other': lambda element: True,
+        })
+
+    :param osm: The OSM data to classify.
+    :param layers: The rules of each layer, in order. A rule is either a
+                   query (see `TagQuery`) or a predicate such as the ones
+                   returned by `has_tags()`.
+    :param first_match: If true, each element is only added to the first
+                        layer it matches. If false, elements are added to all
+                        layers they match.
+    :param filter_nodes: Whether to include nodes in the layers.
+    :param filter_ways: Whether to include ways in the layers.
+    :param filter_relations: Whether to include relations in the layers.
+    :return: The elements of each layer, in the order of the `layers`, with
+             the elements in their original order.
+    """
+    rules: List[Tuple[str, Callable[[Element], bool]]] = [
+        (name, TagQuery(rule) if isinstance(rule, str) else rule)
+        for name, rule in layers.items()
+    ]
+    layer_elements: Dict[str, Tuple[Dict, Dict, Dict]] = {
+        name: ({}, {}, {}) for name in layers.keys()
+    }
+
+    def classify(elements: Mapping[str, Element], type_index: int):
+        for ref, element in elements.items():
+            for name, rule in rules:
+                if rule(element):
+                    layer_elements[name][type_index][ref] = element
+                    if first_match:
+                        break
+
+    if filter_nodes:
+        nodes = osm.nodes
+        if isinstance(nodes, CompactNodeStore) and all(
+                isinstance(rule, TagQuery) and not rule.matches({})
+                for _, rule in rules
+        ):
+            # Most nodes have no tags, and can be skipped if none of the
+            # queries match untagged elements.
+            tagged_refs = map(str, nodes.ids[sorted(nodes.tags)].tolist())
+            nodes = {ref: nodes[ref] for ref in tagged_refs}
+        classify(nodes, 0)
+    if filter_ways:
+        classify(osm.ways, 1)
+    if filter_relations:
+        classify(osm.relations, 2)
+
+    return {
+        name: OsmSubset(nodes=nodes, ways=ways, relations=relations)
+        for name, (nodes, ways, relations) in layer_elements.items()
+    }
+
+
+def has_tags(tags: Dict[str, Optional[str]]) -> Callable[[Element], bool]:
+    """
+    Returns a predicate that matches elements that have all the given tags.
+
+    The predicate can be passed to `Parser.parse()` or `Parser.iterparse()` to
+    filter elements while parsing. For example, `has_tags({'natural':
+    'coastline'})` only keeps coastline ways.
+
+    :param tags: The tags to match. A value of `None` matches any value, as
+                 long as the element has the key.
+    :return: A predicate for OSM elements.
+    """
+    def predicate(element: Element) -> bool:
+        for key, value in tags.items():
+            if key not in element.tags:
+                return False
+            if value is not None and element.tags[key] != value:
+                return False
+        return True
+
+    return predicate
@@ -4,6 +4,7 @@ from enum import Enum, auto
 class MemberTypes(Enum):
     WAY = auto()
     NODE = auto()
+    RELATION = auto()
 
 
 class Member:
@@ -15,7 +16,23 @@ class Member:
     def __init__(self, osm_element):
         if osm_element.attrib['type'] == 'way':
             self.type = MemberTypes.WAY
+        elif osm_element.attrib['type'] == 'relation':
+            self.type = MemberTypes.RELATION
         else:
             self.type = MemberTypes.NODE
         self.ref = osm_element.attrib['ref']
         self.role = osm_element.attrib['role']
+
+    @classmethod
+    def from_values(
+            cls,
+            member_type: MemberTypes,
+            ref: str,
+            role: str
+    ) -> 'Member':
+        """Creates a member without an XML element"""
+        member = cls.__new__(cls)
+        member.type = member_type
+        member.ref = ref
+        member.role = role
+        return member
@@ -1,3 +1,5 @@
+from typing import Dict
+
 from map_engraver.data.osm import Element
 
 
@@ -10,3 +12,19 @@ class Node(Element):
         super().__init__(osm_element)
         self.lat = float(osm_element.attrib['lat'])
         self.lon = float(osm_element.attrib['lon'])
+
+    @classmethod
+    def from_values(
+            cls,
+            ref: str,
+            lat: float,
+            lon: float,
+            tags: Dict[str, str]
+    ) -> 'Node':
+        """Creates a node without an XML element"""
+        node = cls.__new__(cls)
+        node.id = ref
+        node.tags = tags
+        node.lat = lat
+        node.lon = lon
+        return node
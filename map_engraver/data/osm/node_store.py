@@ -0,0 +1,214 @@
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, Iterable
+
+import numpy as np
+
+from map_engraver.data.osm import Node
+
+
+class CompactNodeStore(Mapping):
+    """
+    A read-only mapping of node refs to nodes that stores the nodes in NumPy
+    arrays instead of as individual `Node` objects.
+
+    Node ids are stored as integers, and coordinates as `lat`/`lon` arrays.
+    Since most nodes have no tags, tags are kept in a sparse table indexed by
+    the position of the node. `Node` objects are only created when a node is
+    looked up, which makes it possible to hold millions of nodes in memory.
+
+    The store can be used in place of the `nodes` dictionary of an `Osm`
+    object.
+    """
+    ids: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    tags: Dict[int, Dict[str, str]]
+
+    def __init__(
+            self,
+            ids: np.ndarray,
+            lat: np.ndarray,
+            lon: np.ndarray,
+            tags: Optional[Dict[int, Dict[str, str]]] = None
+    ):
+        """
+        :param ids: The node ids, as integers.
+        :param lat: The latitude of each node.
+        :param lon: The longitude of each node.
+        :param tags: The tags of each node that has tags, indexed by the
+                     position of the node in `ids`.
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.tags = tags if tags is not None else {}
+
+        # OSM files are usually sorted by id, in which case no extra index is
+        # needed to look up nodes.
+        if np.all(self.ids[1:] > self.ids[:-1]):
+            self._sorted_ids = self.ids
+            self._sorted_indexes = None
+        else:
+            self._sorted_indexes = np.argsort(self.ids, kind='stable')
+            self._sorted_ids = self.ids[self._sorted_indexes]
+
+    @staticmethod
+    def from_nodes(nodes: Mapping) -> 'CompactNodeStore':
+        """Creates a store from an existing mapping of refs to nodes"""
+        builder = CompactNodeStoreBuilder()
+        for node in nodes.values():
+            builder.add(node.id, node.lat, node.lon, node.tags)
+        return builder.build()
+
+    def __getitem__(self, ref: str) -> Node:
+        index = self._get_index(ref)
+        return Node.from_values(
+            ref,
+            float(self.lat[index]),
+            float(self.lon[index]),
+            self.tags.get(index, {})
+        )
+
+    def __contains__(self, ref) -> bool:
+        try:
+            self._get_index(ref)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        return map(str, self.ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def get_indexes(
+            self,
+            refs: Iterable[str],
+            default: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Returns the position of each node ref in the `ids`, `lat` and `lon`
+        arrays.
+
+        :param refs: The node refs to look up.
+        :param default: If set, the index returned for refs that do not exist
+                        in the store, for example -1.
+        :return: An array of indexes.
+        :raises KeyError: If any of the refs does not exist in the store, and
+                          no `default` is set.
+        """
+        refs = list(refs)
+        try:
+            keys = np.fromiter(map(int, refs), dtype=np.int64, count=len(refs))
+        except ValueError as error:
+            raise KeyError(str(error))
+        if len(self.ids) == 0:
+            if len(refs) > 0 and default is None:
+                raise KeyError(refs[0])
+            return np.full(len(refs), default or 0, dtype=np.int64)
+        sorted_positions = np.searchsorted(self._sorted_ids, keys)
+        sorted_positions = np.minimum(sorted_positions, len(self.ids) - 1)
+        found = self._sorted_ids[sorted_positions] == keys
+        if not np.all(found) and default is None:
+            raise KeyError(refs[int(np.argmin(found))])
+        if self._sorted_indexes is None:
+            indexes = sorted_positions
+        else:
+            indexes = self._sorted_indexes[sorted_positions]
+        if default is not None:
+            indexes = np.where(found, indexes, default)
+        return indexes
+
+    def select(self, selection: np.ndarray) -> 'CompactNodeStore':
+        """
+        :param selection: A boolean array that selects which of the nodes to
+                          include.
+        :return: A new store with only the selected nodes.
+        """
+        selected_indexes = np.flatnonzero(selection)
+        new_indexes = np.full(len(self.ids), -1, dtype=np.int64)
+        new_indexes[selected_indexes] = np.arange(len(selected_indexes))
+        tags = {
+            int(new_indexes[index]): tags
+            for index, tags in self.tags.items()
+            if selection[index]
+        }
+        return CompactNodeStore(
+            self.ids[selected_indexes],
+            self.lat[selected_indexes],
+            self.lon[selected_indexes],
+            tags
+        )
+
+    def _get_index(self, ref: str) -> int:
+        try:
+            key = int(ref)
+        except (TypeError, ValueError):
+            raise KeyError(ref)
+        sorted_position = int(np.searchsorted(self._sorted_ids, key))
+        if (
+                sorted_position == len(self._sorted_ids) or
+                self._sorted_ids[sorted_position] != key
+        ):
+            raise KeyError(ref)
+        if self._sorted_indexes is None:
+            return sorted_position
+        return int(self._sorted_indexes[sorted_position])
+
+
+class CompactNodeStoreBuilder:
+    """
+    Collects nodes one at a time, without creating `Node` objects, to build a
+    `CompactNodeStore`.
+    """
+
+    def __init__(self):
+        self._ids = array('q')
+        self._lat = array('d')
+        self._lon = array('d')
+        self._tags: Dict[int, Dict[str, str]] = dict()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(
+            self,
+            ref: str,
+            lat: float,
+            lon: float,
+            tags: Dict[str, str]
+    ) -> int:
+        """
+        :return: The position of the node in the builder.
+        """
+        index = len(self._ids)
+        self._ids.append(int(ref))
+        self._lat.append(lat)
+        self._lon.append(lon)
+        if len(tags) > 0:
+            self._tags[index] = tags
+        return index
+
+    def build(
+            self,
+            selection: Optional[np.ndarray] = None
+    ) -> CompactNodeStore:
+        """
+        :param selection: A boolean array that selects which of the added nodes
+                          to include in the store. By default, all nodes are
+                          included.
+        :return: The node store.
+        """
+        ids = np.frombuffer(self._ids, dtype=np.int64).copy()
+        lat = np.frombuffer(self._lat, dtype=np.float64).copy()
+        lon = np.frombuffer(self._lon, dtype=np.float64).copy()
+        store = CompactNodeStore(ids, lat, lon, dict(self._tags))
+        if selection is None:
+            return store
+        return store.select(selection)
+
+    def get_ids(self) -> np.ndarray:
+        """Returns the ids of the nodes added so far"""
+        return np.frombuffer(self._ids, dtype=np.int64).copy()
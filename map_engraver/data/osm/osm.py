@@ -1,26 +1,45 @@
-from typing import Dict
+from typing import Dict, List, Mapping, Optional, Tuple
 
+from . import MemberTypes
 from . import Node
 from . import Way
 from . import Relation
+from .tag_query import TagIndex
 
 
 class Osm:
-    """A container for all objects from an OSM file"""
+    """
+    A container for all objects from an OSM file.
 
-    nodes: Dict[str, type(Node)]
+    The `nodes` can either be a dictionary of `Node` objects, or a
+    `CompactNodeStore`.
+
+    Besides looking up elements by ref, elements can be looked up by the
+    elements they are part of, for example the ways a node belongs to. The
+    indexes for these lookups are built the first time they are needed, and
+    must be cleared with `clear_indexes()` if elements are added or removed
+    afterwards. The same goes for the tag indexes used by
+    `filter.query_elements()`.
+    """
+
+    nodes: Mapping[str, type(Node)]
     ways: Dict[str, type(Way)]
     relations: Dict[str, type(Relation)]
 
     def __init__(
             self,
-            nodes: Dict[str, type(Node)],
+            nodes: Mapping[str, type(Node)],
             ways: Dict[str, type(Way)],
             relations: Dict[str, type(Relation)]
     ):
         self.nodes = nodes
         self.ways = ways
         self.relations = relations
+        self._node_way_index: Optional[Dict[str, List[str]]] = None
+        self._member_relation_index: Optional[
+            Dict[Tuple[MemberTypes, str], List[str]]
+        ] = None
+        self._tag_indexes: Dict[MemberTypes, TagIndex] = dict()
 
     def get_node(self, ref: str) -> Node:
         return self.nodes[ref]
@@ -30,3 +49,75 @@ class Osm:
 
     def get_relation(self, ref: str) -> Relation:
         return self.relations[ref]
+
+    def get_parent_ways(self, node_ref: str) -> List[Way]:
+        """
+        :param node_ref: The ref of the node.
+        :return: The ways that contain the node, in the order of `ways`.
+        """
+        if self._node_way_index is None:
+            self._node_way_index = dict()
+            for way_ref, way in self.ways.items():
+                # Closed ways list their first node twice.
+                for way_node_ref in dict.fromkeys(way.node_refs):
+                    self._node_way_index.setdefault(way_node_ref, []) \
+                        .append(way_ref)
+        return [
+            self.ways[way_ref]
+            for way_ref in self._node_way_index.get(node_ref, [])
+        ]
+
+    def get_parent_relations(
+            self,
+            ref: str,
+            member_type: MemberTypes = MemberTypes.WAY
+    ) -> List[Relation]:
+        """
+        :param ref: The ref of the member element.
+        :param member_type: The type of the member element, since nodes, ways
+                            and relations can have the same ref.
+        :return: The relations that have the element as a member, in the
+                 order of `relations`.
+        """
+        if self._member_relation_index is None:
+            self._member_relation_index = dict()
+            for relation_ref, relation in self.relations.items():
+                members = dict.fromkeys(
+                    (member.type, member.ref) for member in relation.members
+                )
+                for member in members:
+                    self._member_relation_index.setdefault(member, []) \
+                        .append(relation_ref)
+        return [
+            self.relations[relation_ref]
+            for relation_ref in self._member_relation_index.get(
+                (member_type, ref),
+                []
+            )
+        ]
+
+    def get_tag_index(self, element_type: MemberTypes) -> TagIndex:
+        """
+        :param element_type: Whether to return the index of the nodes, ways
+                             or relations.
+        :return: An inverted index from tags to the elements of the type.
+        """
+        if element_type not in self._tag_indexes:
+            if element_type == MemberTypes.NODE:
+                elements = self.nodes
+            elif element_type == MemberTypes.WAY:
+                elements = self.ways
+            else:
+                elements = self.relations
+            self._tag_indexes[element_type] = TagIndex(elements)
+        return self._tag_indexes[element_type]
+
+    def clear_indexes(self):
+        """
+        Clears the indexes used by `get_parent_ways()`,
+        `get_parent_relations()` and `get_tag_index()`, so that they are
+        rebuilt on the next lookup.
+        """
+        self._node_way_index = None
+        self._member_relation_index = None
+        self._tag_indexes = dict()
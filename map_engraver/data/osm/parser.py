@@ -1,17 +1,53 @@
 from pathlib import Path
 
-from typing import Dict
+from typing import Dict, Callable, Iterator, Optional, Set, Tuple, Union
 import xml.etree.ElementTree as ElementTree
 
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+from . import Element
+from . import MemberTypes
 from . import Node
 from . import Way
 from . import Relation
 from . import Osm
+from .node_store import CompactNodeStore, CompactNodeStoreBuilder
+
+Bounds = Union[Tuple[float, float, float, float], Polygon]
 
 
 class Parser:
     @staticmethod
-    def parse(osm_file: Path) -> Osm:
+    def parse(
+            osm_file: Path,
+            element_filter: Optional[Callable[[Element], bool]] = None,
+            compact_nodes: bool = False,
+            bounds: Optional[Bounds] = None,
+            trim_ways: bool = False
+    ) -> Osm:
+        """
+        :param osm_file: The path to the OSM XML file.
+        :param element_filter: If set, only elements matching the filter are
+                               kept. See `iterparse()` for details.
+        :param compact_nodes: If true, nodes are stored in a
+                              `CompactNodeStore`. See `iterparse()` for
+                              details.
+        :param bounds: If set, only elements within the bounds are kept. See
+                       `iterparse()` for details.
+        :param trim_ways: If true, ways crossing the `bounds` are trimmed.
+                          See `iterparse()` for details.
+        :return: The parsed OSM file.
+        """
+        if element_filter is not None or compact_nodes or bounds is not None:
+            return Parser.iterparse(
+                osm_file,
+                element_filter=element_filter,
+                compact_nodes=compact_nodes,
+                bounds=bounds,
+                trim_ways=trim_ways
+            )
         osm_tree = ElementTree.parse(osm_file.as_posix())
         osm_root = osm_tree.getroot()
         nodes = Parser.get_nodes(osm_root)
@@ -19,6 +55,436 @@ class Parser:
         relations = Parser.get_relations(osm_root)
         return Osm(nodes, ways, relations)
 
+    @staticmethod
+    def iterparse(
+            osm_file: Path,
+            element_filter: Optional[Callable[[Element], bool]] = None,
+            compact_nodes: bool = False,
+            bounds: Optional[Bounds] = None,
+            trim_ways: bool = False
+    ) -> Osm:
+        """
+        Parses the OSM file incrementally, usually in a single pass.
+
+        Unlike `parse()`, the XML tree of the whole file is never held in
+        memory. Each node, way and relation is converted as soon as its closing
+        tag has been read, after which the XML element is discarded. Peak
+        memory is therefore bounded by the resulting `Osm` object rather than
+        the size of the XML document.
+
+        If an `element_filter` is given, ways and relations that do not match
+        the filter are discarded while parsing. Ways that are members of a
+        matching relation are kept, even if they do not match the filter
+        themselves. Since relations are listed after ways, those ways have
+        already been discarded by the time the relation is read, so a second
+        pass over the file is made to read them. Only way and node members are
+        kept this way; relations that are members of a matching relation are
+        only kept if they match the filter themselves. Nodes are only kept if
+        they match the filter or if they are referenced by a way or relation
+        that was kept.
+
+        If `bounds` are given, elements outside the bounds are discarded as
+        well. Nodes are kept if they lie within the bounds, ways if any of
+        their segments intersect the bounds, and relations if any of their
+        members are kept. Ways keep all of their nodes, including those outside
+        the bounds, unless `trim_ways` is set. Relations keep all of their
+        member ways, so that multipolygons can still be pieced together.
+
+        :param osm_file: The path to the OSM XML file.
+        :param element_filter: A predicate that returns true for the elements
+                               to keep. See `filter.has_tags()` for a
+                               declarative way to filter elements by tags.
+        :param compact_nodes: If true, the nodes of the `Osm` object are
+                              stored in a `CompactNodeStore` instead of a
+                              dictionary of `Node` objects. This uses a
+                              fraction of the memory for large files.
+        :param bounds: The area to keep elements for, in WGS 84. Either a
+                       bounding box of `(min_lat, min_lon, max_lat, max_lon)`,
+                       or a polygon with `(lat, lon)` coordinates, for example
+                       from `canvas_wgs84_mask()`.
+        :param trim_ways: If true, open ways that cross the `bounds` are
+                          trimmed to the part between the first and last node
+                          within the bounds, plus one node beyond the bounds
+                          on each side, so that the ways still reach across
+                          the boundary. Closed ways and members of relations
+                          are never trimmed.
+        :return: The same `Osm` object that `parse()` would return, minus the
+                 elements excluded by the `element_filter` and `bounds`.
+        """
+        if element_filter is not None or compact_nodes or bounds is not None:
+            return Parser._iterparse_with_node_buffer(
+                osm_file,
+                element_filter,
+                compact_nodes,
+                bounds,
+                trim_ways
+            )
+
+        nodes = dict()
+        ways = dict()
+        relations = dict()
+
+        for osm_element in Parser._iterparse_elements(osm_file):
+            element_type = osm_element.tag
+            if element_type == 'node':
+                node = Node(osm_element)
+                node.tags = Parser.get_element_tags(osm_element)
+                nodes[node.id] = node
+            elif element_type == 'way':
+                way = Way(osm_element)
+                way.tags = Parser.get_element_tags(osm_element)
+                ways[way.id] = way
+            elif element_type == 'relation':
+                relation = Relation(osm_element)
+                relation.tags = Parser.get_element_tags(osm_element)
+                relations[relation.id] = relation
+
+        return Osm(nodes, ways, relations)
+
+    @staticmethod
+    def _iterparse_elements(osm_file: Path) -> Iterator[ElementTree.Element]:
+        """
+        Yields each node, way and relation of the OSM file once the element
+        has been read completely, and discards it once the caller is done with
+        it.
+        """
+        with open(osm_file.as_posix(), 'rb') as osm_source:
+            context = ElementTree.iterparse(
+                osm_source,
+                events=('start', 'end')
+            )
+            _, osm_root = next(context)
+            for event, osm_element in context:
+                if event != 'end':
+                    continue
+                if osm_element.tag not in ('node', 'way', 'relation'):
+                    # Child elements (tags, node refs and members) are needed
+                    # until their parent element has been closed.
+                    continue
+                yield osm_element
+                # Detach everything read so far from the root, so that the
+                # converted XML elements can be garbage collected.
+                osm_root.clear()
+
+    @staticmethod
+    def _iterparse_with_node_buffer(
+            osm_file: Path,
+            element_filter: Optional[Callable[[Element], bool]],
+            compact_nodes: bool,
+            bounds: Optional[Bounds] = None,
+            trim_ways: bool = False
+    ) -> Osm:
+        # Nodes are listed before the ways and relations that reference them,
+        # so while reading nodes we cannot know which ones will be needed.
+        # Until then, nodes are buffered as compact arrays instead of objects.
+        node_buffer = CompactNodeStoreBuilder()
+        matched_node_indexes: Set[int] = set()
+        ways = dict()
+        relations = dict()
+        needed_node_refs: Set[str] = set()
+        needed_way_refs: Set[str] = set()
+
+        for osm_element in Parser._iterparse_elements(osm_file):
+            element_type = osm_element.tag
+            if element_type == 'node':
+                tags = Parser.get_element_tags(osm_element)
+                node_index = node_buffer.add(
+                    osm_element.attrib['id'],
+                    float(osm_element.attrib['lat']),
+                    float(osm_element.attrib['lon']),
+                    tags
+                )
+                if element_filter is None:
+                    continue
+                node = Node(osm_element)
+                node.tags = tags
+                if element_filter(node):
+                    matched_node_indexes.add(node_index)
+            elif element_type == 'way':
+                way = Way(osm_element)
+                way.tags = Parser.get_element_tags(osm_element)
+                if element_filter is None:
+                    ways[way.id] = way
+                elif element_filter(way):
+                    ways[way.id] = way
+                    needed_node_refs.update(way.node_refs)
+            elif element_type == 'relation':
+                relation = Relation(osm_element)
+                relation.tags = Parser.get_element_tags(osm_element)
+                if element_filter is None:
+                    relations[relation.id] = relation
+                elif element_filter(relation):
+                    relations[relation.id] = relation
+                    for member in relation.members:
+                        if member.type == MemberTypes.WAY:
+                            needed_way_refs.add(member.ref)
+                        elif member.type == MemberTypes.NODE:
+                            needed_node_refs.add(member.ref)
+
+        matched_way_refs = None
+        if element_filter is not None:
+            matched_way_refs = set(ways.keys())
+            # Relations can have member ways that did not match the filter.
+            # Since relations are listed after ways, a second pass is needed
+            # to read them.
+            missing_way_refs = needed_way_refs.difference(ways.keys())
+            if len(missing_way_refs) > 0:
+                ways = Parser._iterparse_missing_ways(
+                    osm_file,
+                    ways,
+                    missing_way_refs
+                )
+                for way_ref in missing_way_refs:
+                    if way_ref in ways:
+                        needed_node_refs.update(ways[way_ref].node_refs)
+
+        if bounds is not None:
+            if element_filter is None:
+                matched_nodes = np.ones(len(node_buffer), dtype=bool)
+            else:
+                matched_nodes = np.zeros(len(node_buffer), dtype=bool)
+                matched_nodes[list(matched_node_indexes)] = True
+            # The store of all nodes is built once, and the nodes to keep are
+            # selected from it, so that the coordinates are not copied twice.
+            all_nodes = node_buffer.build()
+            ways, relations, node_selection = Parser._clip_to_bounds(
+                all_nodes,
+                ways,
+                relations,
+                matched_nodes,
+                matched_way_refs,
+                bounds,
+                trim_ways
+            )
+            node_store = all_nodes.select(node_selection)
+        elif element_filter is None:
+            node_store = node_buffer.build()
+        else:
+            node_selection = np.zeros(len(node_buffer), dtype=bool)
+            node_selection[list(matched_node_indexes)] = True
+            needed_node_ids = []
+            for node_ref in needed_node_refs:
+                try:
+                    needed_node_ids.append(int(node_ref))
+                except ValueError:
+                    continue
+            node_selection |= np.isin(
+                node_buffer.get_ids(),
+                np.array(needed_node_ids, dtype=np.int64)
+            )
+            node_store = node_buffer.build(node_selection)
+
+        if compact_nodes:
+            return Osm(node_store, ways, relations)
+        return Osm(dict(node_store.items()), ways, relations)
+
+    @staticmethod
+    def _clip_to_bounds(
+            nodes: CompactNodeStore,
+            ways: Dict[str, Way],
+            relations: Dict[str, Relation],
+            matched_nodes: np.ndarray,
+            matched_way_refs: Optional[Set[str]],
+            bounds: Bounds,
+            trim_ways: bool
+    ) -> Tuple[Dict[str, Way], Dict[str, Relation], np.ndarray]:
+        """
+        Removes the elements outside the bounds. See `iterparse()` for
+        details.
+
+        :param nodes: All nodes of the OSM file.
+        :param ways: The ways to clip.
+        :param relations: The relations to clip.
+        :param matched_nodes: The nodes that can be kept on their own, rather
+                              than just as part of a way or relation.
+        :param matched_way_refs: The ways that can be kept on their own. If
+                                 `None`, all ways can be.
+        :param bounds: The area to keep elements for.
+        :param trim_ways: Whether to trim ways crossing the bounds.
+        :return: The clipped ways and relations, and a selection of the nodes
+                 to keep.
+        """
+        if isinstance(bounds, Polygon):
+            bounds_polygon = bounds
+        else:
+            bounds_polygon = shapely.box(*bounds)
+        shapely.prepare(bounds_polygon)
+        min_lat, min_lon, max_lat, max_lon = bounds_polygon.bounds
+        if isinstance(bounds, Polygon):
+            node_inside = shapely.intersects_xy(
+                bounds_polygon,
+                nodes.lat,
+                nodes.lon
+            )
+        else:
+            node_inside = (
+                (nodes.lat >= min_lat) & (nodes.lat <= max_lat) &
+                (nodes.lon >= min_lon) & (nodes.lon <= max_lon)
+            )
+
+        # Look up the nodes of all ways at once. Nodes that are missing from
+        # the file are treated as outside the bounds.
+        way_refs = list(ways.keys())
+        node_counts = np.array(
+            [len(ways[way_ref].node_refs) for way_ref in way_refs],
+            dtype=np.int64
+        )
+        starts = np.zeros(len(way_refs), dtype=np.int64)
+        starts[1:] = np.cumsum(node_counts)[:-1]
+        way_node_indexes = nodes.get_indexes(
+            (
+                node_ref
+                for way_ref in way_refs
+                for node_ref in ways[way_ref].node_refs
+            ),
+            default=-1
+        )
+        way_node_found = way_node_indexes >= 0
+        way_node_inside = np.zeros(len(way_node_indexes), dtype=bool)
+        way_node_inside[way_node_found] = \
+            node_inside[way_node_indexes[way_node_found]]
+        positions = np.arange(len(way_node_indexes)) - \
+            np.repeat(starts, node_counts)
+
+        # The first and last node of each way within the bounds, or -1 if
+        # there are none.
+        first_inside = np.full(len(way_refs), -1, dtype=np.int64)
+        last_inside = np.full(len(way_refs), -1, dtype=np.int64)
+        non_empty = node_counts > 0
+        if np.any(non_empty):
+            first_inside[non_empty] = np.minimum.reduceat(
+                np.where(way_node_inside, positions, len(positions)),
+                starts[non_empty]
+            )
+            last_inside[non_empty] = np.maximum.reduceat(
+                np.where(way_node_inside, positions, -1),
+                starts[non_empty]
+            )
+        first_inside[first_inside == len(positions)] = -1
+
+        # Ways without nodes within the bounds can still cross the bounds, or
+        # enclose them entirely. Those ways are found by checking the ways
+        # whose bounding box overlaps the bounds.
+        way_intersects = last_inside >= 0
+        way_node_lat = np.full(len(way_node_indexes), np.nan)
+        way_node_lon = np.full(len(way_node_indexes), np.nan)
+        way_node_lat[way_node_found] = \
+            nodes.lat[way_node_indexes[way_node_found]]
+        way_node_lon[way_node_found] = \
+            nodes.lon[way_node_indexes[way_node_found]]
+        for i in np.flatnonzero(~way_intersects & (node_counts > 1)).tolist():
+            segment = slice(starts[i], starts[i] + node_counts[i])
+            found = way_node_found[segment]
+            if np.count_nonzero(found) < 2:
+                continue
+            lat = way_node_lat[segment][found]
+            lon = way_node_lon[segment][found]
+            if (
+                    lat.max() < min_lat or lat.min() > max_lat or
+                    lon.max() < min_lon or lon.min() > max_lon
+            ):
+                continue
+            coords = np.column_stack((lat, lon))
+            node_refs = ways[way_refs[i]].node_refs
+            if len(coords) > 3 and node_refs[0] == node_refs[-1]:
+                geom = shapely.polygons(coords)
+            else:
+                geom = shapely.linestrings(coords)
+            way_intersects[i] = bounds_polygon.intersects(geom)
+
+        intersecting_way_refs = {
+            way_refs[i] for i in np.flatnonzero(way_intersects).tolist()
+        }
+
+        # Keep relations with any member within the bounds, along with all of
+        # their member ways.
+        clipped_relations = dict()
+        relation_way_refs = set()
+        relation_node_refs = []
+        for ref, relation in relations.items():
+            has_member_inside = False
+            for member in relation.members:
+                if member.type == MemberTypes.WAY:
+                    if member.ref in intersecting_way_refs:
+                        has_member_inside = True
+                        break
+                elif member.type == MemberTypes.NODE and member.ref in nodes:
+                    if node_inside[nodes.get_indexes([member.ref])[0]]:
+                        has_member_inside = True
+                        break
+            if not has_member_inside:
+                continue
+            clipped_relations[ref] = relation
+            for member in relation.members:
+                if member.type == MemberTypes.WAY:
+                    relation_way_refs.add(member.ref)
+                elif member.type == MemberTypes.NODE:
+                    relation_node_refs.append(member.ref)
+
+        clipped_ways = dict()
+        way_kept = np.zeros(len(way_refs), dtype=bool)
+        keep_from = np.zeros(len(way_refs), dtype=np.int64)
+        keep_to = node_counts - 1
+        for i, ref in enumerate(way_refs):
+            way = ways[ref]
+            if ref in relation_way_refs:
+                clipped_ways[ref] = way
+                way_kept[i] = True
+                continue
+            if not way_intersects[i] or (
+                    matched_way_refs is not None and
+                    ref not in matched_way_refs
+            ):
+                continue
+            clipped_ways[ref] = way
+            way_kept[i] = True
+            is_closed = len(way.node_refs) > 1 and \
+                way.node_refs[0] == way.node_refs[-1]
+            if trim_ways and not is_closed and last_inside[i] >= 0:
+                keep_from[i] = max(first_inside[i] - 1, 0)
+                keep_to[i] = min(last_inside[i] + 1, node_counts[i] - 1)
+                way.node_refs = way.node_refs[keep_from[i]:keep_to[i] + 1]
+
+        # Keep the nodes within the bounds, and the nodes of the kept ways and
+        # relations.
+        node_selection = matched_nodes & node_inside
+        way_node_kept = np.repeat(way_kept, node_counts) & \
+            (positions >= np.repeat(keep_from, node_counts)) & \
+            (positions <= np.repeat(keep_to, node_counts)) & \
+            way_node_found
+        node_selection[way_node_indexes[way_node_kept]] = True
+        relation_node_indexes = nodes.get_indexes(
+            relation_node_refs,
+            default=-1
+        )
+        node_selection[relation_node_indexes[relation_node_indexes >= 0]] = \
+            True
+
+        return clipped_ways, clipped_relations, node_selection
+
+    @staticmethod
+    def _iterparse_missing_ways(
+            osm_file: Path,
+            ways: Dict[str, Way],
+            missing_way_refs: Set[str]
+    ) -> Dict[str, Way]:
+        """
+        Returns the `ways` with the missing ways added, in the order they are
+        listed in the OSM file.
+        """
+        ordered_ways = dict()
+        for osm_element in Parser._iterparse_elements(osm_file):
+            if osm_element.tag != 'way':
+                continue
+            way_ref = osm_element.attrib['id']
+            if way_ref in ways:
+                ordered_ways[way_ref] = ways[way_ref]
+            elif way_ref in missing_way_refs:
+                way = Way(osm_element)
+                way.tags = Parser.get_element_tags(osm_element)
+                ordered_ways[way_ref] = way
+        return ordered_ways
+
     @staticmethod
     def get_element_tags(osm_element: ElementTree) -> Dict[str, str]:
         """Get all key value information for an element (node/way/relation)"""
@@ -0,0 +1,638 @@
+import lzma
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from . import Member
+from . import MemberTypes
+from . import Node
+from . import Way
+from . import Relation
+from . import Osm
+from .node_store import CompactNodeStore
+
+# The features a PBF file may require from the reader. Files with historical
+# information (multiple versions of each object) are not supported.
+SUPPORTED_FEATURES = {'OsmSchema-V0.6', 'DenseNodes'}
+
+# Relation member types, as encoded in PBF files.
+_PBF_MEMBER_TYPES = {
+    0: MemberTypes.NODE,
+    1: MemberTypes.WAY,
+    2: MemberTypes.RELATION,
+}
+
+
+class PbfParseError(Exception):
+    pass
+
+
+class PbfParser:
+    @staticmethod
+    def parse(
+            pbf_file: Path,
+            compact_nodes: bool = False,
+            workers: Optional[int] = None
+    ) -> Osm:
+        """
+        Parses an OSM PBF file, returning the same `Osm` object that
+        `Parser.parse()` returns for the equivalent OSM XML file.
+
+        PBF files are split into blocks of up to 8000 elements that can be
+        decoded independently, so blocks are decompressed and decoded in a
+        pool of processes. Only the file reading and the construction of the
+        `Osm` object happen in the calling process.
+
+        :param pbf_file: The path to the OSM PBF file.
+        :param compact_nodes: If true, the nodes of the `Osm` object are
+                              stored in a `CompactNodeStore`. See
+                              `Parser.iterparse()` for details.
+        :param workers: The number of processes to decode blocks with. By
+                        default, one per CPU. If 1, blocks are decoded in the
+                        calling process.
+        :return: The parsed OSM file.
+        :raises PbfParseError: If the file is not a valid PBF file, or uses
+                               features that are not supported.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        node_ids = []
+        node_lat = []
+        node_lon = []
+        node_tags: Dict[int, Dict[str, str]] = dict()
+        node_count = 0
+        ways = dict()
+        relations = dict()
+
+        with open(pbf_file.as_posix(), 'rb') as pbf_source:
+            blobs = PbfParser._read_data_blobs(pbf_source)
+            for block in PbfParser._decode_blocks(blobs, workers):
+                node_ids.append(block.node_ids)
+                node_lat.append(block.node_lat)
+                node_lon.append(block.node_lon)
+                for index, tags in block.node_tags.items():
+                    node_tags[node_count + index] = tags
+                node_count += len(block.node_ids)
+                PbfParser._add_ways(ways, block)
+                PbfParser._add_relations(relations, block)
+
+        node_store = CompactNodeStore(
+            np.concatenate(node_ids) if node_count > 0 else [],
+            np.concatenate(node_lat) if node_count > 0 else [],
+            np.concatenate(node_lon) if node_count > 0 else [],
+            node_tags
+        )
+        if compact_nodes:
+            return Osm(node_store, ways, relations)
+        nodes = dict()
+        for index, (ref, lat, lon) in enumerate(zip(
+                map(str, node_store.ids.tolist()),
+                node_store.lat.tolist(),
+                node_store.lon.tolist()
+        )):
+            nodes[ref] = Node.from_values(
+                ref,
+                lat,
+                lon,
+                node_tags.get(index) or {}
+            )
+        return Osm(nodes, ways, relations)
+
+    @staticmethod
+    def _add_ways(ways: Dict[str, Way], block: '_PrimitiveBlock'):
+        offsets = block.way_node_offsets.tolist()
+        node_refs = list(map(str, block.way_node_refs.tolist()))
+        for index, ref in enumerate(map(str, block.way_ids.tolist())):
+            ways[ref] = Way.from_values(
+                ref,
+                node_refs[offsets[index]:offsets[index + 1]],
+                block.way_tags.get(index) or {}
+            )
+
+    @staticmethod
+    def _add_relations(
+            relations: Dict[str, Relation],
+            block: '_PrimitiveBlock'
+    ):
+        offsets = block.relation_member_offsets.tolist()
+        members = [
+            Member.from_values(_PBF_MEMBER_TYPES[member_type], str(ref), role)
+            for member_type, ref, role in zip(
+                block.relation_member_types.tolist(),
+                block.relation_member_refs.tolist(),
+                block.relation_member_roles
+            )
+        ]
+        for index, ref in enumerate(map(str, block.relation_ids.tolist())):
+            relations[ref] = Relation.from_values(
+                ref,
+                members[offsets[index]:offsets[index + 1]],
+                block.relation_tags.get(index) or {}
+            )
+
+    @staticmethod
+    def _read_data_blobs(pbf_source: BinaryIO) -> Iterator[bytes]:
+        """
+        Yields the encoded `Blob` messages of each `OSMData` block, after
+        checking that the `OSMHeader` block has no unsupported features.
+        """
+        while True:
+            header_size_bytes = pbf_source.read(4)
+            if len(header_size_bytes) == 0:
+                return
+            if len(header_size_bytes) != 4:
+                raise PbfParseError('Unexpected end of file')
+            header_size = struct.unpack('>I', header_size_bytes)[0]
+            blob_type = None
+            blob_size = 0
+            for field, _, value in _iter_fields(pbf_source.read(header_size)):
+                if field == 1:
+                    blob_type = bytes(value).decode('utf-8')
+                elif field == 3:
+                    blob_size = value
+            blob = pbf_source.read(blob_size)
+            if len(blob) != blob_size:
+                raise PbfParseError('Unexpected end of file')
+            if blob_type == 'OSMHeader':
+                _check_header_block(_decompress_blob(blob))
+            elif blob_type == 'OSMData':
+                yield blob
+
+    @staticmethod
+    def _decode_blocks(
+            blobs: Iterator[bytes],
+            workers: int
+    ) -> Iterator['_PrimitiveBlock']:
+        """
+        Decodes the blobs, in order, using a pool of processes. At most a few
+        blobs per process are read ahead, so that memory usage does not grow
+        with the size of the file.
+        """
+        if workers <= 1:
+            for blob in blobs:
+                yield _decode_primitive_block(blob)
+            return
+
+        # Small files often only have a single block, in which case starting
+        # a process pool is not worth it.
+        first_blob = next(blobs, None)
+        second_blob = next(blobs, None)
+        if first_blob is None:
+            return
+        if second_blob is None:
+            yield _decode_primitive_block(first_blob)
+            return
+
+        with ProcessPoolExecutor(workers) as executor:
+            pending: Deque = deque()
+            for blob in _chain_blobs(first_blob, second_blob, blobs):
+                pending.append(executor.submit(_decode_primitive_block, blob))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while len(pending) > 0:
+                yield pending.popleft().result()
+
+
+def _chain_blobs(
+        first_blob: bytes,
+        second_blob: bytes,
+        blobs: Iterator[bytes]
+) -> Iterator[bytes]:
+    yield first_blob
+    yield second_blob
+    yield from blobs
+
+
+class _PrimitiveBlock:
+    """
+    The elements of a decoded `PrimitiveBlock`. Elements are kept as arrays,
+    so that they can be cheaply sent back from the worker processes. Tags are
+    indexed by the position of the element in the block.
+    """
+
+    def __init__(self):
+        self.node_ids = np.zeros(0, dtype=np.int64)
+        self.node_lat = np.zeros(0, dtype=np.float64)
+        self.node_lon = np.zeros(0, dtype=np.float64)
+        self.node_tags: Dict[int, Dict[str, str]] = dict()
+        self.way_ids = np.zeros(0, dtype=np.int64)
+        self.way_node_offsets = np.zeros(1, dtype=np.int64)
+        self.way_node_refs = np.zeros(0, dtype=np.int64)
+        self.way_tags: Dict[int, Dict[str, str]] = dict()
+        self.relation_ids = np.zeros(0, dtype=np.int64)
+        self.relation_member_offsets = np.zeros(1, dtype=np.int64)
+        self.relation_member_types = np.zeros(0, dtype=np.int64)
+        self.relation_member_refs = np.zeros(0, dtype=np.int64)
+        self.relation_member_roles: List[str] = []
+        self.relation_tags: Dict[int, Dict[str, str]] = dict()
+
+
+def _decode_primitive_block(blob: bytes) -> _PrimitiveBlock:
+    data = _decompress_blob(blob)
+
+    strings: List[str] = []
+    groups = []
+    granularity = 100
+    lat_offset = 0
+    lon_offset = 0
+    for field, _, value in _iter_fields(data):
+        if field == 1:
+            strings = [
+                bytes(string).decode('utf-8')
+                for string_field, _, string in _iter_fields(value)
+                if string_field == 1
+            ]
+        elif field == 2:
+            groups.append(value)
+        elif field == 17:
+            granularity = value
+        elif field == 19:
+            lat_offset = _to_signed(value)
+        elif field == 20:
+            lon_offset = _to_signed(value)
+
+    node_ids = []
+    node_lat = []
+    node_lon = []
+    node_tags = []
+    ways = []
+    relations = []
+    for group in groups:
+        for field, _, value in _iter_fields(group):
+            if field == 1:
+                ids, lat, lon, tags = _decode_node(value, strings)
+                node_ids.append(ids)
+                node_lat.append(lat)
+                node_lon.append(lon)
+                node_tags.append(tags)
+            elif field == 2:
+                ids, lat, lon, tags = _decode_dense_nodes(value, strings)
+                node_ids.append(ids)
+                node_lat.append(lat)
+                node_lon.append(lon)
+                node_tags.append(tags)
+            elif field == 3:
+                ways.append(_decode_way(value))
+            elif field == 4:
+                relations.append(_decode_relation(value))
+            elif field == 5:
+                continue  # Changesets are not needed.
+
+    block = _PrimitiveBlock()
+    if len(node_ids) > 0:
+        block.node_ids = np.concatenate(node_ids)
+        # Coordinates are stored in nanodegrees. Dividing the exact integer,
+        # rather than multiplying by 1e-9, gives the same floats as parsing
+        # the decimal coordinates of the XML format.
+        block.node_lat = (
+            lat_offset + granularity * np.concatenate(node_lat)
+        ) / 1e9
+        block.node_lon = (
+            lon_offset + granularity * np.concatenate(node_lon)
+        ) / 1e9
+        node_count = 0
+        for ids, tags in zip(node_ids, node_tags):
+            for index, element_tags in tags.items():
+                block.node_tags[node_count + index] = element_tags
+            node_count += len(ids)
+
+    if len(ways) > 0:
+        block.way_ids = np.array([way[0] for way in ways], dtype=np.int64)
+        refs, ref_counts = _decode_varint_segments([way[3] for way in ways])
+        block.way_node_offsets = np.zeros(len(ways) + 1, dtype=np.int64)
+        block.way_node_offsets[1:] = np.cumsum(ref_counts)
+        block.way_node_refs = _delta_decode_segments(
+            _zigzag_array(refs),
+            ref_counts
+        )
+        block.way_tags = _decode_segment_tags(
+            [way[1] for way in ways],
+            [way[2] for way in ways],
+            strings
+        )
+
+    if len(relations) > 0:
+        block.relation_ids = np.array(
+            [relation[0] for relation in relations],
+            dtype=np.int64
+        )
+        roles, role_counts = _decode_varint_segments(
+            [relation[3] for relation in relations]
+        )
+        refs, ref_counts = _decode_varint_segments(
+            [relation[4] for relation in relations]
+        )
+        types, _ = _decode_varint_segments(
+            [relation[5] for relation in relations]
+        )
+        block.relation_member_offsets = np.zeros(
+            len(relations) + 1,
+            dtype=np.int64
+        )
+        block.relation_member_offsets[1:] = np.cumsum(role_counts)
+        block.relation_member_types = types.astype(np.int64)
+        block.relation_member_refs = _delta_decode_segments(
+            _zigzag_array(refs),
+            ref_counts
+        )
+        block.relation_member_roles = [
+            strings[role] for role in roles.tolist()
+        ]
+        block.relation_tags = _decode_segment_tags(
+            [relation[1] for relation in relations],
+            [relation[2] for relation in relations],
+            strings
+        )
+
+    return block
+
+
+def _decode_node(
+        data: memoryview,
+        strings: List[str]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[int, Dict[str, str]]]:
+    node_id = 0
+    keys = np.zeros(0, dtype=np.uint64)
+    values = np.zeros(0, dtype=np.uint64)
+    lat = 0
+    lon = 0
+    for field, _, value in _iter_fields(data):
+        if field == 1:
+            node_id = _zigzag(value)
+        elif field == 2:
+            keys = _decode_varints(value)
+        elif field == 3:
+            values = _decode_varints(value)
+        elif field == 8:
+            lat = _zigzag(value)
+        elif field == 9:
+            lon = _zigzag(value)
+    tags = _decode_tags(keys, values, strings)
+    return (
+        np.array([node_id], dtype=np.int64),
+        np.array([lat], dtype=np.int64),
+        np.array([lon], dtype=np.int64),
+        {0: tags} if len(tags) > 0 else {}
+    )
+
+
+def _decode_dense_nodes(
+        data: memoryview,
+        strings: List[str]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[int, Dict[str, str]]]:
+    ids = np.zeros(0, dtype=np.int64)
+    lat = np.zeros(0, dtype=np.int64)
+    lon = np.zeros(0, dtype=np.int64)
+    keys_vals = np.zeros(0, dtype=np.uint64)
+    for field, _, value in _iter_fields(data):
+        if field == 1:
+            ids = np.cumsum(_zigzag_array(_decode_varints(value)))
+        elif field == 8:
+            lat = np.cumsum(_zigzag_array(_decode_varints(value)))
+        elif field == 9:
+            lon = np.cumsum(_zigzag_array(_decode_varints(value)))
+        elif field == 10:
+            keys_vals = _decode_varints(value)
+
+    # The keys and values of all nodes are listed in one array, with the tags
+    # of each node terminated by a 0. If no node has tags, it may be empty.
+    tags = dict()
+    if len(keys_vals) > 0:
+        delimiters = np.flatnonzero(keys_vals == 0)
+        starts = np.concatenate(([0], delimiters[:-1] + 1))
+        for index in np.flatnonzero(delimiters > starts).tolist():
+            key_vals = keys_vals[starts[index]:delimiters[index]]
+            tags[index] = _decode_tags(key_vals[0::2], key_vals[1::2], strings)
+    return ids, lat, lon, tags
+
+
+def _decode_way(data: memoryview) -> Tuple[int, bytes, bytes, bytes]:
+    """
+    :return: The id of the way, and its keys, values and node refs as packed
+             varints. Packed fields are decoded for all ways of a block at
+             once, since decoding them one way at a time is much slower.
+    """
+    way_id = 0
+    keys = b''
+    values = b''
+    refs = b''
+    for field, _, value in _iter_fields(data):
+        if field == 1:
+            way_id = _to_signed(value)
+        elif field == 2:
+            keys = value
+        elif field == 3:
+            values = value
+        elif field == 8:
+            refs = value
+    return way_id, keys, values, refs
+
+
+def _decode_relation(
+        data: memoryview
+) -> Tuple[int, bytes, bytes, bytes, bytes, bytes]:
+    """
+    :return: The id of the relation, and its keys, values, member roles,
+             member refs and member types as packed varints.
+    """
+    relation_id = 0
+    keys = b''
+    values = b''
+    roles = b''
+    refs = b''
+    types = b''
+    for field, _, value in _iter_fields(data):
+        if field == 1:
+            relation_id = _to_signed(value)
+        elif field == 2:
+            keys = value
+        elif field == 3:
+            values = value
+        elif field == 8:
+            roles = value
+        elif field == 9:
+            refs = value
+        elif field == 10:
+            types = value
+    return relation_id, keys, values, roles, refs, types
+
+
+def _decode_segment_tags(
+        keys: List[bytes],
+        values: List[bytes],
+        strings: List[str]
+) -> Dict[int, Dict[str, str]]:
+    """
+    :return: The tags of each element that has tags, indexed by the position
+             of the element.
+    """
+    keys, key_counts = _decode_varint_segments(keys)
+    values, _ = _decode_varint_segments(values)
+    keys = [strings[key] for key in keys.tolist()]
+    values = [strings[value] for value in values.tolist()]
+    offsets = np.concatenate(([0], np.cumsum(key_counts))).tolist()
+    return {
+        index: dict(zip(
+            keys[offsets[index]:offsets[index + 1]],
+            values[offsets[index]:offsets[index + 1]]
+        ))
+        for index in np.flatnonzero(key_counts).tolist()
+    }
+
+
+def _decode_tags(
+        keys: np.ndarray,
+        values: np.ndarray,
+        strings: List[str]
+) -> Dict[str, str]:
+    return {
+        strings[key]: strings[value]
+        for key, value in zip(keys.tolist(), values.tolist())
+    }
+
+
+def _check_header_block(data: bytes):
+    for field, _, value in _iter_fields(data):
+        if field == 4:
+            feature = bytes(value).decode('utf-8')
+            if feature not in SUPPORTED_FEATURES:
+                raise PbfParseError(
+                    'PBF file requires an unsupported feature: ' + feature
+                )
+
+
+def _decompress_blob(blob: bytes) -> memoryview:
+    for field, _, value in _iter_fields(blob):
+        if field == 1:
+            return value
+        elif field == 3:
+            return memoryview(zlib.decompress(value))
+        elif field == 4:
+            return memoryview(lzma.decompress(value))
+        elif field in (5, 6, 7):
+            raise PbfParseError(
+                'PBF file uses an unsupported compression. Only zlib and lzma '
+                'compressed files are supported.'
+            )
+    raise PbfParseError('PBF blob has no data')
+
+
+def _iter_fields(data) -> Iterator[Tuple[int, int, object]]:
+    """
+    Yields the field number, wire type and value of each field in an encoded
+    protobuf message. Varints are returned as unsigned integers, and
+    length-delimited fields as memoryviews.
+    """
+    data = memoryview(data)
+    position = 0
+    end = len(data)
+    while position < end:
+        key, position = _read_varint(data, position)
+        field = key >> 3
+        wire_type = key & 0x7
+        if wire_type == 0:
+            value, position = _read_varint(data, position)
+        elif wire_type == 2:
+            length, position = _read_varint(data, position)
+            value = data[position:position + length]
+            position += length
+        elif wire_type == 1:
+            value = data[position:position + 8]
+            position += 8
+        elif wire_type == 5:
+            value = data[position:position + 4]
+            position += 4
+        else:
+            raise PbfParseError('Unsupported protobuf wire type')
+        yield field, wire_type, value
+
+
+def _read_varint(data: memoryview, position: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def _decode_varints(data) -> np.ndarray:
+    """
+    Decodes a packed array of varints as unsigned 64-bit integers.
+
+    Each byte holds 7 bits of a number, and the last byte of each number is
+    the one without the continuation bit. Rather than reading the bytes one at
+    a time, the bits of each byte are shifted into place and summed per number.
+    """
+    data = np.frombuffer(data, dtype=np.uint8)
+    if len(data) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) == 0 or ends[-1] != len(data) - 1:
+        raise PbfParseError('Truncated varint')
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    numbers = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = (np.arange(len(data)) - starts[numbers]) * 7
+    values = (data & 0x7f).astype(np.uint64) << shifts.astype(np.uint64)
+    return np.add.reduceat(values, starts)
+
+
+def _decode_varint_segments(
+        segments: List[bytes]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decodes several packed arrays of varints at once.
+
+    :return: The values of all segments, and the number of values in each
+             segment.
+    """
+    data = b''.join(segments)
+    values = _decode_varints(data)
+    is_end = np.frombuffer(data, dtype=np.uint8) < 0x80
+    end_counts = np.zeros(len(is_end) + 1, dtype=np.int64)
+    end_counts[1:] = np.cumsum(is_end)
+    byte_offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+    byte_offsets[1:] = np.cumsum([len(segment) for segment in segments])
+    return values, np.diff(end_counts[byte_offsets])
+
+
+def _delta_decode_segments(
+        deltas: np.ndarray,
+        counts: np.ndarray
+) -> np.ndarray:
+    """
+    Sums up the delta encoded values of each segment, where the first value
+    of each segment is relative to 0.
+    """
+    if len(deltas) == 0:
+        return np.zeros(0, dtype=np.int64)
+    sums = np.cumsum(deltas)
+    starts = np.zeros(len(counts), dtype=np.int64)
+    starts[1:] = np.cumsum(counts)[:-1]
+    sums_before = np.where(starts > 0, sums[np.maximum(starts - 1, 0)], 0)
+    return sums - np.repeat(sums_before, counts)
+
+
+def _zigzag_array(values: np.ndarray) -> np.ndarray:
+    return (values >> np.uint64(1)).astype(np.int64) ^ \
+        -(values & np.uint64(1)).astype(np.int64)
+
+
+def _zigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+def _to_signed(value: int) -> int:
+    return value - (1 << 64) if value >= (1 << 63) else value
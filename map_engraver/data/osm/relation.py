@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 import xml.etree.ElementTree as ElementTree
 from . import Member, Element
 
@@ -10,9 +10,20 @@ class Relation(Element):
     def __init__(self, osm_element):
         super().__init__(osm_element)
         self.members = Relation._get_relation_members(osm_element)
-        self.relations = []
-        self.neighboring_ways = []
-        self.neighboring_relations = []
+
+    @classmethod
+    def from_values(
+            cls,
+            ref: str,
+            members: List[type(Member)],
+            tags: Dict[str, str]
+    ) -> 'Relation':
+        """Creates a relation without an XML element"""
+        relation = cls.__new__(cls)
+        relation.id = ref
+        relation.tags = tags
+        relation.members = members
+        return relation
 
     @staticmethod
     def _get_relation_members(osm_element: ElementTree) -> List[type(Member)]:
@@ -0,0 +1,355 @@
+import abc
+import re
+from typing import Dict, List, Optional, Set, Mapping
+
+from map_engraver.data.osm import Element
+from map_engraver.data.osm.node_store import CompactNodeStore
+
+
+class TagQuerySyntaxError(Exception):
+    pass
+
+
+class TagIndex:
+    """
+    An inverted index from tags to the elements that have them.
+
+    Elements are identified by their position in the `nodes`, `ways` or
+    `relations` of the `Osm` object, so that query results can be returned in
+    their original order.
+    """
+    refs: List[str]
+    tags: Dict[str, Dict[str, List[int]]]
+
+    def __init__(self, elements: Mapping[str, Element]):
+        """
+        :param elements: The nodes, ways or relations of an `Osm` object.
+        """
+        self.refs = list(elements.keys())
+        self.tags = dict()
+        if isinstance(elements, CompactNodeStore):
+            # The store keeps the tags of the few nodes that have them
+            # separately, which saves creating a `Node` for every node.
+            tagged_elements = elements.tags.items()
+        else:
+            tagged_elements = (
+                (position, element.tags)
+                for position, element in enumerate(elements.values())
+            )
+        for position, element_tags in tagged_elements:
+            for key, value in element_tags.items():
+                self.tags.setdefault(key, dict()) \
+                    .setdefault(value, []) \
+                    .append(position)
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+    def get_refs(self, positions: Set[int]) -> List[str]:
+        """Returns the refs of the elements at the positions, in order"""
+        return [self.refs[position] for position in sorted(positions)]
+
+
+class TagQuery:
+    """
+    A compiled query that matches OSM elements by their tags.
+
+    Queries consist of conditions on tags, combined with `&` (and), `|` (or),
+    `!` (not) and parentheses. The conditions are:
+
+    - `key`: The element has the tag, with any value.
+    - `key=value`: The element has the tag with the value.
+    - `key!=value`: The element does not have the tag with the value.
+    - `key~regex`: The element has the tag, with a value that matches the
+      regular expression.
+    - `key!~regex`: The element does not have a matching value.
+
+    Keys and values can be quoted with `'` or `"` if they contain spaces or
+    operators. Regular expressions extend to the next whitespace, so they can
+    contain operators without quotes, for example `highway~^(primary|
+    secondary)$`.
+
+    Example:
+
+        query = TagQuery('building & !(building=no | demolished)')
+        osm = Parser.parse(path, element_filter=query)
+
+    A query can be called with an element, which makes it usable as the
+    `element_filter` of `Parser.parse()`. To query elements of an `Osm`
+    object, use `filter.query_elements()`, which looks up elements in an
+    inverted index of the tags, rather than checking every element.
+    """
+
+    def __init__(self, query: str):
+        """
+        :param query: The query to compile.
+        :raises TagQuerySyntaxError: If the query is not valid.
+        """
+        self.query = query
+        parser = _QueryParser(query)
+        self._root = parser.parse()
+
+    def __call__(self, element: Element) -> bool:
+        return self._root.matches(element.tags)
+
+    def __repr__(self) -> str:
+        return 'TagQuery(%r)' % self.query
+
+    def matches(self, tags: Dict[str, str]) -> bool:
+        """Returns true if the tags match the query"""
+        return self._root.matches(tags)
+
+    def select(self, index: TagIndex) -> List[str]:
+        """
+        :param index: The index of the elements to query.
+        :return: The refs of the matching elements, in their original order.
+        """
+        return index.get_refs(self._root.select(index))
+
+
+class _Condition(abc.ABC):
+    @abc.abstractmethod
+    def matches(self, tags: Dict[str, str]) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def select(self, index: TagIndex) -> Set[int]:
+        pass
+
+
+class _HasKey(_Condition):
+    def __init__(self, key: str):
+        self.key = key
+
+    def matches(self, tags: Dict[str, str]) -> bool:
+        return self.key in tags
+
+    def select(self, index: TagIndex) -> Set[int]:
+        positions = set()
+        for value_positions in index.tags.get(self.key, {}).values():
+            positions.update(value_positions)
+        return positions
+
+
+class _Equals(_Condition):
+    def __init__(self, key: str, value: str):
+        self.key = key
+        self.value = value
+
+    def matches(self, tags: Dict[str, str]) -> bool:
+        return tags.get(self.key) == self.value
+
+    def select(self, index: TagIndex) -> Set[int]:
+        return set(index.tags.get(self.key, {}).get(self.value, []))
+
+
+class _Matches(_Condition):
+    def __init__(self, key: str, pattern: str):
+        self.key = key
+        try:
+            self.pattern = re.compile(pattern)
+        except re.error as error:
+            raise TagQuerySyntaxError(
+                'Invalid regular expression %r: %s' % (pattern, error)
+            )
+
+    def matches(self, tags: Dict[str, str]) -> bool:
+        value = tags.get(self.key)
+        return value is not None and self.pattern.search(value) is not None
+
+    def select(self, index: TagIndex) -> Set[int]:
+        # The expression is only evaluated once per distinct value.
+        positions = set()
+        for value, value_positions in index.tags.get(self.key, {}).items():
+            if self.pattern.search(value) is not None:
+                positions.update(value_positions)
+        return positions
+
+
+class _Not(_Condition):
+    def __init__(self, condition: _Condition):
+        self.condition = condition
+
+    def matches(self, tags: Dict[str, str]) -> bool:
+        return not self.condition.matches(tags)
+
+    def select(self, index: TagIndex) -> Set[int]:
+        return set(range(len(index))).difference(
+            self.condition.select(index)
+        )
+
+
+class _And(_Condition):
+    def __init__(self, conditions: List[_Condition]):
+        self.conditions = conditions
+
+    def matches(self, tags: Dict[str, str]) -> bool:
+        return all(condition.matches(tags) for condition in self.conditions)
+
+    def select(self, index: TagIndex) -> Set[int]:
+        # Negated conditions are subtracted from the other conditions, which
+        # avoids building the set of all elements.
+        included = [c for c in self.conditions if not isinstance(c, _Not)]
+        excluded = [c for c in self.conditions if isinstance(c, _Not)]
+        if len(included) == 0:
+            positions = set(range(len(index)))
+        else:
+            positions = included[0].select(index)
+            for condition in included[1:]:
+                if len(positions) == 0:
+                    break
+                positions.intersection_update(condition.select(index))
+        for condition in excluded:
+            if len(positions) == 0:
+                break
+            positions.difference_update(condition.condition.select(index))
+        return positions
+
+
+class _Or(_Condition):
+    def __init__(self, conditions: List[_Condition]):
+        self.conditions = conditions
+
+    def matches(self, tags: Dict[str, str]) -> bool:
+        return any(condition.matches(tags) for condition in self.conditions)
+
+    def select(self, index: TagIndex) -> Set[int]:
+        positions = set()
+        for condition in self.conditions:
+            positions.update(condition.select(index))
+        return positions
+
+
+class _QueryParser:
+    """
+    A recursive descent parser for the grammar:
+
+        or        := and ('|' and)*
+        and       := not ('&' not)*
+        not       := '!' not | primary
+        primary   := '(' or ')' | condition
+        condition := string (('=' | '!=') string | ('~' | '!~') regex)?
+    """
+    _OPERATOR_CHARACTERS = '&|!()=~'
+
+    def __init__(self, query: str):
+        self.query = query
+        self.position = 0
+
+    def parse(self) -> _Condition:
+        condition = self._parse_or()
+        self._skip_whitespace()
+        if self.position < len(self.query):
+            self._raise('Unexpected %r' % self.query[self.position])
+        return condition
+
+    def _parse_or(self) -> _Condition:
+        conditions = [self._parse_and()]
+        while self._consume('|'):
+            conditions.append(self._parse_and())
+        return conditions[0] if len(conditions) == 1 else _Or(conditions)
+
+    def _parse_and(self) -> _Condition:
+        conditions = [self._parse_not()]
+        while self._consume('&'):
+            conditions.append(self._parse_not())
+        return conditions[0] if len(conditions) == 1 else _And(conditions)
+
+    def _parse_not(self) -> _Condition:
+        if self._consume('!'):
+            return _Not(self._parse_not())
+        return self._parse_primary()
+
+    def _parse_primary(self) -> _Condition:
+        if self._consume('('):
+            condition = self._parse_or()
+            if not self._consume(')'):
+                self._raise('Expected \')\'')
+            return condition
+        key = self._parse_string()
+        if self._consume('!='):
+            return _Not(_Equals(key, self._parse_string()))
+        if self._consume('!~'):
+            return _Not(_Matches(key, self._parse_regex()))
+        if self._consume('='):
+            return _Equals(key, self._parse_string())
+        if self._consume('~'):
+            return _Matches(key, self._parse_regex())
+        return _HasKey(key)
+
+    def _parse_string(self) -> str:
+        self._skip_whitespace()
+        quoted = self._parse_quoted()
+        if quoted is not None:
+            return quoted
+        start = self.position
+        while (
+                self.position < len(self.query) and
+                not self.query[self.position].isspace() and
+                self.query[self.position] not in self._OPERATOR_CHARACTERS
+        ):
+            self.position += 1
+        if start == self.position:
+            self._raise('Expected a tag key or value')
+        return self.query[start:self.position]
+
+    def _parse_regex(self) -> str:
+        self._skip_whitespace()
+        quoted = self._parse_quoted()
+        if quoted is not None:
+            return quoted
+        # Read until the next whitespace, or until a closing parenthesis that
+        # closes a group outside of the expression.
+        start = self.position
+        depth = 0
+        while self.position < len(self.query):
+            character = self.query[self.position]
+            if character.isspace():
+                break
+            if character == '\\':
+                self.position += 2
+                continue
+            if character == '(':
+                depth += 1
+            elif character == ')':
+                if depth == 0:
+                    break
+                depth -= 1
+            self.position += 1
+        if start == self.position:
+            self._raise('Expected a regular expression')
+        return self.query[start:self.position]
+
+    def _parse_quoted(self) -> Optional[str]:
+        if (
+                self.position >= len(self.query) or
+                self.query[self.position] not in '\'"'
+        ):
+            return None
+        quote = self.query[self.position]
+        end = self.query.find(quote, self.position + 1)
+        if end == -1:
+            self._raise('Unterminated string')
+        string = self.query[self.position + 1:end]
+        self.position = end + 1
+        return string
+
+    def _consume(self, token: str) -> bool:
+        self._skip_whitespace()
+        if self.query.startswith(token, self.position):
+            self.position += len(token)
+            return True
+        return False
+
+    def _skip_whitespace(self):
+        while (
+                self.position < len(self.query) and
+                self.query[self.position].isspace()
+        ):
+            self.position += 1
+
+    def _raise(self, message: str):
+        raise TagQuerySyntaxError(
+            '%s at position %d of query: %s' %
+            (message, self.position, self.query)
+        )
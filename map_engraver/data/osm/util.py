@@ -1,7 +1,47 @@
-from typing import List
+from typing import List, Tuple
 
-from map_engraver.data.osm import Osm, Node
+import numpy as np
+
+from map_engraver.data.osm import Osm, Node, CompactNodeStore
 
 
 def get_nodes_for_way(osm: Osm, way_ref: str) -> List[Node]:
     return [osm.nodes[node_ref] for node_ref in osm.ways[way_ref].node_refs]
+
+
+def get_coords_for_ways(
+        osm: Osm,
+        way_refs: List[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gathers the coordinates of many ways into a single array.
+
+    :param osm: The OSM data containing the ways.
+    :param way_refs: The ways to get the coordinates for.
+    :return: A tuple containing an (N, 2) array of (lat, lon) coordinates of
+             all the ways, one way after the other, and an array with the
+             number of coordinates for each way.
+    """
+    node_refs = [
+        node_ref
+        for way_ref in way_refs
+        for node_ref in osm.ways[way_ref].node_refs
+    ]
+    counts = np.fromiter(
+        (len(osm.ways[way_ref].node_refs) for way_ref in way_refs),
+        dtype=np.int64,
+        count=len(way_refs)
+    )
+    if isinstance(osm.nodes, CompactNodeStore):
+        indexes = osm.nodes.get_indexes(node_refs)
+        coords = np.column_stack((
+            osm.nodes.lat[indexes],
+            osm.nodes.lon[indexes]
+        ))
+    else:
+        nodes = [osm.nodes[node_ref] for node_ref in node_refs]
+        coords = np.array(
+            [(node.lat, node.lon) for node in nodes],
+            dtype=np.float64
+        ).reshape((len(nodes), 2))
+    return coords, counts
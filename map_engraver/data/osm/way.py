@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 import xml.etree.ElementTree as ElementTree
 
 from map_engraver.data.osm import Element
@@ -12,6 +12,20 @@ class Way(Element):
         super().__init__(osm_element)
         self.node_refs = Way._get_way_node_refs(osm_element)
 
+    @classmethod
+    def from_values(
+            cls,
+            ref: str,
+            node_refs: List[str],
+            tags: Dict[str, str]
+    ) -> 'Way':
+        """Creates a way without an XML element"""
+        way = cls.__new__(cls)
+        way.id = ref
+        way.tags = tags
+        way.node_refs = node_refs
+        return way
+
     @staticmethod
     def _get_way_node_refs(osm_element: ElementTree) -> List[str]:
         """Get all nodes for a way"""
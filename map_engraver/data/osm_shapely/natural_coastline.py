@@ -1,16 +1,20 @@
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+import shapely
 from shapely.geometry import \
     MultiPolygon, \
     Polygon, \
     LinearRing, \
     LineString, \
-    GeometryCollection
+    GeometryCollection, \
+    Point
 from shapely.ops import unary_union
 
 from map_engraver.data.osm import Osm
-from map_engraver.data.osm.filter import filter_elements
+from map_engraver.data.osm.filter import query_elements
 from map_engraver.data.osm.util import get_nodes_for_way
 from map_engraver.data.osm_shapely.piece_together_ways import \
     piece_together_ways
@@ -18,15 +22,38 @@ from map_engraver.data.osm_shapely_ops.homogenize import \
     geoms_to_multi_line_string, \
     geoms_to_multi_polygon
 
+Bounds = Tuple[float, float, float, float]
+
+# The number of vertices of the lines the coastline is split into when it is
+# built in tiles.
+_MAX_LINE_VERTICES = 256
+
 
 class CoastlineOutputType(Enum):
     LAND = 1
     WATER = 2
 
 
+class _Coastline:
+    """
+    The coastline ways of an OSM file, pieced together into complete land and
+    water polygons, and incomplete line strings.
+    """
+
+    def __init__(
+            self,
+            land_polygons: List[Polygon],
+            water_polygons: List[Polygon],
+            line_strings: List[LineString]
+    ):
+        self.land_polygons = land_polygons
+        self.water_polygons = water_polygons
+        self.line_strings = line_strings
+
+
 def natural_coastline_to_multi_polygon(
         osm: Osm,
-        bounds: Tuple[float, float, float, float],
+        bounds: Bounds,
         output_type: CoastlineOutputType
 ) -> MultiPolygon:
     """
@@ -42,6 +69,9 @@ def natural_coastline_to_multi_polygon(
 
     Warning: If no `natural=coastline` ways are found, an error will be raised.
 
+    For coastlines that span large areas, consider using
+    `natural_coastline_to_tiles()` instead.
+
     :param osm: The parsed OSM file containing the coastline ways.
     :param bounds: The size the polygon should be generated for.
                    Note that incomplete ways must begin and terminate outside
@@ -49,12 +79,162 @@ def natural_coastline_to_multi_polygon(
     :param output_type: Specify whether to return a land or water MultiPolygon.
     :return: A MultiPolygon representing the coastline shape.
     """
-    osm_coastline = filter_elements(
+    coastline = _get_coastline(osm)
+
+    bounds_polygon = _bounds_to_polygon(bounds)
+    return _build_coastline(
+        [p.intersection(bounds_polygon) for p in coastline.land_polygons],
+        [p.intersection(bounds_polygon) for p in coastline.water_polygons],
+        coastline.line_strings,
+        bounds,
+        output_type
+    )
+
+
+def natural_coastline_to_tiles(
+        osm: Osm,
+        bounds: Bounds,
+        output_type: CoastlineOutputType,
+        grid_size: Tuple[int, int],
+        workers: int = 1
+) -> Dict[Tuple[int, int], MultiPolygon]:
+    """
+    Returns the same shape as `natural_coastline_to_multi_polygon()`, but split
+    into a grid of tiles.
+
+    The coastline is split into short lines, and each tile is built
+    independently from only the lines that cross it. The lines and the edge
+    of the tile divide the tile into faces, which are land or water depending
+    on which side of the nearest coastline they are on. This takes time in
+    proportion to the length of the coastline, unlike combining the closed
+    incomplete ways one by one. Tiles that the coastline does not cross are
+    filled with land or water in the same way.
+
+    :param osm: The parsed OSM file containing the coastline ways.
+    :param bounds: The size the polygons should be generated for.
+                   Note that incomplete ways must begin and terminate outside
+                   the bounds for the algorithm to work.
+    :param output_type: Specify whether to return land or water MultiPolygons.
+    :param grid_size: The number of tiles along the first and second axis.
+    :param workers: The number of processes to build the tiles with.
+    :return: The MultiPolygon of each tile, keyed by the position of the tile
+             in the grid. The bounds of each tile can be retrieved with
+             `get_tile_bounds()`.
+    """
+    coastline = _get_coastline(osm)
+    tile_bounds = get_tile_bounds(bounds, grid_size)
+
+    # Long coastlines are split, so that each tile only clips the parts of the
+    # coastline near it, and only those are sent to the worker processes.
+    lines = _clip_lines(
+        _split_lines(_get_coastline_lines(coastline), _MAX_LINE_VERTICES),
+        bounds
+    )
+    line_tree = shapely.STRtree(lines)
+
+    tiles = {}
+    tile_arguments = {}
+    is_water_output = output_type == CoastlineOutputType.WATER
+    for position, tile in tile_bounds.items():
+        tile_polygon = _bounds_to_polygon(tile)
+        nearby_lines = lines[np.sort(line_tree.query(tile_polygon))]
+        tile_lines = _clip_lines(nearby_lines, tile)
+        if len(tile_lines) == 0:
+            is_land = _is_land(lines, line_tree, tile_polygon.centroid)
+            if is_land != is_water_output:
+                tiles[position] = MultiPolygon([tile_polygon])
+            else:
+                tiles[position] = MultiPolygon()
+            continue
+        tile_arguments[position] = (
+            tile_lines,
+            nearby_lines,
+            tile,
+            output_type
+        )
+
+    if workers <= 1 or len(tile_arguments) <= 1:
+        for position, arguments in tile_arguments.items():
+            tiles[position] = _build_coastline_tile(*arguments)
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = {
+                position: executor.submit(_build_coastline_tile, *arguments)
+                for position, arguments in tile_arguments.items()
+            }
+            for position, future in futures.items():
+                tiles[position] = future.result()
+
+    return {position: tiles[position] for position in tile_bounds.keys()}
+
+
+def natural_coastline_to_tiled_multi_polygon(
+        osm: Osm,
+        bounds: Bounds,
+        output_type: CoastlineOutputType,
+        grid_size: Tuple[int, int],
+        workers: int = 1
+) -> MultiPolygon:
+    """
+    Builds the coastline with `natural_coastline_to_tiles()`, and stitches the
+    tiles back together into a single MultiPolygon.
+
+    :param osm: The parsed OSM file containing the coastline ways.
+    :param bounds: The size the polygon should be generated for.
+    :param output_type: Specify whether to return a land or water MultiPolygon.
+    :param grid_size: The number of tiles along the first and second axis.
+    :param workers: The number of processes to build the tiles with.
+    :return: A MultiPolygon representing the coastline shape.
+    """
+    tiles = natural_coastline_to_tiles(
+        osm,
+        bounds,
+        output_type,
+        grid_size,
+        workers
+    )
+    return geoms_to_multi_polygon(unary_union(list(tiles.values())))
+
+
+def get_tile_bounds(
+        bounds: Bounds,
+        grid_size: Tuple[int, int]
+) -> Dict[Tuple[int, int], Bounds]:
+    """
+    Splits the bounds into a grid of tiles of equal size. Neighbouring tiles
+    share the exact same edge coordinates.
+
+    :param bounds: The bounds to split.
+    :param grid_size: The number of tiles along the first and second axis.
+    :return: The bounds of each tile, keyed by the position of the tile.
+    """
+    if grid_size[0] < 1 or grid_size[1] < 1:
+        raise ValueError('The grid must have at least one tile.')
+    x_edges = np.linspace(bounds[0], bounds[2], grid_size[0] + 1).tolist()
+    y_edges = np.linspace(bounds[1], bounds[3], grid_size[1] + 1).tolist()
+    # Avoid rounding errors at the outer edges.
+    x_edges[0], x_edges[-1] = bounds[0], bounds[2]
+    y_edges[0], y_edges[-1] = bounds[1], bounds[3]
+    return {
+        (i, j): (x_edges[i], y_edges[j], x_edges[i + 1], y_edges[j + 1])
+        for i in range(grid_size[0])
+        for j in range(grid_size[1])
+    }
+
+
+def _bounds_to_polygon(bounds: Bounds) -> Polygon:
+    return Polygon([
+        (bounds[0], bounds[1]),
+        (bounds[0], bounds[3]),
+        (bounds[2], bounds[3]),
+        (bounds[2], bounds[1])
+    ])
+
+
+def _get_coastline(osm: Osm) -> _Coastline:
+    osm_coastline = query_elements(
         osm,
-        lambda _, way_element: (
-                'natural' in way_element.tags and
-                way_element.tags['natural'] == 'coastline'
-        ),
+        'natural=coastline',
         filter_nodes=False,
         filter_relations=False
     )
@@ -65,13 +245,6 @@ def natural_coastline_to_multi_polygon(
             'natural=coastline are required.'
         )
 
-    bounds_polygon = Polygon([
-        (bounds[0], bounds[1]),
-        (bounds[0], bounds[3]),
-        (bounds[2], bounds[3]),
-        (bounds[2], bounds[1])
-    ])
-
     way_refs = []
     way_all_nodes = {}
     way_start_nodes = {}
@@ -99,27 +272,44 @@ def natural_coastline_to_multi_polygon(
     complete_land_polygons = []
     complete_water_polygons = []
     for ref, complete_way_nodes in complete_ways_nodes.items():
-        coordinates = []
-        for way_node in complete_way_nodes:
-            coordinates.append((way_node.lat, way_node.lon))
+        coordinates = np.array(
+            [(way_node.lat, way_node.lon) for way_node in complete_way_nodes]
+        )
         linear_ring = LinearRing(coordinates)
         if linear_ring.is_ccw:
-            complete_water_polygons.append(
-                Polygon(coordinates).intersection(bounds_polygon)
-            )
+            complete_water_polygons.append(Polygon(coordinates))
         else:
-            complete_land_polygons.append(
-                Polygon(coordinates).intersection(bounds_polygon)
-            )
+            complete_land_polygons.append(Polygon(coordinates))
 
-    # Convert all incomplete ways to MultiLineStrings.
+    # Convert all incomplete ways to LineStrings.
     incomplete_linear_strings = []
     for ref, incomplete_way_nodes in incomplete_ways_nodes.items():
-        coordinates = []
-        for way_node in incomplete_way_nodes:
-            coordinates.append((way_node.lat, way_node.lon))
+        coordinates = np.array([
+            (way_node.lat, way_node.lon) for way_node in incomplete_way_nodes
+        ])
         linear_string = LineString(coordinates)
         incomplete_linear_strings.append(linear_string)
+
+    return _Coastline(
+        complete_land_polygons,
+        complete_water_polygons,
+        incomplete_linear_strings
+    )
+
+
+def _build_coastline(
+        complete_land_polygons: List[Polygon],
+        complete_water_polygons: List[Polygon],
+        incomplete_linear_strings: List[LineString],
+        bounds: Bounds,
+        output_type: CoastlineOutputType
+) -> MultiPolygon:
+    """
+    Builds the land or water within the bounds. The complete polygons must
+    already be intersected with the bounds.
+    """
+    bounds_polygon = _bounds_to_polygon(bounds)
+
     incomplete_multi_line_strings = unary_union(incomplete_linear_strings)
     incomplete_multi_line_strings = geoms_to_multi_line_string(
         incomplete_multi_line_strings.intersection(bounds_polygon)
@@ -128,144 +318,9 @@ def natural_coastline_to_multi_polygon(
     # Close all incomplete ways so they become Polygons.
     incomplete_polygons = []
     for incomplete_line_string in incomplete_multi_line_strings.geoms:
-        # Todo:
-        # print('-------------------------')
-        # print(bounds)
-        # print(start_coordinate[0], start_coordinate[1])
-        # print(
-        #     start_coordinate[0] == bounds[0],
-        #     start_coordinate[1] == bounds[1]
-        # )
-        # print(
-        #     start_coordinate[0] == bounds[2],
-        #     start_coordinate[1] == bounds[3]
-        # )
-        # print(end_coordinate[0], end_coordinate[1])
-        # print(
-        #     end_coordinate[0] == bounds[0],
-        #     end_coordinate[1] == bounds[1]
-        # )
-        # print(
-        #     end_coordinate[0] == bounds[2],
-        #     end_coordinate[1] == bounds[3]
-        # )
-
-        # We should now have a collection of incomplete ways that have start
-        # and end points that intersect the bounds. We now want to connect the
-        # end with the start to complete the shape so we can turn it into a
-        # Polygon. From the end coordinate, which should lie on the bound, we
-        # need to go counter-clockwise around the bounds until we reach the
-        # Start.
-        #
-        # In the example below, the LineString going through the bounds begins
-        # with 'S' and ends at 'E'. To complete the polygon, we loop through
-        # each section, in this case starting at Section 4, connecting between
-        # Section 1, and ending at Section 2, where the start point 'S'. The
-        # resulting lines are represented a solid line. In total, 2 points are
-        # added to the line_string to complete the shape.
-        #
-        #               Section 4
-        #              <──────────
-        #             ┌────────E ╴ ╴
-        #           │ │ ╭──────╯   ' ^
-        #           │ │ ╰──╮       ' │
-        # Section 1 │ │   ╭╯╭─╮    ' │ Section 3
-        #           │ │   ╰╮│ ╰╮   ' │
-        #           V │    ╰╯  │   ' │
-        #             └────────S ╴ '
-        #              ──────────>
-        #                Section 2
-
-        new_coordinates = list(incomplete_line_string.coords)
-        start_coordinate = new_coordinates[0]
-        end_coordinate = new_coordinates[-1]
-        sections_iterated = 0
-
-        while end_coordinate != start_coordinate:
-            # print(end_coordinate)  # Todo: remove when confident this works
-            if sections_iterated == 5:
-                # If this happens, we recommend either:
-                # 1. Downloading the rest of the coastline from OpenStreetMap
-                #    that are out of bounds.
-                # 2. Manually updating the OSM file to move the terminating
-                #    coordinate out of bounds.
-                # 3. Removing the coastline altogether.
-                raise Exception(
-                    'Failed to generate coastline. An incomplete coastline '
-                    'way starts with a point that is inside the bounds. '
-                    'Incomplete coastlines must start and end with '
-                    'coordinates outside of the bounds.'
-                )
-            # Section 1
-            if (
-                    end_coordinate[1] == bounds[1] and
-                    end_coordinate[0] != bounds[0]
-            ):
-                # print('section 1')  # Todo: remove when confident this works
-                if (
-                        start_coordinate[1] == end_coordinate[1] and
-                        start_coordinate[0] <= end_coordinate[0]
-                ):
-                    new_coordinate = start_coordinate
-                else:
-                    new_coordinate = (bounds[0], bounds[1])
-            # Section 2
-            elif (
-                    end_coordinate[0] == bounds[0] and
-                    end_coordinate[1] != bounds[3]
-            ):
-                # print('section 2')  # Todo: remove when confident this works
-                if (
-                        start_coordinate[0] == end_coordinate[0] and
-                        start_coordinate[1] >= end_coordinate[1]
-                ):
-                    new_coordinate = start_coordinate
-                else:
-                    new_coordinate = (bounds[0], bounds[3])
-            # Section 3
-            elif (
-                    end_coordinate[1] == bounds[3] and
-                    end_coordinate[0] != bounds[2]
-            ):
-                # print('section 3')  # Todo: remove when confident this works
-                if (
-                        start_coordinate[1] == end_coordinate[1] and
-                        start_coordinate[0] >= end_coordinate[0]
-                ):
-                    new_coordinate = start_coordinate
-                else:
-                    new_coordinate = (bounds[2], bounds[3])
-            # Section 4
-            elif (
-                    end_coordinate[0] == bounds[2] and
-                    end_coordinate[1] != bounds[1]
-            ):
-                # print('section 4')  # Todo: remove when confident this works
-                if (
-                        start_coordinate[0] == end_coordinate[0] and
-                        start_coordinate[1] <= end_coordinate[1]
-                ):
-                    new_coordinate = start_coordinate
-                else:
-                    new_coordinate = (bounds[2], bounds[1])
-            else:
-                # If this happens, we recommend either:
-                # 1. Downloading the rest of the coastline from OpenStreetMap
-                #    that are out of bounds.
-                # 2. Manually updating the OSM file to move the terminating
-                #    coordinate out of bounds.
-                # 3. Removing the coastline altogether.
-                raise Exception(
-                    'Failed to generate coastline. An incomplete coastline '
-                    'way ends with a point that is inside the bounds. '
-                    'Incomplete coastlines must start and end with '
-                    'coordinates outside of the bounds.'
-                )
-
-            new_coordinates.append(new_coordinate)
-            end_coordinate = new_coordinate
-            sections_iterated += 1
-        incomplete_polygons.append(Polygon(new_coordinates))
+        incomplete_polygons.append(
+            _close_line_string(incomplete_line_string, bounds)
+        )
 
     # Start with the assumption that land will always be returned.
     composite_geom = GeometryCollection()
@@ -347,3 +402,333 @@ def natural_coastline_to_multi_polygon(
     #             )
 
     return composite_multi_polygon
+
+
+def _close_line_string(
+        incomplete_line_string: LineString,
+        bounds: Bounds
+) -> Polygon:
+    # Todo:
+    # print('-------------------------')
+    # print(bounds)
+    # print(start_coordinate[0], start_coordinate[1])
+    # print(
+    #     start_coordinate[0] == bounds[0],
+    #     start_coordinate[1] == bounds[1]
+    # )
+    # print(
+    #     start_coordinate[0] == bounds[2],
+    #     start_coordinate[1] == bounds[3]
+    # )
+    # print(end_coordinate[0], end_coordinate[1])
+    # print(
+    #     end_coordinate[0] == bounds[0],
+    #     end_coordinate[1] == bounds[1]
+    # )
+    # print(
+    #     end_coordinate[0] == bounds[2],
+    #     end_coordinate[1] == bounds[3]
+    # )
+
+    # We should now have a collection of incomplete ways that have start
+    # and end points that intersect the bounds. We now want to connect the
+    # end with the start to complete the shape so we can turn it into a
+    # Polygon. From the end coordinate, which should lie on the bound, we
+    # need to go counter-clockwise around the bounds until we reach the
+    # Start.
+    #
+    # In the example below, the LineString going through the bounds begins
+    # with 'S' and ends at 'E'. To complete the polygon, we loop through
+    # each section, in this case starting at Section 4, connecting between
+    # Section 1, and ending at Section 2, where the start point 'S'. The
+    # resulting lines are represented a solid line. In total, 2 points are
+    # added to the line_string to complete the shape.
+    #
+    #               Section 4
+    #              <──────────
+    #             ┌────────E ╴ ╴
+    #           │ │ ╭──────╯   ' ^
+    #           │ │ ╰──╮       ' │
+    # Section 1 │ │   ╭╯╭─╮    ' │ Section 3
+    #           │ │   ╰╮│ ╰╮   ' │
+    #           V │    ╰╯  │   ' │
+    #             └────────S ╴ '
+    #              ──────────>
+    #                Section 2
+
+    new_coordinates = list(incomplete_line_string.coords)
+    start_coordinate = new_coordinates[0]
+    end_coordinate = new_coordinates[-1]
+    sections_iterated = 0
+
+    while end_coordinate != start_coordinate:
+        # print(end_coordinate)  # Todo: remove when confident this works
+        if sections_iterated == 5:
+            # If this happens, we recommend either:
+            # 1. Downloading the rest of the coastline from OpenStreetMap
+            #    that are out of bounds.
+            # 2. Manually updating the OSM file to move the terminating
+            #    coordinate out of bounds.
+            # 3. Removing the coastline altogether.
+            raise Exception(
+                'Failed to generate coastline. An incomplete coastline '
+                'way starts with a point that is inside the bounds. '
+                'Incomplete coastlines must start and end with '
+                'coordinates outside of the bounds.'
+            )
+        # Section 1
+        if (
+                end_coordinate[1] == bounds[1] and
+                end_coordinate[0] != bounds[0]
+        ):
+            # print('section 1')  # Todo: remove when confident this works
+            if (
+                    start_coordinate[1] == end_coordinate[1] and
+                    start_coordinate[0] <= end_coordinate[0]
+            ):
+                new_coordinate = start_coordinate
+            else:
+                new_coordinate = (bounds[0], bounds[1])
+        # Section 2
+        elif (
+                end_coordinate[0] == bounds[0] and
+                end_coordinate[1] != bounds[3]
+        ):
+            # print('section 2')  # Todo: remove when confident this works
+            if (
+                    start_coordinate[0] == end_coordinate[0] and
+                    start_coordinate[1] >= end_coordinate[1]
+            ):
+                new_coordinate = start_coordinate
+            else:
+                new_coordinate = (bounds[0], bounds[3])
+        # Section 3
+        elif (
+                end_coordinate[1] == bounds[3] and
+                end_coordinate[0] != bounds[2]
+        ):
+            # print('section 3')  # Todo: remove when confident this works
+            if (
+                    start_coordinate[1] == end_coordinate[1] and
+                    start_coordinate[0] >= end_coordinate[0]
+            ):
+                new_coordinate = start_coordinate
+            else:
+                new_coordinate = (bounds[2], bounds[3])
+        # Section 4
+        elif (
+                end_coordinate[0] == bounds[2] and
+                end_coordinate[1] != bounds[1]
+        ):
+            # print('section 4')  # Todo: remove when confident this works
+            if (
+                    start_coordinate[0] == end_coordinate[0] and
+                    start_coordinate[1] <= end_coordinate[1]
+            ):
+                new_coordinate = start_coordinate
+            else:
+                new_coordinate = (bounds[2], bounds[1])
+        else:
+            # If this happens, we recommend either:
+            # 1. Downloading the rest of the coastline from OpenStreetMap
+            #    that are out of bounds.
+            # 2. Manually updating the OSM file to move the terminating
+            #    coordinate out of bounds.
+            # 3. Removing the coastline altogether.
+            raise Exception(
+                'Failed to generate coastline. An incomplete coastline '
+                'way ends with a point that is inside the bounds. '
+                'Incomplete coastlines must start and end with '
+                'coordinates outside of the bounds.'
+            )
+
+        new_coordinates.append(new_coordinate)
+        end_coordinate = new_coordinate
+        sections_iterated += 1
+    return Polygon(new_coordinates)
+
+
+def _build_coastline_tile(
+        tile_lines: np.ndarray,
+        nearby_lines: np.ndarray,
+        bounds: Bounds,
+        output_type: CoastlineOutputType
+) -> MultiPolygon:
+    """
+    Builds the land or water within a tile.
+
+    :param tile_lines: The coastline clipped to the tile.
+    :param nearby_lines: The coastline near the tile, to decide which side of
+                         the coastline each part of the tile is on.
+    :param bounds: The bounds of the tile.
+    :param output_type: Whether to return the land or water.
+    :return: The land or water within the tile.
+    """
+    bounds_polygon = _bounds_to_polygon(bounds)
+
+    # Noding the coastline together with the edge of the tile divides the
+    # tile into faces, which are each entirely land or water.
+    edges = shapely.union_all(
+        np.append(tile_lines, bounds_polygon.exterior)
+    )
+    faces = shapely.get_parts(
+        shapely.polygonize(shapely.get_parts(edges))
+    )
+
+    tree = shapely.STRtree(nearby_lines)
+    is_water_output = output_type == CoastlineOutputType.WATER
+    selected_faces = [
+        face
+        for face, point in zip(faces, shapely.point_on_surface(faces))
+        if _is_land(nearby_lines, tree, point) != is_water_output
+    ]
+    # Neighbouring faces are on opposite sides of the coastline, so the
+    # selected faces only share corners, and their union is the same as the
+    # original faces.
+    return geoms_to_multi_polygon(shapely.coverage_union_all(selected_faces))
+
+
+def _get_coastline_lines(coastline: _Coastline) -> List[LineString]:
+    """
+    Returns the coastline as line strings, keeping the direction of the ways.
+    """
+    return coastline.line_strings + [
+        LineString(polygon.exterior.coords)
+        for polygon in coastline.land_polygons + coastline.water_polygons
+    ]
+
+
+def _split_lines(
+        lines: List[LineString],
+        max_vertices: int
+) -> np.ndarray:
+    """
+    Splits the lines into consecutive lines of at most `max_vertices`
+    vertices. Each line starts where the previous one ends.
+    """
+    split_lines = []
+    for line in lines:
+        coordinates = shapely.get_coordinates(line)
+        for start in range(0, max(len(coordinates) - 1, 1), max_vertices - 1):
+            split_lines.append(
+                LineString(coordinates[start:start + max_vertices])
+            )
+    return np.array(split_lines, dtype=object)
+
+
+def _clip_lines(lines: np.ndarray, bounds: Bounds) -> np.ndarray:
+    """
+    Returns the parts of the lines within the bounds, keeping the direction
+    of the lines.
+    """
+    parts = shapely.get_parts(shapely.clip_by_rect(lines, *bounds))
+    return parts[
+        (shapely.get_type_id(parts) == shapely.GeometryType.LINESTRING) &
+        ~shapely.is_empty(parts)
+    ]
+
+
+def _is_land(
+        lines: np.ndarray,
+        tree: shapely.STRtree,
+        point: Point
+) -> bool:
+    """
+    Returns true if the point is on the land side of the nearest line of the
+    coastline. Since clockwise polygons are land, land is always to the right
+    of the direction of the coastline.
+
+    Incomplete coastlines are closed along the bounds, so only the coastline
+    within the bounds should be passed to this function. The coastline can
+    be split into several lines, as long as each line starts where the
+    previous one ends.
+    """
+    if len(lines) == 0:
+        return False
+    nearest_lines = [
+        lines[index]
+        for index in tree.query_nearest(point, all_matches=True)
+    ]
+    nearest_line = nearest_lines[0]
+    coordinates = shapely.get_coordinates(nearest_line)
+    point_coordinate = shapely.get_coordinates(point)[0]
+
+    # Find the nearest segment of the line.
+    starts = coordinates[:-1]
+    directions = coordinates[1:] - starts
+    offsets = point_coordinate - starts
+    lengths_squared = np.einsum('ij,ij->i', directions, directions)
+    lengths_squared[lengths_squared == 0] = 1
+    fractions = np.einsum('ij,ij->i', offsets, directions) / lengths_squared
+    fractions = np.minimum(np.maximum(fractions, 0), 1)
+    nearest_offsets = offsets - directions * fractions[:, np.newaxis]
+    distances = np.einsum('ij,ij->i', nearest_offsets, nearest_offsets)
+    index = int(np.argmin(distances))
+
+    def is_right_of(start: np.ndarray, direction: np.ndarray) -> bool:
+        offset = point_coordinate - start
+        return direction[0] * offset[1] - direction[1] * offset[0] < 0
+
+    # If the nearest point is a vertex shared by two segments, both segments
+    # are equally near, and the turn at the vertex decides which one to use.
+    # The other segment can also be part of the next or previous line, which
+    # is then just as near to the point.
+    segment_count = len(directions)
+    is_closed = nearest_line.is_closed
+    previous_direction = None
+    next_direction = None
+    if fractions[index] == 0:
+        vertex = coordinates[index]
+        next_direction = directions[index]
+        if index > 0 or is_closed:
+            previous_direction = directions[(index - 1) % segment_count]
+        else:
+            previous_direction = _get_connecting_direction(
+                nearest_lines[1:],
+                vertex,
+                False
+            )
+    elif fractions[index] == 1:
+        vertex = coordinates[index + 1]
+        previous_direction = directions[index]
+        if index < segment_count - 1 or is_closed:
+            next_direction = directions[(index + 1) % segment_count]
+        else:
+            next_direction = _get_connecting_direction(
+                nearest_lines[1:],
+                vertex,
+                True
+            )
+    if previous_direction is None or next_direction is None:
+        return is_right_of(starts[index], directions[index])
+
+    # For a right turn the land is the narrow wedge between the two segments,
+    # and for a left turn it is everything but the wide wedge.
+    turn = (
+        previous_direction[0] * next_direction[1] -
+        previous_direction[1] * next_direction[0]
+    )
+    if turn < 0:
+        return is_right_of(vertex, previous_direction) and \
+            is_right_of(vertex, next_direction)
+    return is_right_of(vertex, previous_direction) or \
+        is_right_of(vertex, next_direction)
+
+
+def _get_connecting_direction(
+        lines: List[LineString],
+        vertex: np.ndarray,
+        is_next: bool
+) -> Optional[np.ndarray]:
+    """
+    Returns the direction of the first segment of the line that starts at the
+    vertex if `is_next` is true, or otherwise the last segment of the line
+    that ends at the vertex.
+    """
+    for line in lines:
+        coordinates = shapely.get_coordinates(line)
+        if is_next and np.array_equal(coordinates[0], vertex):
+            return coordinates[1] - coordinates[0]
+        if not is_next and np.array_equal(coordinates[-1], vertex):
+            return coordinates[-1] - coordinates[-2]
+    return None
@@ -1,14 +1,18 @@
+import numpy as np
+import shapely
 from shapely.geometry import Polygon, Point, LineString, MultiPolygon
-from typing import Optional, List, Dict, Callable, Union
+from typing import Optional, List, Dict, Callable, Union, Tuple
 
 from map_engraver.data.osm import Node
 from map_engraver.data.osm import Way
 from map_engraver.data.osm import Relation
 from map_engraver.data.osm import MemberTypes
 from map_engraver.data.osm import Osm
-from map_engraver.data.osm.util import get_nodes_for_way
+from map_engraver.data.osm.util import get_nodes_for_way, get_coords_for_ways
 from map_engraver.data.osm_shapely.piece_together_ways import \
     piece_together_ways
+from map_engraver.data.osm_shapely_ops.homogenize import \
+    geoms_to_multi_polygon
 
 
 class OsmToShapely:
@@ -21,6 +25,7 @@ class OsmToShapely:
         """
         self.osm = osm
         self._incomplete_refs_handler = lambda element, refs: None
+        self._repaired_refs_handler = lambda refs: None
 
     @property
     def incomplete_refs_handler(self):
@@ -33,6 +38,17 @@ class OsmToShapely:
     ):
         self._incomplete_refs_handler = x
 
+    @property
+    def repaired_refs_handler(self):
+        return self._repaired_refs_handler
+
+    @repaired_refs_handler.setter
+    def repaired_refs_handler(
+            self,
+            x: Callable[[List[str]], None]
+    ):
+        self._repaired_refs_handler = x
+
     def node_to_point(
             self,
             node: Node
@@ -59,7 +75,27 @@ class OsmToShapely:
             self,
             ways: Dict[str, Way]
     ) -> Dict[str, Optional[LineString]]:
-        return {k: self.way_to_line_string(v) for k, v in ways.items()}
+        """
+        Converts many ways at once. The coordinates of all the ways are
+        gathered into a single array, from which the LineStrings are
+        constructed in bulk.
+        """
+        coords, counts = get_coords_for_ways(
+            self.osm,
+            [way.id for way in ways.values()]
+        )
+        line_strings = np.empty(len(ways), dtype=object)
+        line_strings[counts == 0] = LineString()
+        non_empty = counts > 0
+        if np.any(non_empty):
+            line_strings[non_empty] = shapely.linestrings(
+                coords,
+                indices=np.repeat(
+                    np.arange(np.count_nonzero(non_empty)),
+                    counts[non_empty]
+                )
+            )
+        return dict(zip(ways.keys(), line_strings))
 
     def way_to_polygon(
             self,
@@ -71,17 +107,52 @@ class OsmToShapely:
             polygon_array.append((node.lat, node.lon))
         if polygon_array[len(polygon_array)-1] == polygon_array[0] and \
                 len(polygon_array) > 2:
-            p = Polygon(polygon_array)
-            if p.exterior.is_ccw:
-                p = Polygon(reversed(polygon_array))
-            return p
+            return shapely.orient_polygons(
+                Polygon(polygon_array),
+                exterior_cw=True
+            )
         raise WayToPolygonError("Could not convert way to polygon: " + way.id)
 
     def ways_to_polygons(
             self,
-            ways: Dict[str, Way]
-    ) -> Dict[str, Optional[Polygon]]:
-        return {k: self.way_to_polygon(v) for k, v in ways.items()}
+            ways: Dict[str, Way],
+            make_valid: bool = False
+    ) -> Dict[str, Optional[Union[Polygon, MultiPolygon]]]:
+        """
+        Converts many ways at once. The coordinates of all the ways are
+        gathered into a single array, from which the Polygons are constructed
+        and oriented in bulk.
+
+        :param ways: The ways to convert.
+        :param make_valid: Whether to repair invalid polygons with
+                           `normalize_polygons()`. Repaired polygons can
+                           become MultiPolygons.
+        :return: The polygons, keyed by the way refs.
+        """
+        way_refs = [way.id for way in ways.values()]
+        coords, counts = get_coords_for_ways(self.osm, way_refs)
+        ends = np.cumsum(counts)
+        starts = ends - counts
+        is_closed = counts > 2
+        is_closed[is_closed] = np.all(
+            coords[starts[is_closed]] == coords[ends[is_closed] - 1],
+            axis=1
+        )
+        if not np.all(is_closed):
+            raise WayToPolygonError(
+                "Could not convert way to polygon: " +
+                way_refs[int(np.argmin(is_closed))]
+            )
+        if len(way_refs) == 0:
+            return {}
+        polygons = shapely.polygons(shapely.linearrings(
+            coords,
+            indices=np.repeat(np.arange(len(way_refs)), counts)
+        ))
+        if make_valid:
+            return self.normalize_polygons(dict(zip(ways.keys(), polygons)))
+        polygons = shapely.orient_polygons(polygons, exterior_cw=True)
+        return dict(zip(ways.keys(), polygons))
 
     def relation_to_multi_polygon(
             self,
@@ -142,15 +213,9 @@ class OsmToShapely:
             return None
 
         # create exteriors of polygons
-        exterior_polygons = []
-        for outer_way_nodes in outer_ways_nodes.values():
-            exterior_nodes = []
-            for node in outer_way_nodes:
-                exterior_nodes.append((node.lat, node.lon))
-            exterior_polygon = Polygon(exterior_nodes)
-            if exterior_polygon.exterior.is_ccw:
-                exterior_polygon = Polygon(reversed(exterior_nodes))
-            exterior_polygons.append(exterior_polygon)
+        exterior_polygons = self._ways_nodes_to_polygons(
+            list(outer_ways_nodes.values())
+        )
 
         # now piece together the inner way
         incomplete_ways_nodes, inner_ways_nodes = piece_together_ways(
@@ -172,37 +237,169 @@ class OsmToShapely:
         exterior_polygons_interiors = [
             [] for _ in range(len(exterior_polygons))
         ]
-        for inner_way_nodes in inner_ways_nodes.values():
-            interior_coordinates = []
-            for node in inner_way_nodes:
-                interior_coordinates.append((node.lat, node.lon))
-            interior_polygon = Polygon(interior_coordinates)
-            if not interior_polygon.exterior.is_ccw:
-                interior_coordinates = list(reversed(interior_coordinates))
-
-            for e_p in range(len(exterior_polygons)):
-                if exterior_polygons[e_p].intersects(interior_polygon):
-                    exterior_polygons_interiors[e_p].append(
-                        interior_coordinates
-                    )
-
-        # Finally, combine the exterior_polygons with the interiors
+        interior_polygons = self._ways_nodes_to_polygons(
+            list(inner_ways_nodes.values())
+        )
+
+        for e_p, i_p in self._assign_interiors_to_exteriors(
+                exterior_polygons,
+                interior_polygons
+        ):
+            exterior_polygons_interiors[e_p].append(
+                interior_polygons[i_p].exterior
+            )
+
+        # Finally, combine the exterior_polygons with the interiors, and
+        # orient them all at once.
         geoms = []
         for e_p in range(len(exterior_polygons)):
-            geoms.append((
-                exterior_polygons[e_p].exterior.coords,
+            geoms.append(Polygon(
+                exterior_polygons[e_p].exterior,
                 exterior_polygons_interiors[e_p]
             ))
 
-        return MultiPolygon(geoms)
+        return shapely.orient_polygons(MultiPolygon(geoms), exterior_cw=True)
+
+    @staticmethod
+    def _ways_nodes_to_polygons(
+            ways_nodes: List[List[Node]]
+    ) -> List[Polygon]:
+        """
+        Constructs the unoriented polygons of pieced together ways in bulk.
+        """
+        if len(ways_nodes) == 0:
+            return []
+        counts = [len(way_nodes) for way_nodes in ways_nodes]
+        coords = np.array(
+            [
+                (node.lat, node.lon)
+                for way_nodes in ways_nodes
+                for node in way_nodes
+            ],
+            dtype=np.float64
+        )
+        return list(shapely.polygons(shapely.linearrings(
+            coords,
+            indices=np.repeat(np.arange(len(ways_nodes)), counts)
+        )))
+
+    @staticmethod
+    def _assign_interiors_to_exteriors(
+            exterior_polygons: List[Polygon],
+            interior_polygons: List[Polygon]
+    ) -> List[Tuple[int, int]]:
+        """
+        Pairs each interior polygon with the exterior polygon it is a hole of.
+
+        Exterior polygons can be nested, for example an island within a lake
+        of a larger island, in which case the interior belongs to the smallest
+        exterior that covers it. Interiors that are not covered by any
+        exterior, which happens with broken relations, are assigned to the
+        exterior they overlap the most. Interiors that do not intersect any
+        exterior are dropped.
+
+        :param exterior_polygons: The exteriors of the multipolygon.
+        :param interior_polygons: The interiors of the multipolygon.
+        :return: A list of pairs of exterior and interior polygon indexes, in
+                 the order of the interiors.
+        """
+        if len(exterior_polygons) == 0 or len(interior_polygons) == 0:
+            return []
+
+        tree = shapely.STRtree(exterior_polygons)
+        exterior_areas = shapely.area(exterior_polygons)
+
+        # Each column is a pair of indexes into interiors and exteriors.
+        covered_by = tree.query(interior_polygons, predicate='covered_by')
+        best_exteriors: Dict[int, int] = {}
+        for i_p, e_p in zip(covered_by[0].tolist(), covered_by[1].tolist()):
+            if (
+                    i_p not in best_exteriors or
+                    exterior_areas[e_p] < exterior_areas[best_exteriors[i_p]]
+            ):
+                best_exteriors[i_p] = e_p
+
+        uncovered = [
+            i_p for i_p in range(len(interior_polygons))
+            if i_p not in best_exteriors
+        ]
+        if len(uncovered) > 0:
+            intersects = tree.query(
+                [interior_polygons[i_p] for i_p in uncovered],
+                predicate='intersects'
+            )
+            best_overlaps: Dict[int, float] = {}
+            for u, e_p in zip(intersects[0].tolist(), intersects[1].tolist()):
+                i_p = uncovered[u]
+                overlap = exterior_polygons[e_p].intersection(
+                    interior_polygons[i_p]
+                ).area
+                if i_p not in best_overlaps or overlap > best_overlaps[i_p]:
+                    best_overlaps[i_p] = overlap
+                    best_exteriors[i_p] = e_p
+
+        return [
+            (best_exteriors[i_p], i_p)
+            for i_p in range(len(interior_polygons))
+            if i_p in best_exteriors
+        ]
 
     def relations_to_multi_polygons(
             self,
-            relations: Dict[str, Relation]
+            relations: Dict[str, Relation],
+            make_valid: bool = False
     ) -> Dict[str, Optional[MultiPolygon]]:
-        return {
+        """
+        :param relations: The relations to convert.
+        :param make_valid: Whether to repair invalid multipolygons with
+                           `normalize_polygons()`.
+        :return: The multipolygons, keyed by the relation refs. Relations
+                 that could not be converted are None.
+        """
+        multi_polygons = {
             k: self.relation_to_multi_polygon(v) for k, v in relations.items()
         }
+        if make_valid:
+            return {
+                k: None if v is None else geoms_to_multi_polygon(v)
+                for k, v in self.normalize_polygons(multi_polygons).items()
+            }
+        return multi_polygons
+
+    def normalize_polygons(
+            self,
+            geoms: Dict[str, Optional[Union[Polygon, MultiPolygon]]]
+    ) -> Dict[str, Optional[Union[Polygon, MultiPolygon]]]:
+        """
+        Orients and repairs many polygons at once.
+
+        Exteriors are oriented clockwise and interiors counter-clockwise, like
+        the other conversions of this class. Invalid polygons, such as ways
+        that intersect themselves, are repaired with `shapely.make_valid()`,
+        which can turn a Polygon into a MultiPolygon. The refs of the repaired
+        polygons are passed to `repaired_refs_handler`.
+
+        :param geoms: The polygons to normalize, keyed by their element refs.
+                      None values are kept as they are.
+        :return: The normalized polygons, keyed by the same refs.
+        """
+        refs = list(geoms.keys())
+        polygons = np.empty(len(refs), dtype=object)
+        polygons[:] = list(geoms.values())
+
+        invalid = ~shapely.is_missing(polygons) & ~shapely.is_valid(polygons)
+        if np.any(invalid):
+            polygons[invalid] = shapely.make_valid(
+                polygons[invalid],
+                method='structure',
+                keep_collapsed=False
+            )
+            self.repaired_refs_handler(
+                [refs[index] for index in np.flatnonzero(invalid)]
+            )
+
+        polygons = shapely.orient_polygons(polygons, exterior_cw=True)
+        return dict(zip(refs, polygons))
 
 
 class WayToPolygonError(Exception):
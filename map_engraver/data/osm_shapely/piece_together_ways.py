@@ -1,3 +1,4 @@
+from bisect import insort
 from typing import List, Dict, Tuple
 
 from map_engraver.data.osm import Node
@@ -10,90 +11,138 @@ def piece_together_ways(
         way_end_nodes: Dict[str, Node],
         check_both_sides: bool
 ) -> Tuple[Dict[str, List[Node]], Dict[str, List[Node]]]:
+    """
+    Joins ways whose end node is the start node of another way, until the
+    joined ways become closed.
+
+    The ways are processed in the order of `way_refs`. Each way is extended
+    at its end with the first way in `way_refs` that starts where it ends, or
+    that ends where it ends if `check_both_sides` is true, in which case the
+    other way is joined in reverse.
+
+    The arguments are modified in place as ways are joined.
+
+    :param way_refs: The refs of the ways to piece together.
+    :param way_nodes: The nodes of each way.
+    :param way_start_nodes: The first node of each way.
+    :param way_end_nodes: The last node of each way.
+    :param check_both_sides: Whether ways can be joined in reverse.
+    :return: A tuple of the ways that could not be closed, and the ways that
+             were closed. Joined ways are keyed by the ref of the way they
+             were joined onto.
+    """
     output_ways = dict()
-    way_ref_index_1 = 0
-    while way_ref_index_1 < len(way_refs):
-        # print("----")
-        way_ref_1 = way_refs[way_ref_index_1]
-        # print("ref1 " + str(way_ref_1))
-
-        # way is closed, so delete this way from the list of ways to
-        # process and continue to the next way
-        if way_end_nodes[way_ref_1] == way_start_nodes[way_ref_1]:
-            # print(
-            # "Closed way!",
-            # way_end_nodes[way_ref_1],
-            # way_start_nodes[way_ref_1]
-            # )
-            output_ways[way_ref_1] = way_nodes[way_ref_1]
-
-            del way_refs[way_ref_index_1]
-            del way_nodes[way_ref_1]
-            del way_start_nodes[way_ref_1]
-            del way_end_nodes[way_ref_1]
+
+    # Index the positions of the ways by their start and end nodes, so that
+    # connecting ways can be looked up without comparing every pair of ways.
+    # The positions are kept sorted, since the first way in `way_refs` wins
+    # if several ways connect to the same node. Nodes are identified by their
+    # id, since node stores may return a new object for each lookup of the
+    # same node.
+    start_node_index: Dict[str, List[int]] = dict()
+    end_node_index: Dict[str, List[int]] = dict()
+    for position, way_ref in enumerate(way_refs):
+        start_node_index.setdefault(way_start_nodes[way_ref].id, []) \
+            .append(position)
+        end_node_index.setdefault(way_end_nodes[way_ref].id, []) \
+            .append(position)
+
+    def remove_from_index(
+            index: Dict[str, List[int]],
+            node: Node,
+            position: int
+    ):
+        positions = index[node.id]
+        positions.remove(position)
+        if len(positions) == 0:
+            del index[node.id]
+
+    def first_other_position(
+            index: Dict[str, List[int]],
+            node: Node,
+            position: int
+    ) -> int:
+        for other_position in index.get(node.id, []):
+            if other_position != position:
+                return other_position
+        return len(way_refs)
+
+    for position_1, way_ref_1 in enumerate(way_refs):
+        # Skip ways that have already been joined onto another way.
+        if way_ref_1 not in way_nodes:
             continue
 
-        # go through all other ways (excluding self)
-        way_ref_index_2 = 0
-        while way_ref_index_2 < len(way_refs):
-            way_ref_2 = way_refs[way_ref_index_2]
-            if way_ref_1 == way_ref_2:
-                way_ref_index_2 += 1
-                continue
+        while True:
+            end_node_1 = way_end_nodes[way_ref_1]
 
-            # print("ref2 " + str(way_ref_2))
+            # way is closed, so remove this way from the ways to process
+            if end_node_1.id == way_start_nodes[way_ref_1].id:
+                output_ways[way_ref_1] = way_nodes[way_ref_1]
+                remove_from_index(
+                    start_node_index,
+                    way_start_nodes[way_ref_1],
+                    position_1
+                )
+                remove_from_index(end_node_index, end_node_1, position_1)
+                del way_nodes[way_ref_1]
+                del way_start_nodes[way_ref_1]
+                del way_end_nodes[way_ref_1]
+                break
 
-            ways_are_congruent = (
-                way_end_nodes[way_ref_1] == way_start_nodes[way_ref_2]
-            )
-            ways_are_opposing = (
-                way_end_nodes[way_ref_1] == way_end_nodes[way_ref_2]
+            congruent_position = first_other_position(
+                start_node_index,
+                end_node_1,
+                position_1
             )
+            opposing_position = len(way_refs)
+            if check_both_sides:
+                opposing_position = first_other_position(
+                    end_node_index,
+                    end_node_1,
+                    position_1
+                )
+            position_2 = min(congruent_position, opposing_position)
 
-            # if the end node of the current way is connected to the start
-            # node of the other way
-            if (
-                ways_are_congruent or
-                (check_both_sides and ways_are_opposing)
-            ):
-                if ways_are_congruent:
-                    way_nodes_2 = way_nodes[way_ref_2][1:]
-                else:
-                    way_nodes_2 = reversed(way_nodes[way_ref_2][:-1])
-                # remove the first node of the other way to ensure we don't
-                # have redundant nodes and add it to the end of the current
-                # way
-                way_nodes[way_ref_1].extend(way_nodes_2)
-
-                # updated the linked list attributes
-                if ways_are_congruent:
-                    way_end_nodes[way_ref_1] = way_end_nodes[way_ref_2]
-                else:
-                    way_end_nodes[way_ref_1] = way_start_nodes[way_ref_2]
-
-                # Delete any mention of this way entirely!
-                del way_nodes[way_ref_2]
-                del way_start_nodes[way_ref_2]
-                del way_end_nodes[way_ref_2]
-                del way_refs[way_ref_index_2]
-                # if the index of the other way is behind the current way
-                # index, make sure to change the index because the other
-                # way was removed from the list!
-                way_ref_index_2 -= 1
-                if way_ref_index_1 > way_ref_index_2:
-                    way_ref_index_1 -= 1
-
-                # Break out of this loop. The current way should be
-                # reprocessed in an attempt to discover more ways to
-                # connect / discover that it is a closed loop
+            # No other way connects to the end of this way.
+            if position_2 == len(way_refs):
                 break
 
-            # otherwise proceed to the next way in the list
-            way_ref_index_2 += 1
+            way_ref_2 = way_refs[position_2]
+            ways_are_congruent = position_2 == congruent_position
+            if ways_are_congruent:
+                way_nodes_2 = way_nodes[way_ref_2][1:]
+            else:
+                way_nodes_2 = reversed(way_nodes[way_ref_2][:-1])
+            # remove the first node of the other way to ensure we don't have
+            # redundant nodes and add it to the end of the current way
+            way_nodes[way_ref_1].extend(way_nodes_2)
+
+            # updated the linked list attributes
+            remove_from_index(end_node_index, end_node_1, position_1)
+            if ways_are_congruent:
+                way_end_nodes[way_ref_1] = way_end_nodes[way_ref_2]
+            else:
+                way_end_nodes[way_ref_1] = way_start_nodes[way_ref_2]
+            insort(
+                end_node_index.setdefault(way_end_nodes[way_ref_1].id, []),
+                position_1
+            )
+
+            # Delete any mention of the other way entirely!
+            remove_from_index(
+                start_node_index,
+                way_start_nodes[way_ref_2],
+                position_2
+            )
+            remove_from_index(
+                end_node_index,
+                way_end_nodes[way_ref_2],
+                position_2
+            )
+            del way_nodes[way_ref_2]
+            del way_start_nodes[way_ref_2]
+            del way_end_nodes[way_ref_2]
 
-        # Only proceed onto the next item if we have properly gone through
-        # all the other ways
-        if way_ref_index_2 == len(way_refs):
-            way_ref_index_1 += 1
+    way_refs[:] = [way_ref for way_ref in way_refs if way_ref in way_nodes]
 
     return way_nodes, output_ways
@@ -1,16 +1,194 @@
+from collections import OrderedDict
+
+import numpy as np
 from shapely import ops
 from shapely.geometry import Polygon, MultiPolygon, LineString, MultiLineString
-from typing import TypeVar, Tuple, List
-
-from map_engraver.data.math.trig import obtuse_angle
+from typing import TypeVar, Tuple, List, Optional, Iterator, Dict
 
 T = TypeVar('T')
+_VertexKey = Tuple[float, float]
+_EdgeKey = Tuple[float, float, float, float, float]
+
+
+class TransformCache:
+    """
+    A least-recently-used cache of the transformed vertices and interpolated
+    edges of geometries, for a single transformation function.
+
+    Neighbouring polygons, like administrative areas or land use, share most
+    of their vertices and edges. When they are transformed with the same
+    cache, each shared vertex is only transformed once, and each shared edge
+    is only interpolated once, in whichever direction it is traversed. The
+    interpolated points of an edge are reused exactly, so shared borders line
+    up between the transformed polygons.
+
+    Vertices and edges are identified by their exact source coordinates.
+
+    Example:
+
+        cache = TransformCache(transformer)
+        polygons = [
+            transform_interpolated_euclidean(transformer, polygon, cache=cache)
+            for polygon in polygons
+        ]
+    """
+
+    def __init__(
+            self,
+            func,
+            max_vertices: int = 1000000,
+            max_edges: int = 1000000
+    ):
+        """
+        :param func: The transformation function the cache is used with.
+        :param max_vertices: The maximum number of transformed vertices to
+                             keep.
+        :param max_edges: The maximum number of interpolated edges to keep.
+        """
+        if max_vertices < 1 or max_edges < 1:
+            raise ValueError('max_vertices and max_edges must be at least 1')
+        self.func = func
+        self.max_vertices = max_vertices
+        self.max_edges = max_edges
+        self._vertices: 'OrderedDict[_VertexKey, Tuple[float, float]]' = \
+            OrderedDict()
+        self._edges: 'OrderedDict[_EdgeKey, np.ndarray]' = OrderedDict()
+        self._vectorized: Optional[bool] = None
+
+    def clear(self):
+        """Removes all vertices and edges from the cache."""
+        self._vertices.clear()
+        self._edges.clear()
+
+    def _project_vertices(
+            self,
+            vertices: np.ndarray
+    ) -> Tuple[np.ndarray, List[_VertexKey]]:
+        keys = list(zip(vertices[:, 0].tolist(), vertices[:, 1].tolist()))
+        projected = np.empty_like(vertices)
+        missing: Dict[_VertexKey, List[int]] = {}
+        for i, key in enumerate(keys):
+            value = self._vertices.get(key)
+            if value is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                self._vertices.move_to_end(key)
+                projected[i] = value
+        if len(missing) > 0:
+            missing_keys = list(missing.keys())
+            missing_projected, vectorized = _project(
+                self.func,
+                np.array(missing_keys, dtype=np.float64),
+                self._vectorized
+            )
+            if vectorized is not None:
+                self._vectorized = vectorized
+            for key, point in zip(missing_keys, missing_projected.tolist()):
+                projected[missing[key]] = point
+                self._vertices[key] = (point[0], point[1])
+            while len(self._vertices) > self.max_vertices:
+                self._vertices.popitem(last=False)
+        return projected, keys
+
+    def _get_edges(
+            self,
+            keys: List[_VertexKey],
+            starts: np.ndarray,
+            angular_distortion_threshold
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Looks up the interpolated points of the segments that start at each
+        of the vertex indexes in `starts`.
+
+        :return: The starts of the segments that are not cached, and the
+                 start index, position and transformed coordinates of the
+                 points of the cached segments.
+        """
+        uncached = []
+        indexes = [np.empty(0, dtype=np.int64)]
+        positions = [np.empty(0)]
+        points = [np.empty((0, 2))]
+        for start in starts.tolist():
+            key, is_reversed = _get_edge_key(
+                keys[start],
+                keys[start + 1],
+                angular_distortion_threshold
+            )
+            edge_points = self._edges.get(key)
+            if edge_points is None:
+                uncached.append(start)
+                continue
+            self._edges.move_to_end(key)
+            count = len(edge_points)
+            if count == 0:
+                continue
+            # Any increasing positions between the segment's vertices will
+            # keep the points in order.
+            indexes.append(np.full(count, start, dtype=np.int64))
+            positions.append(np.arange(1, count + 1) / (count + 1))
+            points.append(edge_points[::-1] if is_reversed else edge_points)
+        return (
+            np.array(uncached, dtype=np.int64),
+            np.concatenate(indexes),
+            np.concatenate(positions),
+            np.concatenate(points)
+        )
+
+    def _set_edges(
+            self,
+            keys: List[_VertexKey],
+            starts: np.ndarray,
+            point_indexes: np.ndarray,
+            points: np.ndarray,
+            angular_distortion_threshold
+    ):
+        """
+        Stores the interpolated points of the segments that start at each of
+        the vertex indexes in `starts`. `point_indexes` and `points` must be
+        sorted by segment, and by position along the segment.
+        """
+        begins = np.searchsorted(point_indexes, starts, side='left')
+        ends = np.searchsorted(point_indexes, starts, side='right')
+        for start, begin, end in zip(
+                starts.tolist(),
+                begins.tolist(),
+                ends.tolist()
+        ):
+            key, is_reversed = _get_edge_key(
+                keys[start],
+                keys[start + 1],
+                angular_distortion_threshold
+            )
+            edge_points = points[begin:end]
+            self._edges[key] = edge_points[::-1].copy() if is_reversed \
+                else edge_points.copy()
+        while len(self._edges) > self.max_edges:
+            self._edges.popitem(last=False)
+
+
+def _get_edge_key(
+        a: _VertexKey,
+        b: _VertexKey,
+        angular_distortion_threshold
+) -> Tuple[_EdgeKey, bool]:
+    """
+    Returns the same key for both directions of a segment, and whether the
+    segment is in the reverse direction of the key.
+
+    Interpolation is symmetric, since the midpoints and angles are the same
+    in both directions, so the points of a reversed segment are the points of
+    the segment in reverse.
+    """
+    if a <= b:
+        return (a[0], a[1], b[0], b[1], angular_distortion_threshold), False
+    return (b[0], b[1], a[0], a[1], angular_distortion_threshold), True
 
 
 def transform_interpolated_euclidean(
         func,
         geom: T,
-        angular_distortion_threshold=1
+        angular_distortion_threshold=1,
+        cache: Optional[TransformCache] = None
 ) -> T:
     """
     Todo: provide a better description.
@@ -22,138 +200,231 @@ def transform_interpolated_euclidean(
     This function is generally only useful when displaying work maps. If
     geodesic distortion is not expected, use `transform()` instead.
 
+    Segments are interpolated breadth-first: every vertex is transformed only
+    once, and the midpoints of all the segments of the geometry are
+    transformed and checked together, one level of interpolation at a time.
+    If `func` accepts arrays of x and y coordinates, like the transformers
+    returned by `build_crs_to_canvas_array_transformer()`, it is called once
+    per level. Otherwise it is called once per point.
+
     :param func:
     :param geom:
     :param angular_distortion_threshold: The maximum obtuse angle that can
                                          exist between two interpolated
                                          line-segments.
+    :param cache: A cache of vertices and edges that have already been
+                  transformed with `func`, for example by neighbouring
+                  polygons.
     :return:
     """
-    if isinstance(geom, LineString):
-        return LineString(_transform_interpolated_euclidean_coords(
-            func,
-            geom.coords,
-            angular_distortion_threshold=angular_distortion_threshold
-        ))
-    elif isinstance(geom, Polygon):
-        new_exterior = _transform_interpolated_euclidean_coords(
+    if cache is not None and cache.func is not func:
+        raise ValueError(
+            'The cache was created for a different transformation function'
+        )
+    if isinstance(geom, (LineString, Polygon, MultiLineString, MultiPolygon)):
+        new_coords = _transform_interpolated_euclidean_coords(
             func,
-            geom.exterior.coords,
-            angular_distortion_threshold=angular_distortion_threshold
+            _get_coords(geom),
+            angular_distortion_threshold=angular_distortion_threshold,
+            cache=cache
         )
-        new_interiors = []
+        return _build_geom(geom, iter(new_coords))
+    return ops.transform(func, geom)
+
+
+def _get_coords(geom) -> List[np.ndarray]:
+    if isinstance(geom, LineString):
+        return [np.asarray(geom.coords).reshape(-1, 2)]
+    elif isinstance(geom, Polygon):
+        coords = [np.asarray(geom.exterior.coords).reshape(-1, 2)]
         for interior in geom.interiors:
-            new_interiors.append(_transform_interpolated_euclidean_coords(
-                func,
-                interior.coords,
-                angular_distortion_threshold=angular_distortion_threshold
-            ))
+            coords.append(np.asarray(interior.coords).reshape(-1, 2))
+        return coords
+    coords = []
+    for sub_geom in geom.geoms:
+        coords.extend(_get_coords(sub_geom))
+    return coords
+
+
+def _build_geom(geom: T, new_coords: Iterator[np.ndarray]) -> T:
+    if isinstance(geom, LineString):
+        return LineString(next(new_coords))
+    elif isinstance(geom, Polygon):
+        new_exterior = next(new_coords)
+        new_interiors = [next(new_coords) for _ in geom.interiors]
         return Polygon(new_exterior, new_interiors)
     elif isinstance(geom, MultiLineString):
-        new_line_strings = []
-        for line_string in geom.geoms:
-            new_line_strings.append(transform_interpolated_euclidean(
-                func,
-                line_string,
-                angular_distortion_threshold=angular_distortion_threshold
-            ))
-        return MultiLineString(new_line_strings)
-    elif isinstance(geom, MultiPolygon):
-        new_polygons = []
-        for polygon in geom.geoms:
-            new_polygons.append(transform_interpolated_euclidean(
-                func,
-                polygon,
-                angular_distortion_threshold=angular_distortion_threshold
-            ))
-        return MultiPolygon(new_polygons)
-    return ops.transform(func, geom)
+        return MultiLineString([
+            _build_geom(line_string, new_coords) for line_string in geom.geoms
+        ])
+    return MultiPolygon([
+        _build_geom(polygon, new_coords) for polygon in geom.geoms
+    ])
 
 
 def _transform_interpolated_euclidean_coords(
         func,
-        coords: List[Tuple[float, float]],
-        angular_distortion_threshold
-) -> List[Tuple[float, float]]:
-    if len(coords) == 0:
-        return []
-    new_coords = []
-    for i in range(len(coords) - 1):
-        a = coords[i]
-        b = coords[i + 1]
-        interpolated_points = _transform_interpolated_euclidean_segment(
-            func,
-            a,
-            b,
-            angular_distortion_threshold=angular_distortion_threshold
-        )
-        new_coords.append(func(*a))
-        new_coords.extend(interpolated_points)
+        coords: List[np.ndarray],
+        angular_distortion_threshold,
+        cache: Optional[TransformCache] = None
+) -> List[np.ndarray]:
+    """
+    Transforms and interpolates many coordinate sequences at once.
+
+    Each interpolated point is identified by the index of the vertex that
+    starts its segment, and its position along the segment. Since segments
+    are always split in half, positions are exact, and sorting the points by
+    both returns them in the order they would be found by interpolating each
+    segment recursively.
+    """
+    counts = np.array([len(c) for c in coords], dtype=np.int64)
+    if np.sum(counts) == 0:
+        return [np.empty((0, 2)) for _ in coords]
+    vertices = np.concatenate(coords).astype(np.float64)
+    vertex_ends = np.cumsum(counts)
+    is_segment_start = np.ones(len(vertices), dtype=bool)
+    is_segment_start[vertex_ends[counts > 0] - 1] = False
+
+    starts = np.flatnonzero(is_segment_start)
+    if cache is None:
+        projected_vertices, vectorized = _project(func, vertices, None)
+        point_indexes = [np.arange(len(vertices))]
+        point_positions = [np.zeros(len(vertices))]
+        points = [projected_vertices]
+    else:
+        # Only the segments that are not in the cache are interpolated.
+        projected_vertices, keys = cache._project_vertices(vertices)
+        vectorized = cache._vectorized
+        starts, cached_indexes, cached_positions, cached_points = \
+            cache._get_edges(keys, starts, angular_distortion_threshold)
+        point_indexes = [np.arange(len(vertices)), cached_indexes]
+        point_positions = [np.zeros(len(vertices)), cached_positions]
+        points = [projected_vertices, cached_points]
+    uncached_starts = starts
+    first_interpolated = len(points)
+
+    # The segments that still need to be checked for distortion.
+    a = vertices[starts]
+    b = vertices[starts + 1]
+    a_proj = projected_vertices[starts]
+    b_proj = projected_vertices[starts + 1]
+    positions = np.zeros(len(starts))
+    lengths = np.ones(len(starts))
+
+    while len(starts) > 0:
+        mid_points = np.column_stack((
+            (a[:, 0] + b[:, 0]) / 2,
+            (a[:, 1] + b[:, 1]) / 2
+        ))
+        mid_points_proj, vectorized = _project(func, mid_points, vectorized)
 
-    new_coords.append(func(*coords[-1]))
+        # Ideally this should not happen, but there will be edge cases
+        # (literally!) where an interpolated point could dip in and out of a
+        # map. The shape should ideally be clipped to avoid this from
+        # happening, using a mask that contains no points outside the allowed
+        # projection.
+        is_distorted = _is_distorted(
+            a_proj,
+            b_proj,
+            mid_points_proj,
+            angular_distortion_threshold
+        ) & (mid_points_proj[:, 0] != float('inf'))
 
-    return new_coords
+        starts = starts[is_distorted]
+        lengths = lengths[is_distorted] / 2
+        mid_positions = positions[is_distorted] + lengths
+        point_indexes.append(starts)
+        point_positions.append(mid_positions)
+        points.append(mid_points_proj[is_distorted])
 
+        # Split the distorted segments in half.
+        mid_points = mid_points[is_distorted]
+        mid_points_proj = mid_points_proj[is_distorted]
+        a = np.concatenate((a[is_distorted], mid_points))
+        b = np.concatenate((mid_points, b[is_distorted]))
+        a_proj = np.concatenate((a_proj[is_distorted], mid_points_proj))
+        b_proj = np.concatenate((mid_points_proj, b_proj[is_distorted]))
+        positions = np.concatenate((positions[is_distorted], mid_positions))
+        lengths = np.concatenate((lengths, lengths))
+        starts = np.concatenate((starts, starts))
 
-def _transform_interpolated_euclidean_segment(
+    if cache is not None and len(uncached_starts) > 0:
+        cache._vectorized = vectorized
+        new_indexes = np.concatenate(point_indexes[first_interpolated:])
+        new_order = np.lexsort((
+            np.concatenate(point_positions[first_interpolated:]),
+            new_indexes
+        ))
+        cache._set_edges(
+            keys,
+            uncached_starts,
+            new_indexes[new_order],
+            np.concatenate(points[first_interpolated:])[new_order],
+            angular_distortion_threshold
+        )
+
+    point_indexes = np.concatenate(point_indexes)
+    order = np.lexsort((np.concatenate(point_positions), point_indexes))
+    points = np.concatenate(points)[order]
+    point_ends = np.searchsorted(point_indexes[order], vertex_ends)
+    return np.split(points, point_ends[:-1])
+
+
+def _project(
         func,
-        a: Tuple[float, float],
-        b: Tuple[float, float],
-        angular_distortion_threshold
-) -> List[Tuple[float, float]]:
+        coords: np.ndarray,
+        vectorized: Optional[bool]
+) -> Tuple[np.ndarray, Optional[bool]]:
     """
-    This function interpolates points between two points, in a way to minimizes
-    the overall distortion of a line-segment by the transformation function.
-
-    For example, The United States of America has a border at the 49 degrees
-    north. Projecting the United States onto a globe, the line should appear
-    curved, as the line segment is not a geodesic line. However, naively
-    rendering the line segment in a simple vector graphics tool will not
-    display the curved points. This function will return the set of points
-    along the that border to preserve the curved nature when rendering the
-    vector shape.
-
-    :param func: The transformation function.
-    :param a: The starting point of a line segment.
-    :param b: The starting point of a line segment.
-    :param angular_distortion_threshold:
-    :return: A list of points between a and b that minimize the transformed
-             distortion.
+    Transforms the coordinates with `func`, calling it with arrays if it
+    supports them. Whether it does is detected on the first call with more
+    than one coordinate.
     """
-    euclidean_mid_point = ((a[0]+b[0])/2, (a[1]+b[1])/2)
-    a_proj = func(*a)
-    b_proj = func(*b)
-    euclidean_mid_point_proj = func(*euclidean_mid_point)
-
-    # Ideally this should not happen, but there will be edge cases (literally!)
-    # where an interpolated point could dip in and out of a map. The shape
-    # should ideally be clipped to avoid this from happening, using a mask that
-    # contains no points outside the allowed projection.
-    if euclidean_mid_point_proj[0] == float('inf'):
-        return []
-
-    angular_distortion = obtuse_angle(a_proj, b_proj, euclidean_mid_point_proj)
-    is_distorted = (
-            angular_distortion != float('inf') and
-            angular_distortion_threshold < 180 - angular_distortion
-    )
-
-    if is_distorted:
-        left_points = _transform_interpolated_euclidean_segment(
-            func,
-            a,
-            euclidean_mid_point,
-            angular_distortion_threshold=angular_distortion_threshold
-        )
-        right_points = _transform_interpolated_euclidean_segment(
-            func,
-            euclidean_mid_point,
-            b,
-            angular_distortion_threshold=angular_distortion_threshold
-        )
-        new_points = left_points
-        new_points.append(euclidean_mid_point_proj)
-        new_points.extend(right_points)
-        return new_points
+    if vectorized is None and len(coords) > 1:
+        try:
+            projected = _project_array(func, coords)
+            if projected.shape == coords.shape:
+                return projected, True
+        except (TypeError, ValueError):
+            pass
+        vectorized = False
+    if vectorized:
+        return _project_array(func, coords), True
+    projected = np.array(
+        [func(x, y) for x, y in coords.tolist()],
+        dtype=np.float64
+    ).reshape(-1, 2)
+    return projected, vectorized
+
+
+def _project_array(func, coords: np.ndarray) -> np.ndarray:
+    x, y = func(coords[:, 0], coords[:, 1])
+    return np.column_stack((
+        np.asarray(x, dtype=np.float64),
+        np.asarray(y, dtype=np.float64)
+    ))
 
-    return []
+
+def _is_distorted(
+        a_proj: np.ndarray,
+        b_proj: np.ndarray,
+        mid_points_proj: np.ndarray,
+        angular_distortion_threshold
+) -> np.ndarray:
+    """
+    A vectorised version of `obtuse_angle()`, that returns whether the angle
+    at each transformed midpoint is further from a straight line than the
+    threshold.
+    """
+    with np.errstate(all='ignore'):
+        ca = a_proj - mid_points_proj
+        cb = b_proj - mid_points_proj
+        ca_dot_bc = ca[:, 0] * cb[:, 0] + ca[:, 1] * cb[:, 1]
+        mag_mul = np.sqrt(ca[:, 0] * ca[:, 0] + ca[:, 1] * ca[:, 1]) * \
+            np.sqrt(cb[:, 0] * cb[:, 0] + cb[:, 1] * cb[:, 1])
+        adj_hyp = np.clip(ca_dot_bc / mag_mul, -1, 1)
+        angular_distortion = np.arccos(adj_hyp) / np.pi * 180
+        # NaN angles, from transformed points that are infinite, are never
+        # considered distorted.
+        return (mag_mul != 0) & \
+            (angular_distortion_threshold < 180 - angular_distortion)
@@ -1,12 +1,23 @@
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 
 import math
 
+import numpy as np
 from pyproj import CRS, Transformer
-from shapely.geometry import Polygon, MultiPolygon, box
+import shapely
+from shapely.geometry import Polygon, MultiPolygon
+
+from map_engraver.data.proj.transformer_pool import get_transformer
+
+# Analytic edges are moved towards the origin by this fraction of their
+# radius, so that floating point errors don't put them outside the domain.
+_ANALYTIC_EDGE_MARGIN = 1e-9
 
 
 def is_supported_azimuthal_projection(crs: CRS) -> bool:
+    # Geographic CRSs, like EPSG:4269, do not have a coordinate operation.
+    if crs.coordinate_operation is None:
+        return False
     return crs.coordinate_operation.method_name in [
         'Orthographic',  # ortho
         'Geostationary Satellite (Sweep X)',  # geos
@@ -49,20 +60,11 @@ def azimuthal_mask(
             crs.coordinate_operation.method_name
         )
 
-    proj_to_wgs84 = Transformer.from_proj(
+    proj_to_wgs84 = get_transformer(
         crs,
         CRS.from_epsg(4326)
     )
-    points = []
-    for i in range(resolution * 4):
-        angle = i * math.pi * 2 / (resolution * 4)
-        radius = _binary_search_edge_crs(proj_to_wgs84, angle, threshold)
-        position = (
-            math.cos(angle) * radius,
-            math.sin(angle) * radius
-        )
-        points.append(position)
-    return Polygon(points)
+    return Polygon(_get_edge_points_crs(proj_to_wgs84, resolution, threshold))
 
 
 def azimuthal_mask_wgs84(
@@ -108,23 +110,21 @@ def azimuthal_mask_wgs84(
             crs.coordinate_operation.method_name
         )
 
-    proj_to_wgs84 = Transformer.from_proj(
+    proj_to_wgs84 = get_transformer(
         crs,
         CRS.from_epsg(4326)
     )
-    wgs84_to_proj = Transformer.from_proj(
+    wgs84_to_proj = get_transformer(
         CRS.from_epsg(4326),
         crs
     )
+    edge_points = _get_edge_points_crs(proj_to_wgs84, resolution, threshold)
+    edge_lats, edge_lons = proj_to_wgs84.transform(
+        edge_points[:, 0],
+        edge_points[:, 1]
+    )
     points = []
-    for i in range(resolution * 4):
-        angle = i * math.pi * 2 / (resolution * 4)
-        radius = _binary_search_edge_crs(proj_to_wgs84, angle, threshold)
-        position = proj_to_wgs84.transform(
-            math.cos(angle) * radius,
-            math.sin(angle) * radius
-        )
-
+    for position in zip(edge_lats.tolist(), edge_lons.tolist()):
         # If one of the positions is really close to the anti-meridian, but not
         # because of floating point errors, just set it to 180/-180.
         touches_anti_meridian = math.isclose(
@@ -177,11 +177,136 @@ def _covers_hemisphere(wgs84_to_proj: Transformer) -> bool:
     return covers_northern or covers_southern
 
 
-def _binary_search_edge_crs(
+def _get_edge_points_crs(
         transformer: Transformer,
-        angle: float,
+        resolution: int,
         threshold=1
-) -> float:
+) -> np.ndarray:
+    """
+    Returns the points along the edge of the `crs`'s domain, at `resolution *
+    4` evenly spaced angles around the origin.
+
+    Projections where the edge has a closed form use it, otherwise the edge is
+    found by searching along each angle.
+    """
+    analytic_points = _get_analytic_edge_points_crs(
+        transformer.source_crs,
+        resolution
+    )
+    if analytic_points is not None:
+        x, _ = transformer.transform(
+            analytic_points[:, 0],
+            analytic_points[:, 1]
+        )
+        # The closed forms are only trusted if PROJ agrees with them.
+        if np.all(np.isfinite(x)):
+            return analytic_points
+
+    angles = [
+        i * math.pi * 2 / (resolution * 4) for i in range(resolution * 4)
+    ]
+    cos_angles = np.array([math.cos(angle) for angle in angles])
+    sin_angles = np.array([math.sin(angle) for angle in angles])
+    radii = _binary_search_edges_crs(
+        transformer,
+        cos_angles,
+        sin_angles,
+        threshold
+    )
+    return np.column_stack((cos_angles * radii, sin_angles * radii))
+
+
+def _get_analytic_edge_points_crs(
+        crs: CRS,
+        resolution: int
+) -> Optional[np.ndarray]:
+    """
+    Returns the points along the edge of the `crs`'s domain using the closed
+    form of the edge, or None if the projection's parameters don't have one.
+
+    For a sphere of radius R, the edge of the orthographic projection is a
+    circle of radius R. The edge of a vertical perspective projection, with a
+    viewpoint height h, is the horizon, which is a circle of radius
+    R * sqrt(h / (h + 2R)). PROJ's nsper and tpers always use a sphere with
+    the ellipsoid's semi-major axis. The edge of the geostationary projection
+    is the horizon seen from the satellite, a cone of directions that is
+    converted to scanning angles.
+    """
+    operation = crs.coordinate_operation
+    if any(axis.unit_name != 'metre' for axis in crs.axis_info):
+        return None
+    params = {param.name: param.value for param in operation.params}
+    if params.get('False easting', 0) != 0 or \
+            params.get('False northing', 0) != 0:
+        return None
+
+    method_name = operation.method_name
+    semi_major = crs.ellipsoid.semi_major_metre
+    is_sphere = semi_major == crs.ellipsoid.semi_minor_metre
+    count = resolution * 4
+    if method_name == 'Orthographic' and is_sphere:
+        return _circle_points(semi_major, count)
+
+    if method_name == 'Vertical Perspective':
+        height = params.get('Viewpoint height', 0)
+    elif method_name == 'PROJ tpers' and \
+            params.get('tilt', 0) == 0 and params.get('azi', 0) == 0:
+        # Without tilt or azimuth, tpers is the same as nsper.
+        height = params.get('h', 0)
+    else:
+        height = None
+    if height is not None and height > 0:
+        radius = semi_major * math.sqrt(height / (height + 2 * semi_major))
+        return _circle_points(radius, count)
+
+    if method_name.startswith('Geostationary Satellite') and is_sphere:
+        height = params.get('Satellite Height', 0)
+        if height <= 0:
+            return None
+        # Directions (1, v_y, v_z) from the satellite, towards the origin
+        # along the first axis, are tangent to the sphere when v_y^2 + v_z^2
+        # is k, which follows from the intersection in PROJ's inverse.
+        distance = 1 + height / semi_major
+        k = 1 / (distance * distance - 1)
+        angles = np.arange(count) * (math.pi * 2 / count)
+        scale = math.sqrt(k) * (1 - _ANALYTIC_EDGE_MARGIN)
+        v_y = np.cos(angles) * scale
+        v_z = np.sin(angles) * scale
+        if method_name.endswith('(Sweep X)'):
+            scan_z = np.arctan(v_z)
+            scan_y = np.arctan(v_y / np.sqrt(1 + v_z * v_z))
+        else:
+            scan_y = np.arctan(v_y)
+            scan_z = np.arctan(v_z / np.sqrt(1 + v_y * v_y))
+        return np.column_stack((scan_y * height, scan_z * height))
+    return None
+
+
+def _circle_points(radius: float, count: int) -> np.ndarray:
+    angles = np.arange(count) * (math.pi * 2 / count)
+    radius = radius * (1 - _ANALYTIC_EDGE_MARGIN)
+    return np.column_stack((np.cos(angles) * radius, np.sin(angles) * radius))
+
+
+def _binary_search_edges_crs(
+        transformer: Transformer,
+        cos_angles: np.ndarray,
+        sin_angles: np.ndarray,
+        threshold=1
+) -> np.ndarray:
+    """
+    Searches for the radius of the edge of the `crs`'s domain along many
+    angles at once. Each iteration projects the pivots of all the angles that
+    have not converged yet with a single call to the transformer.
+
+    :param transformer: The transformer from the `crs` to WGS 84.
+    :param cos_angles: The cosine of each angle.
+    :param sin_angles: The sine of each angle.
+    :param threshold: The distance (measured in the `crs`'s units) between the
+                      radii and the actual edge.
+    :return: The largest radius found along each angle that can still be
+             transformed.
+    """
     min_r = 0
     crs = transformer.source_crs
     if crs.coordinate_operation.method_name == 'Orthographic':
@@ -192,14 +317,19 @@ def _binary_search_edge_crs(
         ) * 0.9
 
     max_r = max(crs.ellipsoid.semi_minor_metre, crs.ellipsoid.semi_major_metre)
-    while max_r - min_r > threshold:
-        pivot_r = (min_r + max_r) / 2
-        x = math.cos(angle) * pivot_r
-        y = math.sin(angle) * pivot_r
-        if (transformer.transform(x, y))[0] == float('inf'):
-            max_r = pivot_r
-        else:
-            min_r = pivot_r
+    min_r = np.full(len(cos_angles), float(min_r))
+    max_r = np.full(len(cos_angles), float(max_r))
+    active = np.flatnonzero(max_r - min_r > threshold)
+    while len(active) > 0:
+        pivot_r = (min_r[active] + max_r[active]) / 2
+        x, _ = transformer.transform(
+            cos_angles[active] * pivot_r,
+            sin_angles[active] * pivot_r
+        )
+        is_outside = np.asarray(x) == float('inf')
+        max_r[active[is_outside]] = pivot_r[is_outside]
+        min_r[active[~is_outside]] = pivot_r[~is_outside]
+        active = active[max_r[active] - min_r[active] > threshold]
 
     return min_r
 
@@ -302,37 +432,43 @@ def _trim_polygon(crs: CRS, polygon: Polygon) -> Polygon:
     Remove coordinates from the polygon can cannot be interpolated easily but
     simply cutting out a box between the coordinates.
 
+    The mid-points of all the edges are checked with a single transformation,
+    and the boxes are cut out of the polygon together.
+
     :param crs: The coordinate reference system to verify.
     :param polygon: The polygon to cut.
     :return: A new polygon.
     """
-    wgs84_to_proj = Transformer.from_proj(
+    wgs84_to_proj = get_transformer(
         CRS.from_epsg(4326),
         crs
     )
-    new_polygon = Polygon(polygon)
-    for i in range(len(polygon.exterior.coords) - 1):
-        a = polygon.exterior.coords[i]
-        b = polygon.exterior.coords[i + 1]
-        if a[0] == b[0] or a[1] == b[1]:
-            continue
-
-        # We want to preserve diagonals as much as possible, so we only cut off
-        # pieces if the mid-point for two coordinates cannot be projected. But
-        # this is known to produce false positives! So this might be removed.
-        mid_point = (a[0] + b[0]) / 2, (a[1] + b[1]) / 2
-        if wgs84_to_proj.transform(*mid_point)[0] != float('inf'):
-            continue
-
-        boxed_coordinates = _box_coordinates(a, b)
-        new_polygon = new_polygon.difference(boxed_coordinates)
-    return new_polygon
-
-
-def _box_coordinates(a: Tuple[float, float], b: Tuple[float, float]):
-    return box(
-        min(a[0], b[0]),
-        min(a[1], b[1]),
-        max(a[0], b[0]),
-        max(a[1], b[1]),
+    coords = np.asarray(polygon.exterior.coords)[:, :2]
+    a = coords[:-1]
+    b = coords[1:]
+    is_diagonal = (a[:, 0] != b[:, 0]) & (a[:, 1] != b[:, 1])
+    a = a[is_diagonal]
+    b = b[is_diagonal]
+    if len(a) == 0:
+        return Polygon(polygon)
+
+    # We want to preserve diagonals as much as possible, so we only cut off
+    # pieces if the mid-point for two coordinates cannot be projected. But
+    # this is known to produce false positives! So this might be removed.
+    mid_x, _ = wgs84_to_proj.transform(
+        (a[:, 0] + b[:, 0]) / 2,
+        (a[:, 1] + b[:, 1]) / 2
+    )
+    is_invalid = np.asarray(mid_x) == float('inf')
+    if not np.any(is_invalid):
+        return Polygon(polygon)
+
+    a = a[is_invalid]
+    b = b[is_invalid]
+    boxes = shapely.box(
+        np.minimum(a[:, 0], b[:, 0]),
+        np.minimum(a[:, 1], b[:, 1]),
+        np.maximum(a[:, 0], b[:, 0]),
+        np.maximum(a[:, 1], b[:, 1])
     )
+    return polygon.difference(shapely.unary_union(boxes))
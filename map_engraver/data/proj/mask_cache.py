@@ -0,0 +1,151 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+
+import shapely
+from pyproj import CRS
+from shapely.geometry import MultiPolygon
+
+# Stored masks are ignored when this changes, for example if the algorithm
+# that generates them is improved.
+_FILE_FORMAT_VERSION = 2
+
+_MaskKey = Tuple[str, str, int, float]
+
+# Cached in memory to distinguish masks that do not exist from masks that
+# have not been generated.
+_NO_MASK = object()
+
+
+class MaskCache:
+    """
+    A least-recently-used cache of projection masks.
+
+    Masks are expensive to generate, since the edge of the projection is
+    found by searching along many angles with pyproj. The cache generates the
+    mask once for each CRS, resolution and threshold, and returns the same
+    MultiPolygon afterwards. CRSs are identified by their WKT, so equivalent
+    CRSs share masks regardless of how they were created.
+
+    If a directory is given, masks are also stored there as WKB, so that they
+    can be reused by other processes, or when the same maps are rendered
+    again.
+    """
+
+    def __init__(
+            self,
+            maxsize: int = 32,
+            directory: Optional[Union[str, Path]] = None
+    ):
+        """
+        :param maxsize: The maximum number of masks to keep in memory.
+        :param directory: The directory to store masks in. It is created if it
+                          does not exist.
+        """
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.directory = Path(directory) if directory is not None else None
+        self._lock = threading.Lock()
+        self._masks: 'OrderedDict[_MaskKey, object]' = OrderedDict()
+
+    def get(
+            self,
+            kind: str,
+            crs: CRS,
+            resolution: int,
+            threshold: float,
+            build: Callable[[], Optional[MultiPolygon]]
+    ) -> Optional[MultiPolygon]:
+        """
+        Returns the mask from the cache, or builds and stores it if it is not
+        in the cache.
+
+        :param kind: The name of the function generating the mask, to
+                     distinguish different masks for the same CRS.
+        :param crs: The CRS the mask is for.
+        :param resolution: The resolution the mask is generated with.
+        :param threshold: The threshold the mask is generated with.
+        :param build: A function that generates the mask.
+        :return: The mask, or None if the CRS does not have a mask.
+        """
+        key = (kind, crs.to_wkt(), resolution, threshold)
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                return None if mask is _NO_MASK else mask
+
+        mask = self._read(key)
+        if mask is None:
+            mask = build()
+            if mask is not None:
+                self._write(key, mask)
+
+        with self._lock:
+            self._masks[key] = _NO_MASK if mask is None else mask
+            if len(self._masks) > self.maxsize:
+                self._masks.popitem(last=False)
+        return mask
+
+    def clear(self):
+        """Removes all masks from memory. Stored masks are kept."""
+        with self._lock:
+            self._masks.clear()
+
+    def __len__(self) -> int:
+        return len(self._masks)
+
+    def _get_path(self, key: _MaskKey) -> Path:
+        digest = hashlib.sha256(
+            repr((_FILE_FORMAT_VERSION,) + key).encode('utf-8')
+        ).hexdigest()
+        return self.directory.joinpath('%s.wkb' % digest)
+
+    def _read(self, key: _MaskKey) -> Optional[MultiPolygon]:
+        if self.directory is None:
+            return None
+        path = self._get_path(key)
+        if not path.exists():
+            return None
+        return shapely.from_wkb(path.read_bytes())
+
+    def _write(self, key: _MaskKey, mask: MultiPolygon):
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Masks are written to a temporary file first, so that other
+        # processes never read a partially written mask.
+        file_descriptor, temp_path = tempfile.mkstemp(
+            dir=self.directory,
+            suffix='.tmp'
+        )
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                file.write(shapely.to_wkb(mask))
+            os.replace(temp_path, self._get_path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+
+_default_cache = MaskCache()
+
+
+def get_default_mask_cache() -> MaskCache:
+    return _default_cache
+
+
+def set_default_mask_cache(cache: MaskCache):
+    """
+    Replaces the process-wide cache, for example with a cache that stores
+    masks in a directory.
+
+    :param cache: The new cache.
+    """
+    global _default_cache
+    _default_cache = cache
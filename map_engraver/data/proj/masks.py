@@ -11,11 +11,19 @@ from map_engraver.data.proj.cylindrical_masks import \
     is_supported_cylindrical_projection, \
     cylindrical_mask, \
     cylindrical_mask_wgs84
+from map_engraver.data.proj.mask_cache import get_default_mask_cache
+from map_engraver.data.proj.sampled_masks import \
+    sampled_mask, \
+    sampled_mask_wgs84
 from map_engraver.data.proj.wgs84_masks import \
     wgs84_mask as wgs84_mask_gen
 
 
-def crs_mask(crs: CRS) -> Optional[MultiPolygon]:
+def crs_mask(
+        crs: CRS,
+        resolution=64,
+        threshold=1
+) -> Optional[MultiPolygon]:
     """
     Returns a mask that can be used to clip shapely objects in the CRS's
     projection.
@@ -23,31 +31,77 @@ def crs_mask(crs: CRS) -> Optional[MultiPolygon]:
     This can be used to create a backdrop polygon. For example, with the
     orthographic projection, the globe's extent can be displayed.
 
+    Projections without a specific mask use a mask generated by sampling
+    coordinates with `sampled_mask()`. Masks are cached with the default
+    `MaskCache`, so they are only generated once for each CRS.
+
     :param crs:
-    :return:
+    :param resolution: The number of points to approximate 1/4th of the mask.
+    :param threshold: The distance (measured in the `crs`'s units) between the
+                      mask and the actual boundary of the `crs's` domain.
+    :return: The mask, or None if the domain is (almost) infinite, like for
+             UTM, or no coordinates could be transformed.
     """
-    if crs.name == 'WGS 84':
-        return MultiPolygon([wgs84_mask_gen()])
-    if is_supported_azimuthal_projection(crs):
-        return MultiPolygon([azimuthal_mask(crs)])
-    if is_supported_cylindrical_projection(crs):
-        return cylindrical_mask(crs)
-    return None
-    pass
+    return get_default_mask_cache().get(
+        'crs_mask',
+        crs,
+        resolution,
+        threshold,
+        lambda: _build_crs_mask(crs, resolution, threshold)
+    )
 
 
-def wgs84_mask(crs: CRS) -> Optional[MultiPolygon]:
+def wgs84_mask(
+        crs: CRS,
+        resolution=64,
+        threshold=1
+) -> Optional[MultiPolygon]:
     """
     Returns a mask that can be used to clip shapely objects in the WGS 84
     projection, so they can be transformed into the CRS.
 
+    Projections without a specific mask use a mask generated by sampling the
+    WGS 84 grid with `sampled_mask_wgs84()`. Masks are cached with the default
+    `MaskCache`, so they are only generated once for each CRS.
+
     :param crs:
-    :return:
+    :param resolution: The number of points to approximate 1/4th of the mask.
+    :param threshold: The distance (measured in the `crs`'s units) between the
+                      mask and the actual boundary of the `crs's` domain.
+    :return: The mask, or None if no coordinates could be transformed.
     """
+    return get_default_mask_cache().get(
+        'wgs84_mask',
+        crs,
+        resolution,
+        threshold,
+        lambda: _build_wgs84_mask(crs, resolution, threshold)
+    )
+
+
+def _build_crs_mask(
+        crs: CRS,
+        resolution,
+        threshold
+) -> Optional[MultiPolygon]:
+    if crs.name == 'WGS 84':
+        return MultiPolygon([wgs84_mask_gen()])
+    if is_supported_azimuthal_projection(crs):
+        return MultiPolygon([azimuthal_mask(crs, resolution, threshold)])
+    if is_supported_cylindrical_projection(crs):
+        return cylindrical_mask(crs, resolution, threshold)
+    return sampled_mask(crs, resolution, threshold)
+
+
+def _build_wgs84_mask(
+        crs: CRS,
+        resolution,
+        threshold
+) -> Optional[MultiPolygon]:
     if crs.name == 'WGS 84':
         return MultiPolygon([wgs84_mask_gen()])
     if is_supported_azimuthal_projection(crs):
-        return azimuthal_mask_wgs84(crs)
+        return azimuthal_mask_wgs84(crs, resolution, threshold)
     if is_supported_cylindrical_projection(crs):
         return cylindrical_mask_wgs84(crs)
-    return None
+    return sampled_mask_wgs84(crs, resolution)
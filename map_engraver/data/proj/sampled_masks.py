@@ -0,0 +1,380 @@
+import math
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import shapely
+from pyproj import CRS, Transformer
+from shapely.geometry import Polygon, MultiPolygon
+
+from map_engraver.data.osm_shapely_ops.homogenize import \
+    geoms_to_multi_polygon
+from map_engraver.data.proj.transformer_pool import get_transformer
+
+_Validator = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+# Transformed coordinates must return to within this fraction of a grid cell
+# to be considered valid. Outside a projection's domain, PROJ either fails or
+# wraps coordinates around, which is far outside this tolerance.
+_ROUND_TRIP_TOLERANCE = 0.001
+# Projected coordinates are also allowed an error relative to their distance
+# from the origin, since transformations lose precision where the projection
+# stretches the globe, like near the poles of Mercator.
+_RELATIVE_ROUND_TRIP_TOLERANCE = 0.001
+
+
+def sampled_mask(
+        crs: CRS,
+        resolution=64,
+        threshold=1
+) -> Optional[MultiPolygon]:
+    """
+    Generates a polygon that represents the domain of any `crs`, by sampling
+    coordinates in the `crs`'s projection.
+
+    This is slower and less precise than the masks of specific projections,
+    but works for any CRS. The extent of the `crs`'s projection is first
+    found by sampling the WGS 84 grid, and the extent is then sampled with a
+    grid, where a point is valid if it can be transformed to WGS 84 and back.
+
+    :param crs: The coordinate reference system to create a mask for.
+    :param resolution: The number of grid cells along 1/4th of each axis of
+                       the sampled grid.
+    :param threshold: The distance (measured in the `crs`'s units) between the
+                      mask's edges and the actual boundary of the `crs`'s
+                      domain.
+    :return: A MultiPolygon that approximates the `crs`'s domain in the
+             `crs`'s own projection, or None if no coordinates are valid.
+    """
+    wgs84_crs = CRS.from_epsg(4326)
+    wgs84_to_proj = get_transformer(wgs84_crs, crs)
+    proj_to_wgs84 = get_transformer(crs, wgs84_crs)
+
+    # Find the extent of the projection from the valid WGS 84 samples, and
+    # points along the edges of the WGS 84 domain.
+    wgs84_domain = _sample_wgs84_domain(
+        wgs84_to_proj,
+        proj_to_wgs84,
+        resolution,
+        0.01
+    )
+    if wgs84_domain is None:
+        return None
+    lat, lon = np.meshgrid(
+        np.linspace(-90, 90, resolution * 2 + 1),
+        np.linspace(-180, 180, resolution * 4 + 1),
+        indexing='ij'
+    )
+    samples = np.concatenate((
+        np.column_stack((lat.ravel(), lon.ravel())),
+        shapely.get_coordinates(
+            shapely.segmentize(wgs84_domain, 90 / resolution)
+        )
+    ))
+    samples = samples[shapely.contains_xy(
+        wgs84_domain,
+        samples[:, 0],
+        samples[:, 1]
+    ) | shapely.intersects_xy(
+        wgs84_domain.boundary,
+        samples[:, 0],
+        samples[:, 1]
+    )]
+    # Poles that are projected to a line, like in Mercator, are stretched
+    # infinitely, and would make the extent meaningless.
+    for pole_lat in [-90, 90]:
+        if _is_singular_pole(wgs84_to_proj, pole_lat):
+            samples = samples[samples[:, 0] != pole_lat]
+    x, y = wgs84_to_proj.transform(samples[:, 0], samples[:, 1])
+    x = np.asarray(x)
+    y = np.asarray(y)
+    is_finite = np.isfinite(x) & np.isfinite(y)
+    if not np.any(is_finite):
+        return None
+    min_x, max_x = np.min(x[is_finite]), np.max(x[is_finite])
+    min_y, max_y = np.min(y[is_finite]), np.max(y[is_finite])
+    # Extend the extent, so that the domain's edges are inside the grid.
+    margin_x = max((max_x - min_x) * 0.01, threshold)
+    margin_y = max((max_y - min_y) * 0.01, threshold)
+    bounds = (
+        min_x - margin_x,
+        min_y - margin_y,
+        max_x + margin_x,
+        max_y + margin_y
+    )
+    shape = (resolution * 4, resolution * 4)
+    tolerance = _get_cell_size(bounds, shape) * _ROUND_TRIP_TOLERANCE
+    return _sample_domain(
+        lambda x, y: _is_round_trip(
+            proj_to_wgs84,
+            wgs84_to_proj,
+            x,
+            y,
+            tolerance
+        ),
+        bounds,
+        shape,
+        threshold
+    )
+
+
+def sampled_mask_wgs84(
+        crs: CRS,
+        resolution=64,
+        threshold=0.01
+) -> Optional[MultiPolygon]:
+    """
+    Generates a polygon that represents the domain of any `crs` in the WGS 84
+    projection, by sampling the WGS 84 grid.
+
+    A coordinate is valid if it can be transformed to the `crs` and back to
+    the same coordinate. The edges of the domain are traced with marching
+    squares, and refined along each grid cell with a binary search.
+
+    :param crs: The coordinate reference system to create a mask for.
+    :param resolution: The number of grid cells per 90 degrees.
+    :param threshold: The distance, in degrees, between the mask's edges and
+                      the actual boundary of the `crs`'s domain.
+    :return: A MultiPolygon that approximates the `crs`'s domain in the WGS 84
+             projection, or None if no coordinates are valid.
+    """
+    wgs84_crs = CRS.from_epsg(4326)
+    return _sample_wgs84_domain(
+        get_transformer(wgs84_crs, crs),
+        get_transformer(crs, wgs84_crs),
+        resolution,
+        threshold
+    )
+
+
+def _sample_wgs84_domain(
+        wgs84_to_proj: Transformer,
+        proj_to_wgs84: Transformer,
+        resolution: int,
+        threshold: float
+) -> Optional[MultiPolygon]:
+    shape = (resolution * 2, resolution * 4)
+    tolerance = _get_cell_size((-90, -180, 90, 180), shape) * \
+        _ROUND_TRIP_TOLERANCE
+    return _sample_domain(
+        lambda lat, lon: _is_wgs84_round_trip(
+            wgs84_to_proj,
+            proj_to_wgs84,
+            lat,
+            lon,
+            tolerance
+        ),
+        (-90, -180, 90, 180),
+        shape,
+        threshold
+    )
+
+
+def _sample_domain(
+        is_valid: _Validator,
+        bounds: Tuple[float, float, float, float],
+        shape: Tuple[int, int],
+        threshold: float
+) -> Optional[MultiPolygon]:
+    """
+    Traces the region of valid coordinates within the bounds.
+
+    The bounds are sampled with a grid of `shape` cells. Every cell edge
+    between a valid and an invalid sample is refined with a binary search,
+    and each cell is then replaced by the part of the cell that is valid, as
+    in marching squares. Neighbouring cells share the refined points, so the
+    cells are merged without gaps.
+
+    :param is_valid: A function that returns whether each of the coordinates
+                     is valid.
+    :param bounds: The area to sample, as (min_x, min_y, max_x, max_y).
+    :param shape: The number of cells along the x and y axis.
+    :param threshold: The maximum distance between the refined points and
+                      the actual edge of the region.
+    :return: The valid region, or None if no samples are valid.
+    """
+    xs = np.linspace(bounds[0], bounds[2], shape[0] + 1)
+    ys = np.linspace(bounds[1], bounds[3], shape[1] + 1)
+    grid_x, grid_y = np.meshgrid(xs, ys, indexing='ij')
+    valid = is_valid(grid_x.ravel(), grid_y.ravel()).reshape(grid_x.shape)
+    if not np.any(valid):
+        return None
+
+    # The refined points along the edges parallel to the x axis, and parallel
+    # to the y axis. Edges without a change in validity are NaN.
+    x_edge_points = _refine_edges(
+        is_valid,
+        grid_x[:-1, :], grid_y[:-1, :], valid[:-1, :],
+        grid_x[1:, :], grid_y[1:, :], valid[1:, :],
+        threshold
+    )
+    y_edge_points = _refine_edges(
+        is_valid,
+        grid_x[:, :-1], grid_y[:, :-1], valid[:, :-1],
+        grid_x[:, 1:], grid_y[:, 1:], valid[:, 1:],
+        threshold
+    )
+
+    # The corners of each cell, in order around the cell.
+    corners = np.stack((
+        valid[:-1, :-1],
+        valid[1:, :-1],
+        valid[1:, 1:],
+        valid[:-1, 1:]
+    ))
+    valid_corner_count = np.sum(corners, axis=0)
+
+    polygons = _get_full_cell_boxes(xs, ys, valid_corner_count == 4)
+    for i, j in zip(*np.nonzero(
+            (valid_corner_count > 0) & (valid_corner_count < 4)
+    )):
+        corner_points = [
+            (xs[i], ys[j]),
+            (xs[i + 1], ys[j]),
+            (xs[i + 1], ys[j + 1]),
+            (xs[i], ys[j + 1])
+        ]
+        edge_points = [
+            x_edge_points[i, j],
+            y_edge_points[i + 1, j],
+            x_edge_points[i, j + 1],
+            y_edge_points[i, j]
+        ]
+        points = []
+        for k in range(4):
+            if corners[k, i, j]:
+                points.append(corner_points[k])
+            if corners[k, i, j] != corners[(k + 1) % 4, i, j]:
+                points.append(tuple(edge_points[k]))
+        if len(points) >= 3:
+            polygons.append(Polygon(points))
+
+    domain = shapely.unary_union(polygons)
+    # Remove the vertices the cells leave along straight edges.
+    domain = shapely.simplify(domain, 0)
+    domain = geoms_to_multi_polygon(domain)
+    if domain.is_empty:
+        return None
+    return domain
+
+
+def _refine_edges(
+        is_valid: _Validator,
+        a_x: np.ndarray,
+        a_y: np.ndarray,
+        a_valid: np.ndarray,
+        b_x: np.ndarray,
+        b_y: np.ndarray,
+        b_valid: np.ndarray,
+        threshold: float
+) -> np.ndarray:
+    """
+    Searches for the edge of the valid region along every grid edge between a
+    valid and an invalid sample, all at once.
+
+    :return: An array of the valid points closest to the edge, with the shape
+             of the grid edges and a final dimension of 2. Grid edges without
+             a change in validity are NaN.
+    """
+    points = np.full(a_x.shape + (2,), np.nan)
+    crossing = a_valid != b_valid
+    if not np.any(crossing):
+        return points
+    a_is_valid = a_valid[crossing]
+    valid_x = np.where(a_is_valid, a_x[crossing], b_x[crossing])
+    valid_y = np.where(a_is_valid, a_y[crossing], b_y[crossing])
+    invalid_x = np.where(a_is_valid, b_x[crossing], a_x[crossing])
+    invalid_y = np.where(a_is_valid, b_y[crossing], a_y[crossing])
+
+    length = np.max(np.hypot(invalid_x - valid_x, invalid_y - valid_y))
+    iterations = 0
+    if length > threshold > 0:
+        iterations = min(math.ceil(math.log2(length / threshold)), 52)
+    for _ in range(iterations):
+        mid_x = (valid_x + invalid_x) / 2
+        mid_y = (valid_y + invalid_y) / 2
+        is_mid_valid = is_valid(mid_x, mid_y)
+        valid_x = np.where(is_mid_valid, mid_x, valid_x)
+        valid_y = np.where(is_mid_valid, mid_y, valid_y)
+        invalid_x = np.where(is_mid_valid, invalid_x, mid_x)
+        invalid_y = np.where(is_mid_valid, invalid_y, mid_y)
+
+    points[crossing] = np.column_stack((valid_x, valid_y))
+    return points
+
+
+def _get_full_cell_boxes(
+        xs: np.ndarray,
+        ys: np.ndarray,
+        is_full: np.ndarray
+) -> list:
+    """
+    Returns boxes that cover the cells that are entirely valid, merging
+    consecutive cells along the y axis.
+    """
+    boxes = []
+    for i in range(is_full.shape[0]):
+        padded = np.concatenate(([False], is_full[i], [False]))
+        changes = np.flatnonzero(padded[1:] != padded[:-1])
+        for start, end in zip(changes[0::2], changes[1::2]):
+            boxes.append(shapely.box(xs[i], ys[start], xs[i + 1], ys[end]))
+    return boxes
+
+
+def _get_cell_size(
+        bounds: Tuple[float, float, float, float],
+        shape: Tuple[int, int]
+) -> float:
+    return min(
+        (bounds[2] - bounds[0]) / shape[0],
+        (bounds[3] - bounds[1]) / shape[1]
+    )
+
+
+def _is_singular_pole(wgs84_to_proj: Transformer, lat: float) -> bool:
+    lon = np.linspace(-180, 180, 9)
+    x, y = wgs84_to_proj.transform(np.full(len(lon), lat), lon)
+    x = np.asarray(x)
+    y = np.asarray(y)
+    is_finite = np.isfinite(x) & np.isfinite(y)
+    if not np.any(is_finite):
+        return False
+    spread = max(np.ptp(x[is_finite]), np.ptp(y[is_finite]))
+    scale = max(np.max(np.abs(x[is_finite])), np.max(np.abs(y[is_finite])))
+    return spread > scale * _RELATIVE_ROUND_TRIP_TOLERANCE
+
+
+def _is_wgs84_round_trip(
+        wgs84_to_proj: Transformer,
+        proj_to_wgs84: Transformer,
+        lat: np.ndarray,
+        lon: np.ndarray,
+        tolerance: float
+) -> np.ndarray:
+    x, y = wgs84_to_proj.transform(lat, lon)
+    new_lat, new_lon = proj_to_wgs84.transform(x, y)
+    with np.errstate(invalid='ignore'):
+        lat_error = np.abs(np.asarray(new_lat) - lat)
+        # Longitudes that differ by 360 degrees are the same, and any
+        # longitude is valid at the poles.
+        lon_error = np.abs((np.asarray(new_lon) - lon + 180) % 360 - 180)
+        is_pole = np.abs(lat) >= 90
+        return np.isfinite(x) & np.isfinite(y) & \
+            (lat_error <= tolerance) & ((lon_error <= tolerance) | is_pole)
+
+
+def _is_round_trip(
+        proj_to_wgs84: Transformer,
+        wgs84_to_proj: Transformer,
+        x: np.ndarray,
+        y: np.ndarray,
+        tolerance: float
+) -> np.ndarray:
+    lat, lon = proj_to_wgs84.transform(x, y)
+    new_x, new_y = wgs84_to_proj.transform(lat, lon)
+    tolerance = tolerance + np.hypot(x, y) * _RELATIVE_ROUND_TRIP_TOLERANCE
+    with np.errstate(invalid='ignore'):
+        # Some CRSs, like geographic CRSs, return coordinates outside of the
+        # globe instead of failing.
+        return (np.abs(lat) <= 90) & (np.abs(lon) <= 180) & \
+            (np.abs(np.asarray(new_x) - x) <= tolerance) & \
+            (np.abs(np.asarray(new_y) - y) <= tolerance)
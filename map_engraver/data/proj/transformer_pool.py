@@ -0,0 +1,144 @@
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+from pyproj import CRS, Transformer
+
+_TransformerKey = Tuple[str, str, bool]
+
+
+class TransformerPool:
+    """
+    A least-recently-used cache of pyproj transformers.
+
+    Creating a `Transformer` is expensive, since PROJ has to look up and
+    initialise the operations between the two CRSs. The pool creates each
+    transformer once, and returns the same instance for the same source CRS,
+    target CRS and axis order afterwards.
+
+    CRSs are identified by the user input they were created from, which is
+    much cheaper than comparing their WKT.
+
+    pyproj transformers should not be shared between threads. If the pool is
+    used from multiple threads, set `thread_local` so that every thread gets
+    its own instances.
+    """
+
+    def __init__(self, maxsize: int = 64, thread_local: bool = False):
+        """
+        :param maxsize: The maximum number of transformers to keep, per thread
+                        if `thread_local` is set.
+        :param thread_local: Whether every thread should get its own
+                             transformers.
+        """
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.thread_local = thread_local
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._transformers: 'OrderedDict[_TransformerKey, Transformer]' = \
+            OrderedDict()
+
+    def get(
+            self,
+            source_crs: CRS,
+            target_crs: CRS,
+            always_xy: bool = False
+    ) -> Transformer:
+        """
+        Returns a transformer from the source CRS to the target CRS, creating
+        it with `Transformer.from_proj()` if it is not in the pool.
+
+        :param source_crs: The CRS to transform from.
+        :param target_crs: The CRS to transform to.
+        :param always_xy: Whether the transformer should use the
+                          longitude/latitude and easting/northing axis order,
+                          regardless of the CRSs' definitions.
+        :return: The transformer.
+        """
+        key = (source_crs.srs, target_crs.srs, always_xy)
+        if self.thread_local:
+            return self._get(
+                self._get_local_transformers(),
+                key,
+                source_crs,
+                target_crs
+            )
+        with self._lock:
+            return self._get(self._transformers, key, source_crs, target_crs)
+
+    def clear(self):
+        """Removes all transformers from the pool, for the current thread."""
+        with self._lock:
+            self._transformers.clear()
+        self._get_local_transformers().clear()
+
+    def __len__(self) -> int:
+        if self.thread_local:
+            return len(self._get_local_transformers())
+        return len(self._transformers)
+
+    def _get(
+            self,
+            transformers: 'OrderedDict[_TransformerKey, Transformer]',
+            key: _TransformerKey,
+            source_crs: CRS,
+            target_crs: CRS
+    ) -> Transformer:
+        transformer = transformers.get(key)
+        if transformer is not None:
+            transformers.move_to_end(key)
+            return transformer
+        transformer = Transformer.from_proj(
+            source_crs,
+            target_crs,
+            always_xy=key[2]
+        )
+        transformers[key] = transformer
+        if len(transformers) > self.maxsize:
+            transformers.popitem(last=False)
+        return transformer
+
+    def _get_local_transformers(
+            self
+    ) -> 'OrderedDict[_TransformerKey, Transformer]':
+        if not hasattr(self._local, 'transformers'):
+            self._local.transformers = OrderedDict()
+        return self._local.transformers
+
+
+_default_pool = TransformerPool()
+
+
+def get_transformer(
+        source_crs: CRS,
+        target_crs: CRS,
+        always_xy: bool = False
+) -> Transformer:
+    """
+    Returns a transformer from the process-wide `TransformerPool`.
+
+    :param source_crs: The CRS to transform from.
+    :param target_crs: The CRS to transform to.
+    :param always_xy: Whether the transformer should use the
+                      longitude/latitude and easting/northing axis order,
+                      regardless of the CRSs' definitions.
+    :return: The transformer.
+    """
+    return _default_pool.get(source_crs, target_crs, always_xy)
+
+
+def get_default_transformer_pool() -> TransformerPool:
+    return _default_pool
+
+
+def set_default_transformer_pool(pool: TransformerPool):
+    """
+    Replaces the process-wide pool, for example with a pool that is thread
+    local, or that keeps more transformers.
+
+    :param pool: The new pool.
+    """
+    global _default_pool
+    _default_pool = pool
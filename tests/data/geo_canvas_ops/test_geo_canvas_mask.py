@@ -68,7 +68,7 @@ class TestMasks(unittest.TestCase):
         self.assertAlmostEqual(mask_bounds[2], 2657152.324517375, 4)
         self.assertAlmostEqual(mask_bounds[3], 2657152.324517375, 4)
 
-    def test_functions_for_crs_with_unknown_mask(self):
+    def test_functions_for_crs_with_sampled_mask(self):
         canvas_size = rect(CanvasBbox.from_size_pt(-20, 50, 170, 100))
         builder = GeoCanvasTransformersBuilder()
         builder.set_scale_and_origin_from_coordinates_and_crs(
@@ -86,5 +86,11 @@ class TestMasks(unittest.TestCase):
         self.assertAlmostEqual(mask_bounds[2], 2483045.0799831273, 4)
         self.assertAlmostEqual(mask_bounds[3], 7265748.284420505, 4)
 
+        # The mask of the projection is sampled, since it is not a known
+        # projection.
         mask = canvas_wgs84_mask(canvas_size, builder)
-        self.assertIsNone(mask)
+        mask_bounds = mask.bounds
+        self.assertAlmostEqual(mask_bounds[0], -38.6834, 2)
+        self.assertAlmostEqual(mask_bounds[1], 154.1669, 2)
+        self.assertAlmostEqual(mask_bounds[2], -29.1804, 2)
+        self.assertAlmostEqual(mask_bounds[3], 172.6984, 2)
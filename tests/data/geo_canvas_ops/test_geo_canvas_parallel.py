@@ -0,0 +1,79 @@
+import pyproj
+import unittest
+
+from shapely.geometry import Point, LineString, Polygon
+
+from map_engraver.canvas.canvas_coordinate import CanvasCoordinate
+from map_engraver.canvas.canvas_unit import CanvasUnit
+from map_engraver.data.geo.geo_coordinate import GeoCoordinate
+from map_engraver.data.geo_canvas_ops.geo_canvas_parallel import \
+    transform_geoms_to_canvas
+from map_engraver.data.geo_canvas_ops.geo_canvas_scale import GeoCanvasScale
+from map_engraver.data.geo_canvas_ops.geo_canvas_transformers_builder import \
+    GeoCanvasTransformersBuilder
+from map_engraver.data.osm_shapely_ops.transform import \
+    transform_interpolated_euclidean
+
+
+class TestGeoCanvasParallel(unittest.TestCase):
+    def test_transform_geoms_to_canvas(self):
+        wgs84_crs = pyproj.CRS.from_epsg(4326)
+        british_crs = pyproj.CRS.from_epsg(27700)
+
+        builder = GeoCanvasTransformersBuilder()
+        builder.set_crs(british_crs)
+        builder.set_data_crs(wgs84_crs)
+        builder.set_origin_for_geo(GeoCoordinate(325600, 673400, british_crs))
+        builder.set_origin_for_canvas(CanvasCoordinate.from_pt(200, 200))
+        builder.set_scale(GeoCanvasScale(1000, CanvasUnit.from_pt(100)))
+        transformer = builder.build_crs_to_canvas_array_transformer()
+
+        geoms = []
+        for i in range(10):
+            lat = 50 + i / 2
+            geoms.append(Point(lat, -3))
+            geoms.append(LineString([(lat, -5), (lat + 0.5, 1)]))
+            geoms.append(Polygon([
+                (lat, -5), (lat + 0.5, -5), (lat + 0.5, 1), (lat, -5)
+            ]))
+        expected_geoms = [
+            transform_interpolated_euclidean(transformer, geom)
+            for geom in geoms
+        ]
+
+        for workers in [1, 2]:
+            transformed_geoms = transform_geoms_to_canvas(
+                builder.describe(),
+                geoms,
+                workers=workers,
+                chunk_size=4
+            )
+            self.assertEqual(len(transformed_geoms), len(geoms))
+            for transformed_geom, expected_geom in zip(
+                    transformed_geoms,
+                    expected_geoms
+            ):
+                self.assertTrue(transformed_geom.equals_exact(
+                    expected_geom,
+                    1e-9
+                ))
+
+        # Without interpolation, only the vertices are transformed.
+        transformed_geoms = transform_geoms_to_canvas(
+            builder.describe(),
+            geoms,
+            interpolate=False,
+            workers=2,
+            chunk_size=4
+        )
+        self.assertEqual(
+            len(transformed_geoms[1].coords),
+            len(geoms[1].coords)
+        )
+        self.assertGreater(
+            len(expected_geoms[1].coords),
+            len(geoms[1].coords)
+        )
+
+        with self.assertRaises(ValueError):
+            transform_geoms_to_canvas(builder.describe(), geoms, chunk_size=0)
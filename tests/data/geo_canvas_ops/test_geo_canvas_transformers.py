@@ -2,7 +2,9 @@ import math
 
 from typing import Tuple
 
+import numpy as np
 import pyproj
+import shapely
 import unittest
 
 from map_engraver.canvas.canvas_coordinate import CanvasCoordinate
@@ -11,7 +13,9 @@ from map_engraver.data.geo.geo_coordinate import GeoCoordinate
 from map_engraver.data.geo_canvas_ops.geo_canvas_scale import GeoCanvasScale
 from map_engraver.data.geo_canvas_ops.geo_canvas_transformers import \
     build_crs_to_canvas_transformer, \
-    build_canvas_to_crs_transformer
+    build_crs_to_canvas_array_transformer, \
+    build_canvas_to_crs_transformer, \
+    build_canvas_to_crs_array_transformer
 
 
 class TestGeoCanvasTransformers(unittest.TestCase):
@@ -248,3 +252,115 @@ class TestGeoCanvasTransformers(unittest.TestCase):
             transformation_func(*expected_canvas_coordinates),
             coordinate_to_project.tuple
         )
+
+    def test_build_crs_to_canvas_array_transformer(self):
+        wgs84_crs = pyproj.CRS.from_epsg(4326)
+        british_crs = pyproj.CRS.from_epsg(27700)
+        origin_for_geo = GeoCoordinate(258000, 666000, british_crs)
+        origin_for_canvas = CanvasCoordinate(
+            CanvasUnit.from_cm(1),
+            CanvasUnit.from_cm(1)
+        )
+        geo_to_canvas_scale = GeoCanvasScale(100, CanvasUnit.from_cm(1))
+
+        coordinates = np.array([
+            (55.862777, -4.260919),
+            (55.9, -4.3),
+            (55.8, -4.2)
+        ])
+
+        for options in [
+            {'data_crs': wgs84_crs},
+            {'data_crs': wgs84_crs, 'rotation': 0.3, 'is_crs_yx': True},
+            {'data_crs': wgs84_crs, 'is_data_yx': True},
+            {'rotation': math.pi / 2}
+        ]:
+            transformation_func = build_crs_to_canvas_transformer(
+                crs=british_crs,
+                scale=geo_to_canvas_scale,
+                origin_for_geo=origin_for_geo,
+                origin_for_canvas=origin_for_canvas,
+                **options
+            )
+            array_transformation_func = build_crs_to_canvas_array_transformer(
+                crs=british_crs,
+                scale=geo_to_canvas_scale,
+                origin_for_geo=origin_for_geo,
+                origin_for_canvas=origin_for_canvas,
+                **options
+            )
+            data = coordinates
+            if 'data_crs' not in options:
+                data = coordinates * 1000 + 258000
+            # The array transformer gives the exact same results.
+            expected = [transformation_func(*coord) for coord in data]
+            self.assertEqual(
+                array_transformation_func(data).tolist(),
+                np.array(expected).tolist()
+            )
+            x, y = array_transformation_func(data[:, 0], data[:, 1])
+            self.assertEqual(
+                np.column_stack((x, y)).tolist(),
+                np.array(expected).tolist()
+            )
+
+        line_string = shapely.transform(
+            shapely.LineString(coordinates),
+            array_transformation_func
+        )
+        self.assertEqual(len(line_string.coords), 3)
+
+    def test_build_canvas_to_crs_array_transformer(self):
+        wgs84_crs = pyproj.CRS.from_epsg(4326)
+        british_crs = pyproj.CRS.from_epsg(27700)
+        origin_for_geo = GeoCoordinate(258000, 666000, british_crs)
+        origin_for_canvas = CanvasCoordinate(
+            CanvasUnit.from_cm(1),
+            CanvasUnit.from_cm(1)
+        )
+        geo_to_canvas_scale = GeoCanvasScale(100, CanvasUnit.from_cm(1))
+
+        canvas_coordinates = np.array([(0, 0), (198.4, 141.7), (-50, 400)])
+
+        for options in [
+            {'data_crs': wgs84_crs},
+            {'data_crs': wgs84_crs, 'rotation': 0.3, 'is_crs_yx': True},
+            {'data_crs': wgs84_crs, 'is_data_yx': True},
+            {'rotation': math.pi / 2}
+        ]:
+            transformation_func = build_canvas_to_crs_transformer(
+                crs=british_crs,
+                scale=geo_to_canvas_scale,
+                origin_for_geo=origin_for_geo,
+                origin_for_canvas=origin_for_canvas,
+                **options
+            )
+            array_transformation_func = build_canvas_to_crs_array_transformer(
+                crs=british_crs,
+                scale=geo_to_canvas_scale,
+                origin_for_geo=origin_for_geo,
+                origin_for_canvas=origin_for_canvas,
+                **options
+            )
+            # The array transformer gives the exact same results.
+            expected = [
+                transformation_func(*coord) for coord in canvas_coordinates
+            ]
+            self.assertEqual(
+                array_transformation_func(canvas_coordinates).tolist(),
+                np.array(expected).tolist()
+            )
+
+            # The inverse transformer undoes the forward transformer.
+            crs_to_canvas = build_crs_to_canvas_array_transformer(
+                crs=british_crs,
+                scale=geo_to_canvas_scale,
+                origin_for_geo=origin_for_geo,
+                origin_for_canvas=origin_for_canvas,
+                **options
+            )
+            np.testing.assert_allclose(
+                crs_to_canvas(array_transformation_func(canvas_coordinates)),
+                canvas_coordinates,
+                atol=0.01
+            )
@@ -1,3 +1,4 @@
+import pickle
 import pyproj
 import unittest
 
@@ -43,6 +44,18 @@ class TestGeoCanvasTransformersBuilder(unittest.TestCase):
             (55.956836, -3.193169)
         )
 
+        crs_to_canvas_array = builder.build_crs_to_canvas_array_transformer()
+        TestGeoCanvasTransformers.assert_coordinates_are_close(
+            crs_to_canvas_array([[55.956836, -3.193169]])[0],
+            (200, 100)
+        )
+
+        canvas_to_crs_array = builder.build_canvas_to_crs_array_transformer()
+        TestGeoCanvasTransformers.assert_coordinates_are_close(
+            canvas_to_crs_array([[200, 100]])[0],
+            (55.956836, -3.193169)
+        )
+
     def test_set_scale_and_origin_from_coordinates_and_crs(self):
         wgs84_crs = pyproj.CRS.from_epsg(4326)
         british_crs = pyproj.CRS.from_epsg(27700)
@@ -95,9 +108,15 @@ class TestGeoCanvasTransformersBuilder(unittest.TestCase):
         with self.assertRaises(Exception):
             builder.build_crs_to_canvas_transformer()
 
+        with self.assertRaises(Exception):
+            builder.build_crs_to_canvas_array_transformer()
+
         with self.assertRaises(Exception):
             builder.build_canvas_to_crs_transformer()
 
+        with self.assertRaises(Exception):
+            builder.build_canvas_to_crs_array_transformer()
+
     def test_copy(self):
         wgs84_crs = pyproj.CRS.from_epsg(4326)
         british_crs = pyproj.CRS.from_epsg(27700)
@@ -143,3 +162,47 @@ class TestGeoCanvasTransformersBuilder(unittest.TestCase):
             builder_copy.origin_for_canvas
         )
         self.assertNotEqual(builder.scale, builder_copy.scale)
+
+    def test_describe(self):
+        wgs84_crs = pyproj.CRS.from_epsg(4326)
+        british_crs = pyproj.CRS.from_epsg(27700)
+
+        builder = GeoCanvasTransformersBuilder()
+        builder.set_crs(british_crs)
+        builder.set_rotation(0.1)
+        builder.set_data_crs(wgs84_crs)
+        builder.set_origin_for_geo(GeoCoordinate(325600, 673400, british_crs))
+        builder.set_origin_for_canvas(CanvasCoordinate.from_pt(200, 200))
+        builder.set_scale(GeoCanvasScale(1000, CanvasUnit.from_pt(100)))
+
+        description = builder.describe()
+        self.assertEqual(
+            pickle.loads(pickle.dumps(description)),
+            description
+        )
+
+        builder_from_description = GeoCanvasTransformersBuilder \
+            .from_description(description)
+        self.assertEqual(builder_from_description.crs, british_crs)
+        self.assertEqual(builder_from_description.data_crs, wgs84_crs)
+        # CRSs with the same WKT are only created once.
+        self.assertIs(
+            builder_from_description.origin_for_geo.crs,
+            builder_from_description.crs
+        )
+        self.assertEqual(builder_from_description.rotation, 0.1)
+        self.assertEqual(
+            builder.build_crs_to_canvas_transformer()(55.95, -3.19),
+            builder_from_description.build_crs_to_canvas_transformer()(
+                55.95,
+                -3.19
+            )
+        )
+
+        empty_builder = GeoCanvasTransformersBuilder.from_description(
+            GeoCanvasTransformersBuilder().describe()
+        )
+        self.assertIsNone(empty_builder.crs)
+        self.assertIsNone(empty_builder.scale)
+        self.assertIsNone(empty_builder.origin_for_geo)
+        self.assertIsNone(empty_builder.origin_for_canvas)
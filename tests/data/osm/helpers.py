@@ -0,0 +1,57 @@
+import unittest
+from typing import Optional
+
+from map_engraver.data.osm import Osm
+
+
+def assert_osm_equal(
+        test_case: unittest.TestCase,
+        expected: Osm,
+        actual: Osm,
+        places: Optional[int] = None
+):
+    """
+    :param places: If set, node coordinates only need to be equal to this
+                   number of decimal places.
+    """
+    test_case.assertEqual(
+        list(expected.nodes.keys()),
+        list(actual.nodes.keys())
+    )
+    for ref, node in expected.nodes.items():
+        test_case.assertEqual(node.id, actual.get_node(ref).id)
+        if places is None:
+            test_case.assertEqual(node.lat, actual.get_node(ref).lat)
+            test_case.assertEqual(node.lon, actual.get_node(ref).lon)
+        else:
+            test_case.assertAlmostEqual(
+                node.lat,
+                actual.get_node(ref).lat,
+                places
+            )
+            test_case.assertAlmostEqual(
+                node.lon,
+                actual.get_node(ref).lon,
+                places
+            )
+        test_case.assertEqual(node.tags, actual.get_node(ref).tags)
+
+    test_case.assertEqual(
+        list(expected.ways.keys()),
+        list(actual.ways.keys())
+    )
+    for ref, way in expected.ways.items():
+        test_case.assertEqual(way.node_refs, actual.get_way(ref).node_refs)
+        test_case.assertEqual(way.tags, actual.get_way(ref).tags)
+
+    test_case.assertEqual(
+        list(expected.relations.keys()),
+        list(actual.relations.keys())
+    )
+    for ref, relation in expected.relations.items():
+        actual_relation = actual.get_relation(ref)
+        test_case.assertEqual(relation.tags, actual_relation.tags)
+        test_case.assertEqual(
+            [(m.type, m.ref, m.role) for m in relation.members],
+            [(m.type, m.ref, m.role) for m in actual_relation.members]
+        )
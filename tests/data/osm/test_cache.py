@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import unittest
+from unittest.mock import patch
+
+from shapely.geometry import Point
+
+from map_engraver.data.osm import Parser, OsmCache, CompactNodeStore
+from map_engraver.data.osm_shapely.osm_to_shapely import OsmToShapely
+from tests.data.osm.helpers import assert_osm_equal
+
+
+class TestOsmCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.cache = OsmCache(self.temp_dir.joinpath('cache'))
+        self.osm_file = self.temp_dir.joinpath('data.osm')
+        shutil.copyfile(
+            Path(__file__).parent.joinpath('data.osm'),
+            self.osm_file
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_cache_returns_same_objects_as_parser(self):
+        self.assertIsNone(self.cache.load(self.osm_file))
+
+        expected = Parser.parse(self.osm_file)
+        assert_osm_equal(self, expected, self.cache.parse(self.osm_file))
+
+        cached = self.cache.load(self.osm_file)
+        self.assertIsNotNone(cached)
+        assert_osm_equal(self, expected, cached)
+
+        cached = self.cache.load(self.osm_file, compact_nodes=True)
+        self.assertIsInstance(cached.nodes, CompactNodeStore)
+        assert_osm_equal(self, expected, cached)
+
+    def test_cache_is_invalidated_when_file_changes(self):
+        self.cache.parse(self.osm_file)
+
+        # Touching the file does not invalidate the cache.
+        stat = self.osm_file.stat()
+        os.utime(
+            self.osm_file,
+            ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9)
+        )
+        self.assertIsNotNone(self.cache.load(self.osm_file))
+
+        # Changing the contents does.
+        with open(self.osm_file, 'r') as file:
+            contents = file.read()
+        with open(self.osm_file, 'w') as file:
+            file.write(contents.replace("v='Alpha'", "v='Gamma'"))
+        self.assertIsNone(self.cache.load(self.osm_file))
+
+        osm = self.cache.parse(self.osm_file)
+        names = [
+            element.tags.get('name')
+            for element in list(osm.ways.values()) + list(osm.nodes.values())
+        ]
+        self.assertIn('Gamma', names)
+        self.assertNotIn('Alpha', names)
+
+    def test_cache_only_hashes_files_of_the_same_size(self):
+        self.cache.parse(self.osm_file)
+        with open(self.osm_file, 'a') as file:
+            file.write('\n')
+
+        with patch('map_engraver.data.osm.cache._hash_file') as hash_file:
+            self.assertIsNone(self.cache.load(self.osm_file))
+            hash_file.assert_not_called()
+
+    def test_cache_stores_geometries(self):
+        osm = self.cache.parse(self.osm_file)
+        self.assertIsNone(self.cache.load_geometries(self.osm_file, 'points'))
+
+        points = OsmToShapely(osm).nodes_to_points(osm.nodes)
+        points['missing'] = None
+        self.cache.save_geometries(self.osm_file, 'points', points)
+        cached_points = self.cache.load_geometries(self.osm_file, 'points')
+        self.assertEqual(list(points.keys()), list(cached_points.keys()))
+        self.assertIsNone(cached_points['missing'])
+        for ref, point in osm.nodes.items():
+            self.assertIsInstance(cached_points[ref], Point)
+            self.assertTrue(points[ref].equals_exact(cached_points[ref], 0))
+
+        # Geometries are invalidated along with the OSM file.
+        with open(self.osm_file, 'a') as file:
+            file.write('\n')
+        self.assertIsNone(self.cache.load_geometries(self.osm_file, 'points'))
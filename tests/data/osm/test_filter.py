@@ -3,7 +3,8 @@ from pathlib import Path
 import unittest
 
 from map_engraver.data.osm import Parser, Osm, Element, Way
-from map_engraver.data.osm.filter import filter_elements
+from map_engraver.data.osm.filter import filter_elements, query_elements, \
+    classify_elements, has_tags
 
 
 class TestFilter(unittest.TestCase):
@@ -49,3 +50,80 @@ class TestFilter(unittest.TestCase):
         assert len(osm_map_subset.nodes) == 0
         assert len(osm_map_subset.relations) == 0
         assert len(osm_map_subset.ways) == 0
+
+    def test_query_elements(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        osm_map = Parser.parse(path)
+
+        osm_map_subset = query_elements(osm_map, 'highway=service | building')
+
+        assert len(osm_map_subset.nodes) == 0
+        assert list(osm_map_subset.ways.keys()) == [
+            '-101787',
+            '-101873',
+            '-101889',
+            '-101931'
+        ]
+        assert list(osm_map_subset.relations.keys()) == ['-99750']
+
+        osm_map_subset = query_elements(
+            osm_map,
+            'highway',
+            filter_ways=False
+        )
+
+        assert list(osm_map_subset.nodes.keys()) == ['-101814', '-101818']
+        assert len(osm_map_subset.ways) == 0
+
+    def test_classify_elements(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        for compact_nodes in [False, True]:
+            osm_map = Parser.parse(path, compact_nodes=compact_nodes)
+            layers = {
+                'bus': 'bus=yes | route=bus',
+                'highway': 'highway',
+                'buildings': has_tags({'building': 'yes'}),
+            }
+
+            first_match_layers = classify_elements(osm_map, layers)
+            assert list(first_match_layers.keys()) == [
+                'bus',
+                'highway',
+                'buildings'
+            ]
+            bus_layer = first_match_layers['bus']
+            assert list(bus_layer.nodes.keys()) == ['-101814', '-101818']
+            assert len(bus_layer.ways) == 0
+            assert list(bus_layer.relations.keys()) == ['-99775']
+            highway_layer = first_match_layers['highway']
+            assert len(highway_layer.nodes) == 0
+            assert list(highway_layer.ways.keys()) == [
+                '-101873',
+                '-101889',
+                '-101931'
+            ]
+            buildings_layer = first_match_layers['buildings']
+            assert list(buildings_layer.ways.keys()) == ['-101787']
+            assert list(buildings_layer.relations.keys()) == ['-99750']
+
+            all_match_layers = classify_elements(
+                osm_map,
+                layers,
+                first_match=False
+            )
+            assert list(all_match_layers['highway'].nodes.keys()) == [
+                '-101814',
+                '-101818'
+            ]
+
+            # Untagged elements are classified too.
+            other_layers = classify_elements(
+                osm_map,
+                {'tagged': 'highway | building', 'other': '!type'},
+                filter_relations=False
+            )
+            assert len(other_layers['other'].nodes) == \
+                len(osm_map.nodes) - 2
+            assert len(other_layers['other'].ways) == 2
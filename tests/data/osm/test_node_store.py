@@ -0,0 +1,99 @@
+from pathlib import Path
+
+import unittest
+
+import numpy as np
+
+from map_engraver.data.osm import Parser, CompactNodeStore
+from map_engraver.data.osm.filter import has_tags
+from map_engraver.data.osm.util import get_nodes_for_way
+from map_engraver.data.osm_shapely.osm_to_shapely import OsmToShapely
+
+
+class TestNodeStore(unittest.TestCase):
+    def test_node_store_behaves_like_a_dict_of_nodes(self):
+        store = CompactNodeStore(
+            np.array([5, -3, 10]),
+            np.array([1.5, 2.5, 3.5]),
+            np.array([-1.5, -2.5, -3.5]),
+            {1: {'name': 'Alpha'}}
+        )
+
+        self.assertEqual(len(store), 3)
+        self.assertEqual(list(store.keys()), ['5', '-3', '10'])
+        self.assertIn('-3', store)
+        self.assertNotIn('4', store)
+        self.assertNotIn('not-an-id', store)
+        self.assertEqual(store['-3'].id, '-3')
+        self.assertEqual(store['-3'].lat, 2.5)
+        self.assertEqual(store['-3'].lon, -2.5)
+        self.assertEqual(store['-3'].tags, {'name': 'Alpha'})
+        self.assertEqual(store['10'].tags, {})
+        with self.assertRaises(KeyError):
+            _ = store['4']
+
+        self.assertEqual(
+            list(store.get_indexes(['10', '5', '-3'])),
+            [2, 0, 1]
+        )
+        with self.assertRaises(KeyError):
+            store.get_indexes(['10', '11'])
+        self.assertEqual(
+            list(store.get_indexes(['10', '11'], default=-1)),
+            [2, -1]
+        )
+
+        selected = store.select(np.array([False, True, True]))
+        self.assertEqual(list(selected.keys()), ['-3', '10'])
+        self.assertEqual(selected['-3'].tags, {'name': 'Alpha'})
+        self.assertEqual(selected['10'].lat, 3.5)
+
+    def test_parser_with_compact_nodes(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        osm_map = Parser.parse(path)
+        compact_osm_map = Parser.parse(path, compact_nodes=True)
+
+        self.assertIsInstance(compact_osm_map.nodes, CompactNodeStore)
+        self.assertEqual(
+            list(osm_map.nodes.keys()),
+            list(compact_osm_map.nodes.keys())
+        )
+        self.assertEqual(
+            compact_osm_map.get_node('-101762').tags['amenity'],
+            'bank'
+        )
+        self.assertEqual(
+            get_nodes_for_way(compact_osm_map, '-101873')[1].tags['name'],
+            'Beta'
+        )
+
+        filtered_osm_map = Parser.iterparse(
+            path,
+            has_tags({'highway': 'service'}),
+            compact_nodes=True
+        )
+        self.assertEqual(len(filtered_osm_map.nodes), 6)
+
+    def test_osm_to_shapely_with_compact_nodes(self):
+        path = Path(__file__).parent.parent.joinpath('osm_shapely/data.osm')
+
+        osm_to_shapely = OsmToShapely(Parser.parse(path))
+        compact_osm_to_shapely = OsmToShapely(
+            Parser.parse(path, compact_nodes=True)
+        )
+
+        self.assertEqual(
+            osm_to_shapely.ways_to_line_strings(osm_to_shapely.osm.ways),
+            compact_osm_to_shapely.ways_to_line_strings(
+                compact_osm_to_shapely.osm.ways
+            )
+        )
+        self.assertEqual(
+            osm_to_shapely.relations_to_multi_polygons(
+                osm_to_shapely.osm.relations
+            ),
+            compact_osm_to_shapely.relations_to_multi_polygons(
+                compact_osm_to_shapely.osm.relations
+            )
+        )
@@ -0,0 +1,80 @@
+from pathlib import Path
+import xml.etree.ElementTree as ElementTree
+
+import unittest
+
+from map_engraver.data.osm import Parser, Member, MemberTypes, Relation, Way
+
+
+class TestOsm(unittest.TestCase):
+    def test_get_parent_ways(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        for compact_nodes in [False, True]:
+            osm_map = Parser.parse(path, compact_nodes=compact_nodes)
+
+            self.assertEqual(
+                [way.id for way in osm_map.get_parent_ways('-101815')],
+                ['-101873', '-101889']
+            )
+            # The first node of a closed way is only listed once.
+            self.assertEqual(
+                [way.id for way in osm_map.get_parent_ways('-101758')],
+                ['-101787']
+            )
+            self.assertEqual(osm_map.get_parent_ways('-101762'), [])
+
+    def test_get_parent_relations(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+        osm_map = Parser.parse(path)
+
+        self.assertEqual(
+            [r.id for r in osm_map.get_parent_relations('-101791')],
+            ['-99750']
+        )
+        self.assertEqual(
+            [
+                r.id for r in
+                osm_map.get_parent_relations('-101814', MemberTypes.NODE)
+            ],
+            ['-99775']
+        )
+        # Nodes and ways are looked up separately.
+        self.assertEqual(osm_map.get_parent_relations('-101814'), [])
+        self.assertEqual(osm_map.get_parent_relations('-101787'), [])
+
+        # Relations can be members of other relations.
+        osm_map.relations['-1'] = Relation.from_values(
+            '-1',
+            [Member.from_values(MemberTypes.RELATION, '-99750', '')],
+            {}
+        )
+        self.assertEqual(
+            osm_map.get_parent_relations('-99750', MemberTypes.RELATION),
+            []
+        )
+        osm_map.clear_indexes()
+        self.assertEqual(
+            [
+                r.id for r in
+                osm_map.get_parent_relations('-99750', MemberTypes.RELATION)
+            ],
+            ['-1']
+        )
+
+    def test_clear_indexes(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+        osm_map = Parser.parse(path)
+
+        self.assertEqual(len(osm_map.get_parent_ways('-101762')), 0)
+        osm_map.ways['-1'] = Way.from_values('-1', ['-101762'], {})
+        osm_map.clear_indexes()
+        self.assertEqual(len(osm_map.get_parent_ways('-101762')), 1)
+
+    def test_relation_members(self):
+        member = Member(ElementTree.fromstring(
+            "<member type='relation' ref='-1' role='subarea' />"
+        ))
+        self.assertEqual(member.type, MemberTypes.RELATION)
+        self.assertEqual(member.ref, '-1')
+        self.assertEqual(member.role, 'subarea')
@@ -2,8 +2,12 @@ from pathlib import Path
 
 import unittest
 
+from shapely.geometry import Polygon
+
 from map_engraver.data.osm import Parser
+from map_engraver.data.osm.filter import has_tags
 from map_engraver.data.osm.util import get_nodes_for_way
+from tests.data.osm.helpers import assert_osm_equal
 
 
 class TestParser(unittest.TestCase):
@@ -21,3 +25,131 @@ class TestParser(unittest.TestCase):
         assert osm_map.get_relation('-99750').tags['building'] == 'yes'
 
         assert get_nodes_for_way(osm_map, '-101873')[1].tags['name'] == 'Beta'
+
+    def test_iterparse_reads_same_objects_as_parse(self):
+        paths = [
+            Path(__file__).parent.joinpath('data.osm'),
+            Path(__file__).parent.parent.joinpath('osm_shapely/data.osm'),
+            Path(__file__).parent.parent.joinpath(
+                'osm_shapely/coastline_data.osm'
+            )
+        ]
+        for path in paths:
+            assert_osm_equal(self, Parser.parse(path), Parser.iterparse(path))
+
+    def test_iterparse_with_element_filter(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        osm_map = Parser.iterparse(path, has_tags({'highway': 'service'}))
+
+        self.assertEqual(
+            list(osm_map.ways.keys()),
+            ['-101873', '-101889', '-101931']
+        )
+        self.assertEqual(len(osm_map.relations), 0)
+        # Only nodes referenced by the matching ways are kept.
+        self.assertEqual(
+            list(osm_map.nodes.keys()),
+            ['-101813', '-101814', '-101815', '-101818', '-101821', '-101822']
+        )
+        self.assertEqual(osm_map.get_node('-101814').tags['name'], 'Beta')
+
+    def test_iterparse_with_element_filter_keeps_relation_members(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        osm_map = Parser.parse(path, has_tags({'building': None}))
+
+        self.assertEqual(list(osm_map.relations.keys()), ['-99750'])
+        # The member ways of the relation do not have the tag themselves, but
+        # are kept because the relation needs them.
+        self.assertEqual(
+            list(osm_map.ways.keys()),
+            ['-101787', '-101791', '-101795']
+        )
+        self.assertNotIn('-101762', osm_map.nodes)
+        for way in osm_map.ways.values():
+            for node_ref in way.node_refs:
+                self.assertIn(node_ref, osm_map.nodes)
+
+    def test_iterparse_with_element_filter_keeps_matching_nodes(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        osm_map = Parser.iterparse(path, has_tags({'amenity': 'bank'}))
+
+        self.assertEqual(list(osm_map.nodes.keys()), ['-101762'])
+        self.assertEqual(len(osm_map.ways), 0)
+        self.assertEqual(len(osm_map.relations), 0)
+
+    def test_iterparse_with_bounds(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+        bounds = (59.0, 5.70, 59.011, 5.72)
+
+        for compact_nodes in [False, True]:
+            osm_map = Parser.parse(
+                path,
+                bounds=bounds,
+                compact_nodes=compact_nodes
+            )
+            # The bus route relation is kept because one of its ways crosses
+            # the bounds, and keeps all of its ways and stops.
+            self.assertEqual(
+                list(osm_map.ways.keys()),
+                ['-101787', '-101873', '-101889', '-101931']
+            )
+            self.assertEqual(list(osm_map.relations.keys()), ['-99775'])
+            self.assertEqual(
+                list(osm_map.nodes.keys()),
+                ['-101758', '-101759', '-101760', '-101761', '-101762',
+                 '-101813', '-101814', '-101815', '-101818', '-101821',
+                 '-101822']
+            )
+            self.assertEqual(
+                osm_map.get_way('-101873').node_refs,
+                ['-101813', '-101814', '-101815']
+            )
+
+        polygon = Polygon([
+            (59.0, 5.70), (59.011, 5.70), (59.011, 5.72), (59.0, 5.72)
+        ])
+        assert_osm_equal(
+            self,
+            Parser.parse(path, bounds=bounds),
+            Parser.parse(path, bounds=polygon)
+        )
+
+    def test_iterparse_with_bounds_trims_ways(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        osm_map = Parser.parse(
+            path,
+            element_filter=has_tags({'highway': 'service'}),
+            bounds=(59.0, 5.70, 59.011, 5.72),
+            trim_ways=True
+        )
+        self.assertEqual(list(osm_map.ways.keys()), ['-101873', '-101931'])
+        # Only one node beyond the bounds is kept.
+        self.assertEqual(
+            osm_map.get_way('-101873').node_refs,
+            ['-101813', '-101814']
+        )
+        self.assertEqual(
+            osm_map.get_way('-101931').node_refs,
+            ['-101821', '-101822', '-101813']
+        )
+        self.assertEqual(
+            list(osm_map.nodes.keys()),
+            ['-101813', '-101814', '-101821', '-101822']
+        )
+
+    def test_iterparse_with_bounds_keeps_ways_without_nodes_inside(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        # A segment of -101889 crosses the bounds.
+        osm_map = Parser.parse(path, bounds=(59.016, 5.735, 59.017, 5.74))
+        self.assertIn('-101889', osm_map.ways)
+        self.assertEqual(list(osm_map.relations.keys()), ['-99775'])
+
+        # The bounds lie within the closed way -101791.
+        osm_map = Parser.parse(path, bounds=(59.009, 5.740, 59.0095, 5.742))
+        self.assertEqual(list(osm_map.ways.keys()), ['-101791', '-101795'])
+        self.assertEqual(list(osm_map.relations.keys()), ['-99750'])
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import unittest
+
+from map_engraver.data.osm import Parser, PbfParser, CompactNodeStore
+from map_engraver.data.osm.pbf_parser import _decode_varints, _zigzag_array
+from tests.data.osm.helpers import assert_osm_equal
+
+
+class TestPbfParser(unittest.TestCase):
+    def test_pbf_parser_reads_same_objects_as_xml_parser(self):
+        expected = Parser.parse(Path(__file__).parent.joinpath('data.osm'))
+
+        # The fixtures were converted from data.osm with osmium, once with
+        # dense nodes and once without.
+        for file_name in ['data.osm.pbf', 'data_sparse.osm.pbf']:
+            path = Path(__file__).parent.joinpath(file_name)
+            # PBF files store coordinates with 7 decimal places.
+            for osm in [
+                PbfParser.parse(path, workers=1),
+                PbfParser.parse(path, workers=2)
+            ]:
+                assert_osm_equal(self, expected, osm, places=7)
+
+            osm = PbfParser.parse(path, compact_nodes=True)
+            self.assertIsInstance(osm.nodes, CompactNodeStore)
+            assert_osm_equal(self, expected, osm, places=7)
+
+    def test_pbf_parser_decodes_blocks_in_parallel(self):
+        path = Path(__file__).parent.joinpath('data.osm.pbf')
+        with open(path, 'rb') as pbf_source:
+            blobs = list(PbfParser._read_data_blobs(pbf_source))
+        # osmium writes nodes, ways and relations to separate blocks.
+        self.assertEqual(len(blobs), 3)
+
+        expected_blocks = list(PbfParser._decode_blocks(iter(blobs), 1))
+        blocks = list(PbfParser._decode_blocks(iter(blobs * 3), 2))
+        self.assertEqual(len(blocks), 9)
+        for index, block in enumerate(blocks):
+            expected_block = expected_blocks[index % 3]
+            self.assertEqual(
+                block.node_ids.tolist(),
+                expected_block.node_ids.tolist()
+            )
+            self.assertEqual(
+                block.way_ids.tolist(),
+                expected_block.way_ids.tolist()
+            )
+            self.assertEqual(
+                block.relation_ids.tolist(),
+                expected_block.relation_ids.tolist()
+            )
+
+    def test_decode_varints(self):
+        # 1, 300, 0 and 2^63 as unsigned varints.
+        data = bytes([
+            0x01,
+            0xac, 0x02,
+            0x00,
+            0x80, 0x80, 0x80, 0x80, 0x80, 0x80, 0x80, 0x80, 0x80, 0x01
+        ])
+        self.assertEqual(_decode_varints(data).tolist(), [1, 300, 0, 2 ** 63])
+        self.assertEqual(
+            _zigzag_array(_decode_varints(bytes([0, 1, 2, 3, 4]))).tolist(),
+            [0, -1, 1, -2, 2]
+        )
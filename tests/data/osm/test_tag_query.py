@@ -0,0 +1,95 @@
+from pathlib import Path
+
+import unittest
+
+from map_engraver.data.osm import Parser, MemberTypes
+from map_engraver.data.osm.tag_query import TagQuery, TagQuerySyntaxError
+
+
+class TestTagQuery(unittest.TestCase):
+    def test_matches(self):
+        tags = {'highway': 'primary', 'name': 'High Street', 'lanes': '2'}
+        matching_queries = [
+            'highway',
+            'highway=primary',
+            'highway~^(primary|secondary)$',
+            'highway & !building',
+            'building | lanes=2',
+            'name="High Street"',
+            "'name'~'^High '",
+            'highway!=secondary',
+            'highway!~^sec',
+            '!(building | highway=secondary) & (lanes=1 | lanes=2)',
+            '(highway~^(primary|secondary)$)',
+            '!!highway',
+        ]
+        for query in matching_queries:
+            self.assertTrue(TagQuery(query).matches(tags), query)
+
+        failing_queries = [
+            'building',
+            'highway=secondary',
+            'highway~^secondary$',
+            'highway & building',
+            '!highway',
+            'name=High',
+            'highway!=primary',
+        ]
+        for query in failing_queries:
+            self.assertFalse(TagQuery(query).matches(tags), query)
+
+    def test_invalid_queries(self):
+        invalid_queries = [
+            '',
+            'highway=',
+            'highway &',
+            '(highway',
+            'highway)',
+            'highway="primary',
+            'highway~(',
+            '& highway',
+        ]
+        for query in invalid_queries:
+            with self.assertRaises(TagQuerySyntaxError, msg=query):
+                TagQuery(query)
+
+    def test_select_matches_every_element(self):
+        path = Path(__file__).parent.parent.joinpath('osm_shapely/data.osm')
+
+        queries = [
+            'highway',
+            'building=yes',
+            'natural~^(water|wood)$',
+            'building & !type',
+            '!building',
+            '!building & !highway',
+            'type=multipolygon | amenity',
+            'name!=Alpha',
+        ]
+        for compact_nodes in [False, True]:
+            osm_map = Parser.parse(path, compact_nodes=compact_nodes)
+            for query in queries:
+                tag_query = TagQuery(query)
+                for element_type, elements in [
+                    (MemberTypes.NODE, osm_map.nodes),
+                    (MemberTypes.WAY, osm_map.ways),
+                    (MemberTypes.RELATION, osm_map.relations),
+                ]:
+                    self.assertEqual(
+                        tag_query.select(osm_map.get_tag_index(element_type)),
+                        [
+                            ref for ref, element in elements.items()
+                            if tag_query(element)
+                        ],
+                        query
+                    )
+
+    def test_query_as_element_filter(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        osm_map = Parser.parse(path, TagQuery('highway=service'))
+
+        self.assertEqual(
+            list(osm_map.ways.keys()),
+            ['-101873', '-101889', '-101931']
+        )
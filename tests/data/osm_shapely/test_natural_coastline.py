@@ -1,11 +1,19 @@
+import math
+import time
 import unittest
 from pathlib import Path
 from typing import Tuple
 
-from map_engraver.data.osm import Parser, Osm
+from shapely.geometry import box
+
+from map_engraver.data.osm import Parser, Osm, Node, Way
 from map_engraver.data.osm.filter import filter_elements
 from map_engraver.data.osm_shapely.natural_coastline import \
-    natural_coastline_to_multi_polygon, CoastlineOutputType
+    natural_coastline_to_multi_polygon, \
+    natural_coastline_to_tiles, \
+    natural_coastline_to_tiled_multi_polygon, \
+    get_tile_bounds, \
+    CoastlineOutputType
 
 
 class TestNaturalCoastline(unittest.TestCase):
@@ -139,3 +147,108 @@ class TestNaturalCoastline(unittest.TestCase):
                 bounds,
                 CoastlineOutputType.LAND
             )
+
+    def test_tiled_natural_coastline_matches_untiled_natural_coastline(self):
+        for filename in [
+            'coastline_data.osm',
+            'coastline_lake_in_land_data.osm'
+        ]:
+            osm_map, bounds = self.parse_osm(filename)
+            for output_type in CoastlineOutputType:
+                expected = natural_coastline_to_multi_polygon(
+                    osm_map,
+                    bounds,
+                    output_type
+                )
+                # The finer grids contain tiles that the coastline does not
+                # cross.
+                for grid_size in [(1, 1), (2, 3), (17, 13)]:
+                    tiled = natural_coastline_to_tiled_multi_polygon(
+                        osm_map,
+                        bounds,
+                        output_type,
+                        grid_size
+                    )
+                    self.assertEqual(len(tiled.geoms), len(expected.geoms))
+                    self.assertAlmostEqual(
+                        tiled.symmetric_difference(expected).area,
+                        0
+                    )
+
+    def test_tiled_natural_coastline_is_not_slower_than_untiled(self):
+        # A coastline that winds across the bounds, crossing the edges of
+        # the tiles hundreds of times.
+        node_count = 20000
+        nodes = {}
+        for i in range(node_count):
+            t = i / (node_count - 1)
+            node_id = str(i)
+            nodes[node_id] = Node.from_values(
+                node_id,
+                -0.5 + 2 * t,
+                0.5 + 0.6 * math.sin(t * 200 * math.pi),
+                {}
+            )
+        way = Way.from_values('1', list(nodes.keys()), {
+            'natural': 'coastline'
+        })
+        osm_map = Osm(nodes, {'1': way}, {})
+        bounds = (0, 0, 1, 1)
+
+        start = time.perf_counter()
+        expected = natural_coastline_to_multi_polygon(
+            osm_map,
+            bounds,
+            CoastlineOutputType.LAND
+        )
+        untiled_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tiled = natural_coastline_to_tiled_multi_polygon(
+            osm_map,
+            bounds,
+            CoastlineOutputType.LAND,
+            (4, 4)
+        )
+        tiled_time = time.perf_counter() - start
+
+        self.assertEqual(len(tiled.geoms), len(expected.geoms))
+        self.assertAlmostEqual(tiled.symmetric_difference(expected).area, 0)
+        self.assertLessEqual(tiled_time, untiled_time)
+
+    def test_natural_coastline_to_tiles(self):
+        osm_map, bounds = self.parse_osm('coastline_data.osm')
+
+        land = natural_coastline_to_multi_polygon(
+            osm_map,
+            bounds,
+            CoastlineOutputType.LAND
+        )
+        tile_bounds = get_tile_bounds(bounds, (3, 2))
+        for workers in [1, 2]:
+            tiles = natural_coastline_to_tiles(
+                osm_map,
+                bounds,
+                CoastlineOutputType.LAND,
+                (3, 2),
+                workers
+            )
+            self.assertEqual(list(tiles.keys()), list(tile_bounds.keys()))
+            for position, tile in tiles.items():
+                tile_land = land.intersection(box(*tile_bounds[position]))
+                self.assertAlmostEqual(
+                    tile.symmetric_difference(tile_land).area,
+                    0
+                )
+
+    def test_get_tile_bounds(self):
+        tile_bounds = get_tile_bounds((0, 1, 0.3, 2), (3, 2))
+        self.assertEqual(len(tile_bounds), 6)
+        self.assertEqual(tile_bounds[(0, 0)][:2], (0, 1))
+        self.assertEqual(tile_bounds[(2, 1)][2:], (0.3, 2))
+        # Neighbouring tiles share their edges exactly.
+        self.assertEqual(tile_bounds[(0, 0)][2], tile_bounds[(1, 0)][0])
+        self.assertEqual(tile_bounds[(0, 0)][3], tile_bounds[(0, 1)][1])
+
+        with self.assertRaises(ValueError):
+            get_tile_bounds((0, 0, 1, 1), (0, 1))
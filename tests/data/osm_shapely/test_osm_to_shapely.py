@@ -2,7 +2,9 @@ from pathlib import Path
 
 import unittest
 
-from map_engraver.data.osm import Parser
+from shapely.geometry import MultiPolygon, Polygon
+
+from map_engraver.data.osm import Parser, Node, Way
 from map_engraver.data.osm_shapely.osm_to_shapely import OsmToShapely, \
     WayToPolygonError
 
@@ -240,6 +242,58 @@ class TestOsmToShapely(unittest.TestCase):
              (41.40584898473, 2.21960304022)]
         )
 
+    def test_nested_multipolygon_relation(self):
+        path = Path(__file__).parent.joinpath('relation_nested_data.osm')
+
+        osm_map = Parser.parse(path)
+        osm_to_shapely = OsmToShapely(osm_map)
+
+        # An island with a lake, within the lake of a larger island. Each
+        # inner way must only become a hole of the smallest outer around it.
+        relation = osm_map.get_relation('-301')
+        multi_polygon = osm_to_shapely.relation_to_multi_polygon(relation)
+        self.assertTrue(multi_polygon.is_valid)
+        large_island, small_island = list(multi_polygon.geoms)
+        self.assertEqual(len(large_island.interiors), 1)
+        self.assertEqual(len(small_island.interiors), 1)
+        self.assertEqual(large_island.interiors[0].bounds,
+                         (10.05, 10.05, 10.15, 10.15))
+        self.assertEqual(small_island.interiors[0].bounds,
+                         (10.09, 10.09, 10.11, 10.11))
+        self.assertAlmostEqual(multi_polygon.area, 0.0312)
+
+    def test_bulk_conversion_matches_single_conversion(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        for compact_nodes in [False, True]:
+            osm_map = Parser.parse(path, compact_nodes=compact_nodes)
+            osm_to_shapely = OsmToShapely(osm_map)
+
+            line_strings = osm_to_shapely.ways_to_line_strings(osm_map.ways)
+            self.assertEqual(list(line_strings.keys()), list(osm_map.ways))
+            for ref, way in osm_map.ways.items():
+                self.assertEqual(
+                    line_strings[ref],
+                    osm_to_shapely.way_to_line_string(way)
+                )
+
+            closed_ways = {
+                ref: way for ref, way in osm_map.ways.items()
+                if len(way.node_refs) > 2 and
+                way.node_refs[0] == way.node_refs[-1]
+            }
+            polygons = osm_to_shapely.ways_to_polygons(closed_ways)
+            self.assertEqual(list(polygons.keys()), list(closed_ways))
+            for ref, way in closed_ways.items():
+                self.assertEqual(
+                    list(polygons[ref].exterior.coords),
+                    list(osm_to_shapely.way_to_polygon(way).exterior.coords)
+                )
+
+            self.assertEqual(osm_to_shapely.ways_to_polygons({}), {})
+            with self.assertRaises(WayToPolygonError):
+                osm_to_shapely.ways_to_polygons(osm_map.ways)
+
     def test_conversion_fails_for_invalid_types(self):
         path = Path(__file__).parent.joinpath('data.osm')
 
@@ -274,3 +328,60 @@ class TestOsmToShapely(unittest.TestCase):
         assert incomplete_polygon is None
         assert incomplete_elements[0] == incomplete_relation
         assert len(incomplete_refs) == 0
+
+    def test_normalize_polygons(self):
+        path = Path(__file__).parent.joinpath('data.osm')
+
+        osm_map = Parser.parse(path)
+        osm_to_shapely = OsmToShapely(osm_map)
+        repaired_refs = []
+        osm_to_shapely.repaired_refs_handler = repaired_refs.extend
+
+        # A way that intersects itself, in the shape of a bowtie.
+        for ref, lat, lon in [
+            ('-1', 0, 0), ('-2', 1, 1), ('-3', 1, 0), ('-4', 0, 1)
+        ]:
+            osm_map.nodes[ref] = Node.from_values(ref, lat, lon, {})
+        osm_map.ways['-1'] = Way.from_values(
+            '-1',
+            ['-1', '-2', '-3', '-4', '-1'],
+            {}
+        )
+        closed_ways = {
+            ref: way for ref, way in osm_map.ways.items()
+            if len(way.node_refs) > 2 and
+            way.node_refs[0] == way.node_refs[-1]
+        }
+
+        polygons = osm_to_shapely.ways_to_polygons(closed_ways)
+        self.assertFalse(polygons['-1'].is_valid)
+        self.assertEqual(repaired_refs, [])
+
+        valid_polygons = osm_to_shapely.ways_to_polygons(
+            closed_ways,
+            make_valid=True
+        )
+        self.assertEqual(repaired_refs, ['-1'])
+        self.assertIsInstance(valid_polygons['-1'], MultiPolygon)
+        self.assertTrue(valid_polygons['-1'].is_valid)
+        self.assertAlmostEqual(valid_polygons['-1'].area, 0.5)
+        for polygon in valid_polygons['-1'].geoms:
+            self.assertFalse(polygon.exterior.is_ccw)
+        for ref in closed_ways.keys():
+            if ref != '-1':
+                self.assertTrue(valid_polygons[ref].equals(polygons[ref]))
+
+        # Polygons are oriented with clockwise exteriors and
+        # counter-clockwise interiors.
+        repaired_refs.clear()
+        normalized = osm_to_shapely.normalize_polygons({
+            'a': Polygon(
+                [(0, 0), (2, 0), (2, 2), (0, 2)],
+                [[(0.5, 0.5), (0.5, 1.5), (1.5, 1.5), (1.5, 0.5)]]
+            ),
+            'b': None
+        })
+        self.assertEqual(repaired_refs, [])
+        self.assertFalse(normalized['a'].exterior.is_ccw)
+        self.assertTrue(normalized['a'].interiors[0].is_ccw)
+        self.assertIsNone(normalized['b'])
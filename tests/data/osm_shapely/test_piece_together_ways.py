@@ -0,0 +1,79 @@
+import unittest
+from typing import Dict, List
+
+from map_engraver.data.osm import Node
+from map_engraver.data.osm_shapely.piece_together_ways import \
+    piece_together_ways
+
+
+class TestPieceTogetherWays(unittest.TestCase):
+    @staticmethod
+    def piece_together(ways: Dict[str, List[int]], check_both_sides: bool):
+        # Node stores return a new object for each lookup of a node, so each
+        # way gets its own node objects.
+        way_nodes = {
+            ref: [Node.from_values(str(node), 0, 0, {}) for node in nodes]
+            for ref, nodes in ways.items()
+        }
+        incomplete, complete = piece_together_ways(
+            list(ways.keys()),
+            way_nodes,
+            {ref: nodes[0] for ref, nodes in way_nodes.items()},
+            {ref: nodes[-1] for ref, nodes in way_nodes.items()},
+            check_both_sides
+        )
+        return (
+            {
+                ref: [int(node.id) for node in nodes]
+                for ref, nodes in incomplete.items()
+            },
+            {
+                ref: [int(node.id) for node in nodes]
+                for ref, nodes in complete.items()
+            }
+        )
+
+    def test_closed_ways_are_returned_as_is(self):
+        incomplete, complete = self.piece_together(
+            {'a': [1, 2, 3, 1], 'b': [4, 5, 6, 4]},
+            False
+        )
+        self.assertEqual(incomplete, {})
+        self.assertEqual(complete, {'a': [1, 2, 3, 1], 'b': [4, 5, 6, 4]})
+
+    def test_ways_are_joined_in_any_order(self):
+        incomplete, complete = self.piece_together(
+            {'c': [3, 4], 'a': [1, 2], 'd': [4, 1], 'b': [2, 3]},
+            False
+        )
+        self.assertEqual(incomplete, {})
+        self.assertEqual(complete, {'c': [3, 4, 1, 2, 3]})
+
+    def test_incomplete_ways_are_joined_as_far_as_possible(self):
+        incomplete, complete = self.piece_together(
+            {'b': [2, 3], 'a': [1, 2], 'x': [7, 8], 'c': [3, 4]},
+            False
+        )
+        self.assertEqual(incomplete, {'a': [1, 2, 3, 4], 'x': [7, 8]})
+        self.assertEqual(complete, {})
+
+    def test_opposing_ways_are_only_joined_when_checking_both_sides(self):
+        ways = {'a': [1, 2, 3], 'b': [1, 4, 3]}
+
+        incomplete, complete = self.piece_together(ways, False)
+        self.assertEqual(incomplete, ways)
+        self.assertEqual(complete, {})
+
+        incomplete, complete = self.piece_together(ways, True)
+        self.assertEqual(incomplete, {})
+        self.assertEqual(complete, {'a': [1, 2, 3, 4, 1]})
+
+    def test_first_connecting_way_is_joined(self):
+        # Both 'b' and 'c' start where 'a' ends, so 'b' is joined first as it
+        # is listed before 'c'.
+        incomplete, complete = self.piece_together(
+            {'a': [1, 2], 'b': [2, 1], 'c': [2, 5]},
+            True
+        )
+        self.assertEqual(incomplete, {'c': [2, 5]})
+        self.assertEqual(complete, {'a': [1, 2, 1]})
@@ -1,10 +1,13 @@
+import math
 import unittest
+
+import numpy as np
 from shapely.geometry import Point, MultiPoint, \
     LineString, MultiLineString, \
     Polygon, MultiPolygon
 
 from map_engraver.data.osm_shapely_ops.transform import \
-    transform_interpolated_euclidean
+    transform_interpolated_euclidean, TransformCache
 
 
 class TestTransform(unittest.TestCase):
@@ -115,3 +118,124 @@ class TestTransform(unittest.TestCase):
             (3, 3)
         ]
         assert len(transformed_line_string.coords) == 3
+
+    def test_transform_interpolated_euclidean_calls_func_with_arrays(self):
+        # A projection where points past x=3 cannot be projected.
+        def faux_array_transformation(x, y):
+            calls.append(len(x))
+            x = np.asarray(x)
+            y = np.asarray(y)
+            with np.errstate(invalid='ignore'):
+                return (
+                    np.where(x > 3, float('inf'), np.sin(x) * 10),
+                    np.where(x > 3, float('inf'), np.cos(y) * 10)
+                )
+
+        def faux_transformation(x, y):
+            if x > 3:
+                return float('inf'), float('inf')
+            return math.sin(x) * 10, math.cos(y) * 10
+
+        polygon = Polygon(
+            [(0, 0), (0, 2), (2.5, 2), (3.5, 0), (0, 0)],
+            [[(0.5, 0.5), (0.5, 1), (1, 1), (0.5, 0.5)]]
+        )
+        calls = []
+        transformed_polygon = transform_interpolated_euclidean(
+            faux_array_transformation,
+            polygon
+        )
+        expected_polygon = transform_interpolated_euclidean(
+            faux_transformation,
+            polygon
+        )
+        # Every vertex is transformed once, and then all midpoints are
+        # transformed together, one level of interpolation at a time.
+        assert calls[0] == 9
+        assert len(calls) < 20
+        assert len(transformed_polygon.exterior.coords) > 5
+        assert list(transformed_polygon.exterior.coords) == \
+               list(expected_polygon.exterior.coords)
+        assert list(transformed_polygon.interiors[0].coords) == \
+               list(expected_polygon.interiors[0].coords)
+
+    def test_transform_interpolated_euclidean_with_cache(self):
+        def faux_transformation(x, y):
+            # Arrays are not supported, and are rejected before the call is
+            # counted.
+            projected = math.sin(x) * 10 + y * y * 10, math.cos(y) * 10
+            calls.append((x, y))
+            return projected
+
+        # Two neighbouring polygons, that share the edge from (1, 0) to
+        # (1, 1) in opposite directions.
+        polygon_a = Polygon([(0, 0), (0, 1), (1, 1), (1, 0), (0, 0)])
+        polygon_b = Polygon([(1, 0), (1, 1), (2, 1), (2, 0), (1, 0)])
+        calls = []
+        expected_a = transform_interpolated_euclidean(
+            faux_transformation,
+            polygon_a
+        )
+        expected_b = transform_interpolated_euclidean(
+            faux_transformation,
+            polygon_b
+        )
+        uncached_calls = len(calls)
+
+        calls = []
+        cache = TransformCache(faux_transformation)
+        transformed_a = transform_interpolated_euclidean(
+            faux_transformation,
+            polygon_a,
+            cache=cache
+        )
+        transformed_b = transform_interpolated_euclidean(
+            faux_transformation,
+            polygon_b,
+            cache=cache
+        )
+        assert list(transformed_a.exterior.coords) == \
+               list(expected_a.exterior.coords)
+        assert list(transformed_b.exterior.coords) == \
+               list(expected_b.exterior.coords)
+        # Every distinct vertex is transformed once.
+        assert len(calls) == len(set(calls))
+        assert len(calls) < uncached_calls
+
+        # The shared edge is the same in both transformed polygons.
+        shared_edge_a = list(transformed_a.exterior.coords)
+        shared_edge_b = list(transformed_b.exterior.coords)
+        start_a = shared_edge_a.index(faux_transformation(1, 1))
+        end_a = shared_edge_a.index(faux_transformation(1, 0))
+        end_b = shared_edge_b.index(faux_transformation(1, 1))
+        assert end_a - start_a > 1
+        assert shared_edge_a[start_a:end_a + 1] == \
+               list(reversed(shared_edge_b[:end_b + 1]))
+
+        # Transforming a polygon again does not call the function.
+        calls = []
+        transform_interpolated_euclidean(
+            faux_transformation,
+            polygon_a,
+            cache=cache
+        )
+        assert len(calls) == 0
+
+        # Old vertices and edges are removed from the cache.
+        cache = TransformCache(faux_transformation, 2, 2)
+        transformed_a = transform_interpolated_euclidean(
+            faux_transformation,
+            polygon_a,
+            cache=cache
+        )
+        assert list(transformed_a.exterior.coords) == \
+               list(expected_a.exterior.coords)
+        assert len(cache._vertices) == 2
+        assert len(cache._edges) == 2
+
+        with self.assertRaises(ValueError):
+            transform_interpolated_euclidean(
+                lambda x, y: (x, y),
+                polygon_a,
+                cache=cache
+            )
@@ -141,7 +141,7 @@ def get_azimuthal_test_cases():
             'expectedProjBounds': (
                 -3500814.2, -3500814.2, 3500814.2, 3500814.2
             ),
-            'expectedWgs84Bounds': (-17.4, -180.0, 90.0, 180.0),
+            'expectedWgs84Bounds': (-17.5, -180.0, 90.0, 180.0),
             'expectedWgs84GeomsCount': 1
         },
         {
@@ -149,7 +149,7 @@ def get_azimuthal_test_cases():
             'expectedProjBounds': (
                 -3500814.2, -3500814.2, 3500814.2, 3500814.2
             ),
-            'expectedWgs84Bounds': (-90.0, -180.0, 17.4, 180.0),
+            'expectedWgs84Bounds': (-90.0, -180.0, 17.5, 180.0),
             'expectedWgs84GeomsCount': 1
         },
         {
@@ -7,7 +7,8 @@ from shapely.geometry import Polygon, MultiPolygon
 from shapely.geometry.base import BaseGeometry
 
 from map_engraver.data.proj.azimuthal_masks import azimuthal_mask, \
-    azimuthal_mask_wgs84
+    azimuthal_mask_wgs84, \
+    _get_analytic_edge_points_crs
 from tests.data.proj.azimuthal_cases import get_azimuthal_test_cases
 
 
@@ -46,6 +47,45 @@ class TestAzimuthalMasks(unittest.TestCase):
                 abs_tol=1.0
             )
 
+    def test_azimuthal_mask_uses_analytic_edges(self):
+        analytic_cases = [
+            ('+proj=ortho +R=6371000 +lat_0=20', 6371000),
+            ('+proj=nsper +h=3000000 +lat_0=-20', 2783092.3),
+            ('+proj=tpers +h=5500000 +lat_0=40', 3500814.2),
+            ('+proj=geos +h=35785831 +R=6371000', 5428976.1),
+            ('+proj=geos +h=35785831 +R=6371000 +sweep=x', 5428976.1),
+        ]
+        for proj4, radius in analytic_cases:
+            crs = CRS.from_proj4(proj4)
+            self.assertIsNotNone(_get_analytic_edge_points_crs(crs, 64))
+            mask = azimuthal_mask(crs, resolution=256)
+            assert mask.is_valid
+            self.assert_mask_has_bounds(
+                mask,
+                (-radius, -radius, radius, radius),
+                abs_tol=1.0
+            )
+            wgs84_mask = azimuthal_mask_wgs84(crs)
+            self.assert_geoms_are_valid(wgs84_mask)
+            self.assert_all_points_are_valid(crs, wgs84_mask)
+
+        # The horizon is much closer than the threshold.
+        mask = azimuthal_mask_wgs84(
+            CRS.from_proj4('+proj=ortho +R=6371000 +lat_0=20')
+        )
+        self.assertAlmostEqual(mask.bounds[0], -70, places=2)
+
+        fallback_cases = [
+            '+proj=ortho +lat_0=20',
+            '+proj=ortho +R=6371000 +x_0=1000',
+            '+proj=ortho +R=6371000 +units=km',
+            '+proj=tpers +h=5500000 +lat_0=30 +tilt=30',
+            '+proj=geos +h=35785831',
+        ]
+        for proj4 in fallback_cases:
+            crs = CRS.from_proj4(proj4)
+            self.assertIsNone(_get_analytic_edge_points_crs(crs, 64))
+
     def test_azimuthal_mask_throws_error_on_unsupported_proj(self):
         crs = CRS.from_epsg(4326)
         with self.assertRaises(Exception):
@@ -0,0 +1,96 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from pyproj import CRS
+from shapely.geometry import MultiPolygon, Polygon
+
+from map_engraver.data.proj.mask_cache import MaskCache, \
+    get_default_mask_cache, \
+    set_default_mask_cache
+from map_engraver.data.proj.masks import crs_mask
+
+
+class TestMaskCache(unittest.TestCase):
+    def test_masks_are_reused(self):
+        cache = MaskCache()
+        ortho_crs = CRS.from_proj4('+proj=ortho')
+        builds = []
+
+        def build():
+            builds.append(None)
+            return MultiPolygon([Polygon([(0, 0), (0, 1), (1, 1)])])
+
+        mask = cache.get('mask', ortho_crs, 64, 1, build)
+        self.assertIs(cache.get('mask', ortho_crs, 64, 1, build), mask)
+        # CRSs are compared by their WKT.
+        self.assertIs(
+            cache.get('mask', CRS.from_proj4('+proj=ortho'), 64, 1, build),
+            mask
+        )
+        self.assertEqual(len(builds), 1)
+
+        # The kind, resolution and threshold are part of the key.
+        cache.get('other_mask', ortho_crs, 64, 1, build)
+        cache.get('mask', ortho_crs, 32, 1, build)
+        cache.get('mask', ortho_crs, 64, 2, build)
+        self.assertEqual(len(builds), 4)
+        self.assertEqual(len(cache), 4)
+
+        # CRSs without masks are also cached.
+        unknown_crs = CRS.from_epsg(27200)
+        for _ in range(2):
+            self.assertIsNone(cache.get(
+                'mask', unknown_crs, 64, 1, lambda: builds.append(None)
+            ))
+        self.assertEqual(len(builds), 5)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_masks_are_removed(self):
+        cache = MaskCache(maxsize=2)
+        ortho_crs = CRS.from_proj4('+proj=ortho')
+
+        def build():
+            return MultiPolygon([Polygon([(0, 0), (0, 1), (1, 1)])])
+
+        mask_a = cache.get('a', ortho_crs, 64, 1, build)
+        mask_b = cache.get('b', ortho_crs, 64, 1, build)
+        self.assertIs(cache.get('a', ortho_crs, 64, 1, build), mask_a)
+        cache.get('c', ortho_crs, 64, 1, build)
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get('a', ortho_crs, 64, 1, build), mask_a)
+        self.assertIsNot(cache.get('b', ortho_crs, 64, 1, build), mask_b)
+
+        with self.assertRaises(ValueError):
+            MaskCache(maxsize=0)
+
+    def test_masks_are_stored_in_directory(self):
+        ortho_crs = CRS.from_proj4('+proj=ortho')
+        mask = MultiPolygon([Polygon([(0, 0), (0, 1), (1, 1)])])
+        with tempfile.TemporaryDirectory() as directory:
+            directory = Path(directory).joinpath('masks')
+            MaskCache(directory=directory).get(
+                'mask', ortho_crs, 64, 1, lambda: mask
+            )
+            self.assertEqual(len(list(directory.glob('*.wkb'))), 1)
+
+            def build():
+                raise AssertionError('The stored mask should be used')
+
+            stored_mask = MaskCache(directory=directory).get(
+                'mask', ortho_crs, 64, 1, build
+            )
+            self.assertTrue(stored_mask.equals(mask))
+
+    def test_crs_mask_uses_default_cache(self):
+        default_cache = get_default_mask_cache()
+        try:
+            cache = MaskCache()
+            set_default_mask_cache(cache)
+            mask = crs_mask(CRS.from_proj4('+proj=ortho'))
+            self.assertIs(crs_mask(CRS.from_proj4('+proj=ortho')), mask)
+            self.assertEqual(len(cache), 1)
+        finally:
+            set_default_mask_cache(default_cache)
@@ -15,8 +15,11 @@ class TestMasks(unittest.TestCase):
         )
         # Cylindrical
         self.assertIsNone(crs_mask(CRS.from_epsg(32601)))
-        # Unknown
-        self.assertIsNone(crs_mask(CRS.from_epsg(27200)))
+        # Sampled
+        self.assertIsInstance(crs_mask(CRS.from_epsg(27200)), MultiPolygon)
+        self.assertIsInstance(
+            crs_mask(CRS.from_proj4('+proj=robin')), MultiPolygon
+        )
 
     def test_wgs84_mask_correct_projections_are_selected(self):
         # WGS 84
@@ -27,5 +30,25 @@ class TestMasks(unittest.TestCase):
         )
         # Cylindrical
         self.assertIsInstance(wgs84_mask(CRS.from_epsg(32601)), MultiPolygon)
-        # Unknown
-        self.assertIsNone(wgs84_mask(CRS.from_epsg(27200)))
+        # Sampled
+        self.assertIsInstance(wgs84_mask(CRS.from_epsg(27200)), MultiPolygon)
+        self.assertIsInstance(
+            wgs84_mask(CRS.from_proj4('+proj=robin')), MultiPolygon
+        )
+
+    def test_masks_for_geographic_crs_other_than_wgs84(self):
+        # OGC:CRS84 uses longitude, latitude, unlike WGS 84.
+        mask = crs_mask(CRS.from_string('OGC:CRS84'))
+        self.assertIsInstance(mask, MultiPolygon)
+        min_x, min_y, max_x, max_y = mask.bounds
+        self.assertLess(min_x, -179)
+        self.assertLess(min_y, -89)
+        self.assertGreater(max_x, 179)
+        self.assertGreater(max_y, 89)
+        self.assertIsInstance(
+            wgs84_mask(CRS.from_string('OGC:CRS84')),
+            MultiPolygon
+        )
+
+        self.assertIsInstance(crs_mask(CRS.from_epsg(4269)), MultiPolygon)
+        self.assertIsInstance(wgs84_mask(CRS.from_epsg(4269)), MultiPolygon)
@@ -0,0 +1,55 @@
+import unittest
+from math import isclose
+
+from pyproj import CRS, Transformer
+from shapely.geometry import Point
+
+from map_engraver.data.proj.sampled_masks import sampled_mask, \
+    sampled_mask_wgs84
+
+
+class TestSampledMasks(unittest.TestCase):
+    def test_sampled_mask_wgs84(self):
+        # Robinson can project the whole globe, except for a few points on
+        # the anti-meridian that PROJ can't transform back.
+        mask = sampled_mask_wgs84(CRS.from_proj4('+proj=robin'))
+        assert mask.is_valid
+        self.assertEqual(len(mask.geoms), 1)
+        self.assertEqual(mask.bounds, (-90, -180, 90, 180))
+        self.assertAlmostEqual(mask.area, 180 * 360, delta=0.1)
+
+        # The orthographic projection can only project one hemisphere, and
+        # the edge is refined to within the threshold.
+        crs = CRS.from_proj4('+proj=ortho +lat_0=20')
+        mask = sampled_mask_wgs84(crs, resolution=16)
+        assert mask.is_valid
+        assert isclose(mask.bounds[0], -70, abs_tol=0.01)
+        assert mask.contains(Point(20, 0))
+        assert not mask.contains(Point(-20, 180))
+        transformer = Transformer.from_proj(CRS.from_epsg(4326), crs)
+        for geom in mask.geoms:
+            for point in geom.exterior.coords:
+                assert transformer.transform(*point)[0] != float('inf')
+
+    def test_sampled_mask(self):
+        # Mercator's poles are stretched infinitely, so the mask is limited
+        # to the latitudes that can be sampled.
+        mask = sampled_mask(CRS.from_proj4('+proj=merc'))
+        assert mask.is_valid
+        self.assertEqual(len(mask.geoms), 1)
+        self.assertAlmostEqual(mask.bounds[0], -20037508, 0)
+        self.assertAlmostEqual(mask.bounds[2], 20037508, 0)
+        self.assertGreater(mask.bounds[3], 20000000)
+
+        # Robinson's domain is not rectangular, so its corners are excluded.
+        crs = CRS.from_proj4('+proj=robin')
+        mask = sampled_mask(crs)
+        assert mask.is_valid
+        self.assertEqual(len(mask.geoms), 1)
+        transformer = Transformer.from_proj(CRS.from_epsg(4326), crs)
+        equator = transformer.transform(0, 180)
+        pole = transformer.transform(90, 180)
+        assert isclose(mask.bounds[2], equator[0], rel_tol=0.001)
+        assert isclose(mask.bounds[3], pole[1], rel_tol=0.001)
+        assert mask.contains(Point(0, 0))
+        assert not mask.contains(Point(equator[0] * 0.99, pole[1] * 0.99))
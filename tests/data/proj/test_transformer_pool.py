@@ -0,0 +1,97 @@
+import threading
+import unittest
+from pyproj import CRS
+
+from map_engraver.data.proj.transformer_pool import TransformerPool, \
+    get_transformer, \
+    get_default_transformer_pool, \
+    set_default_transformer_pool
+
+
+class TestTransformerPool(unittest.TestCase):
+    def test_transformers_are_reused(self):
+        pool = TransformerPool()
+        wgs84_crs = CRS.from_epsg(4326)
+        british_crs = CRS.from_epsg(27700)
+
+        transformer = pool.get(wgs84_crs, british_crs)
+        self.assertIs(
+            pool.get(CRS.from_epsg(4326), CRS.from_epsg(27700)),
+            transformer
+        )
+        self.assertEqual(len(pool), 1)
+
+        # The direction and axis order are part of the key.
+        self.assertIsNot(pool.get(british_crs, wgs84_crs), transformer)
+        always_xy_transformer = pool.get(wgs84_crs, british_crs, True)
+        self.assertIsNot(always_xy_transformer, transformer)
+        self.assertEqual(len(pool), 3)
+
+        # The transformers are the same as pyproj's.
+        self.assertEqual(
+            [round(v) for v in transformer.transform(55.947854, -3.192893)],
+            [325600, 673400]
+        )
+        self.assertEqual(
+            [
+                round(v) for v in
+                always_xy_transformer.transform(-3.192893, 55.947854)
+            ],
+            [325600, 673400]
+        )
+
+        pool.clear()
+        self.assertEqual(len(pool), 0)
+        self.assertIsNot(pool.get(wgs84_crs, british_crs), transformer)
+
+    def test_least_recently_used_transformers_are_removed(self):
+        pool = TransformerPool(maxsize=2)
+        wgs84_crs = CRS.from_epsg(4326)
+
+        transformer_a = pool.get(wgs84_crs, CRS.from_epsg(27700))
+        transformer_b = pool.get(wgs84_crs, CRS.from_epsg(3857))
+        self.assertIs(pool.get(wgs84_crs, CRS.from_epsg(27700)), transformer_a)
+        pool.get(wgs84_crs, CRS.from_epsg(32601))
+        self.assertEqual(len(pool), 2)
+        self.assertIs(pool.get(wgs84_crs, CRS.from_epsg(27700)), transformer_a)
+        self.assertIsNot(
+            pool.get(wgs84_crs, CRS.from_epsg(3857)),
+            transformer_b
+        )
+
+        with self.assertRaises(ValueError):
+            TransformerPool(maxsize=0)
+
+    def test_thread_local_transformers(self):
+        pool = TransformerPool(thread_local=True)
+        wgs84_crs = CRS.from_epsg(4326)
+        british_crs = CRS.from_epsg(27700)
+
+        transformer = pool.get(wgs84_crs, british_crs)
+        self.assertIs(pool.get(wgs84_crs, british_crs), transformer)
+
+        other_thread_transformers = []
+        thread = threading.Thread(
+            target=lambda: other_thread_transformers.append(
+                pool.get(wgs84_crs, british_crs)
+            )
+        )
+        thread.start()
+        thread.join()
+        self.assertIsNot(other_thread_transformers[0], transformer)
+
+    def test_default_pool(self):
+        default_pool = get_default_transformer_pool()
+        try:
+            pool = TransformerPool()
+            set_default_transformer_pool(pool)
+            transformer = get_transformer(
+                CRS.from_epsg(4326),
+                CRS.from_epsg(27700)
+            )
+            self.assertIs(
+                pool.get(CRS.from_epsg(4326), CRS.from_epsg(27700)),
+                transformer
+            )
+        finally:
+            set_default_transformer_pool(default_pool)